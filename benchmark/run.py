@@ -0,0 +1,260 @@
+# Time the converters and readers on synthetic datasets and compare against a stored baseline
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from benchmark.synthetic import generate_dataset
+from common.instrument import RunStats, peak_rss_mb
+
+SOURCE_FORMATS = ('voc', 'yolo', 'coco')
+
+
+def bench_read(timer, sources, output_dir, config, dataset_format):
+    from dataset.readers import read_dataset
+    with timer.stage('read'):
+        if dataset_format == 'coco':
+            dataset = read_dataset('coco', sources['coco'], config['set_name'], cache=False)
+        else:
+            dataset = read_dataset(dataset_format, sources[dataset_format], cache=False)
+    return len(dataset), dataset.num_boxes
+
+
+def record_stages(timer, summary, prefix):
+    """ Copy the per-stage timings of a converter's RunStats summary into timer as <prefix>.<stage>.
+    """
+    for stage, timing in summary['stages'].items():
+        timer.add_time("{}.{}".format(prefix, stage), timing['seconds'], calls=timing['calls'])
+
+
+def bench_voc2coco(timer, sources, output_dir, config):
+    from voc2coco import VOC2COCO
+    label2id = {"class{}".format(ind): ind + 1 for ind in range(config['classes'])}
+    voc2coco = VOC2COCO(sources['voc'], output_dir, config['set_name'], label2id)
+    ann_paths = sorted(os.path.join(voc2coco.voc_dir, "Annotations", name)
+                       for name in os.listdir(os.path.join(voc2coco.voc_dir, "Annotations")))
+    with timer.stage('stage_images'):
+        voc2coco.prepare_images(mode='copy', workers=config['workers'])
+    with timer.stage('parse'):
+        parsed = list(voc2coco.parse_annotations(ann_paths, workers=config['workers']))
+    with timer.stage('serialise'):
+        num_images, num_boxes = voc2coco.write_coco_records(
+            parsed, os.path.join(output_dir, "annotations", "serialise.json"), voc2coco.categories())
+    voc2coco.stats.restart()
+    with timer.stage('convert'):
+        voc2coco.create_coco_annotation(workers=config['workers'])
+    record_stages(timer, voc2coco.stats.summary(), 'convert')
+    return num_images, num_boxes
+
+
+def bench_yolo2voc(timer, sources, output_dir, config):
+    from yolo2voc.yolo2voc import YOLO2VOC
+    class_mapping = {ind + 1: "class{}".format(ind) for ind in range(config['classes'])}
+    yolo2voc = YOLO2VOC(sources['yolo'], output_dir, class_mapping)
+    with timer.stage('convert'):
+        summary = yolo2voc.convert(stage_mode='copy', workers=config['workers'])
+    record_stages(timer, summary, 'convert')
+    return summary['counters'].get('files', 0), summary['counters'].get('boxes', 0)
+
+
+def bench_voc2vott(timer, sources, output_dir, config):
+    from voc2vott import Voc2Vott
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "benchmark.vott"), 'w') as fp:
+        json.dump({"name": "benchmark"}, fp)
+    voc2vott = Voc2Vott(sources['voc'], output_dir)
+    with timer.stage('export'):
+        summary = voc2vott.convert(workers=config['workers'], quiet=True)
+    record_stages(timer, summary, 'export')
+    return summary['counters'].get('files', 0), summary['counters'].get('boxes', 0)
+
+
+def bench_webdataset(timer, sources, output_dir, config):
+    from dataset.readers import read_dataset
+    from dataset.webdataset import iter_webdataset, write_webdataset
+    dataset = read_dataset('voc', sources['voc'], cache=False)
+    with timer.stage('write'):
+        write_webdataset(dataset, output_dir, workers=config['workers'])
+    with timer.stage('iterate'):
+        num_samples = sum(1 for _ in iter_webdataset(output_dir))
+    return num_samples, dataset.num_boxes
+
+
+def bench_coco_generator(timer, sources, output_dir, config):
+    # preprocess/coco.py replaces keras_retinanet/preprocessing/coco.py and only imports from there
+    from keras_retinanet.preprocessing.coco import CocoGenerator
+    with timer.stage('load'):
+        generator = CocoGenerator(sources['coco'], config['set_name'])
+    with timer.stage('annotations'):
+        num_boxes = sum(len(generator.load_annotations(ind)['labels']) for ind in range(generator.size()))
+    return generator.size(), num_boxes
+
+
+CASES = {
+    'read_voc': lambda *args: bench_read(*args, dataset_format='voc'),
+    'read_yolo': lambda *args: bench_read(*args, dataset_format='yolo'),
+    'read_coco': lambda *args: bench_read(*args, dataset_format='coco'),
+    'voc2coco': bench_voc2coco,
+    'yolo2voc': bench_yolo2voc,
+    'voc2vott': bench_voc2vott,
+    'webdataset': bench_webdataset,
+    'coco_generator': bench_coco_generator
+}
+
+
+def use_fresh_caches(cache_dir):
+    """ Point the image size cache and the dataset cache at cache_dir, so that every run starts cold
+    instead of reusing the user's ~/.cache.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    os.environ['IMAGE_SIZE_CACHE'] = os.path.join(cache_dir, "image_size.sqlite3")
+    os.environ['DATASET_CACHE_DIR'] = os.path.join(cache_dir, "datasets")
+
+
+def run_case(name, sources, output_dir, config, cache_dir):
+    """ Run one case and return its result; meant to run in a fresh process so peak RSS is its own.
+
+    The case gets its own empty caches in cache_dir.
+    """
+    use_fresh_caches(cache_dir)
+    timer = RunStats(name)
+    result = {}
+    start = time.perf_counter()
+    try:
+        images, boxes = CASES[name](timer, sources, output_dir, config)
+        result['status'] = 'ok'
+    except ImportError as e:
+        images, boxes = None, None
+        result.update({'status': 'skipped', 'error': str(e)})
+    except Exception as e:
+        images, boxes = None, None
+        result.update({'status': 'error', 'error': "{}: {}".format(type(e).__name__, e)})
+    total = time.perf_counter() - start
+
+    result.update({
+        'total': round(total, 4),
+        'stages': {stage: round(timing['seconds'], 4) for stage, timing in timer.stages.items()},
+        'peak_rss_mb': peak_rss_mb()
+    })
+    if images is not None and total > 0:
+        result['images_per_s'] = round(images / total, 1)
+    if boxes is not None and total > 0:
+        result['boxes_per_s'] = round(boxes / total, 1)
+    return result
+
+
+def run_benchmarks(cases, work_dir, config):
+    """ Generate the source datasets in work_dir and run every case in its own process.
+    """
+    use_fresh_caches(os.path.join(work_dir, "cache", "source"))
+    sources = {}
+    for dataset_format in SOURCE_FORMATS:
+        sources[dataset_format] = os.path.join(work_dir, "source", dataset_format)
+        generate_dataset(dataset_format, sources[dataset_format], config['images'],
+                         boxes_per_image=config['boxes'], num_classes=config['classes'],
+                         set_name=config['set_name'], seed=config['seed'], tiny=not config['full_size'])
+
+    results = {}
+    for name in cases:
+        output_dir = os.path.join(work_dir, "output", name)
+        cache_dir = os.path.join(work_dir, "cache", name)
+        shutil.rmtree(output_dir, ignore_errors=True)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+            results[name] = executor.submit(run_case, name, sources, output_dir, config, cache_dir).result()
+        print("{:16s} {:8s} {:8.3f}s  peak {} MB".format(name, results[name]['status'], results[name]['total'],
+                                                        results[name]['peak_rss_mb']))
+    return results
+
+
+def compare(results, baseline, tolerance=0.1, min_seconds=0.05):
+    """ Rows of (case, stage, baseline seconds, seconds, ratio) for every timing present in both, and
+    the subset of them that is slower than the baseline by more than tolerance (and by more than
+    min_seconds, so that noise on tiny timings is not reported).
+    """
+    rows = []
+    for name, result in results.items():
+        base = baseline.get('results', {}).get(name)
+        if base is None or base.get('status') != 'ok' or result.get('status') != 'ok':
+            continue
+        timings = [('total', base['total'], result['total'])]
+        timings += [(stage, base['stages'][stage], seconds) for stage, seconds in result['stages'].items()
+                    if stage in base['stages']]
+        for stage, base_seconds, seconds in timings:
+            ratio = seconds / base_seconds if base_seconds > 0 else float('inf')
+            rows.append((name, stage, base_seconds, seconds, ratio))
+    regressions = [row for row in rows if row[4] > 1 + tolerance and row[3] - row[2] > min_seconds]
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the converters and readers on synthetic datasets")
+    parser.add_argument("--cases", type=str, default=",".join(CASES),
+                        help="Comma separated cases out of " + ", ".join(CASES))
+    parser.add_argument("--images", type=int, default=1000)
+    parser.add_argument("--boxes", type=float, default=5, help="Mean number of boxes per image")
+    parser.add_argument("--classes", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--full_size", action="store_true", help="Use full size images instead of 8x8 placeholders")
+    parser.add_argument("--work_dir", type=str, default=None, help="Where datasets are generated (default: temp dir)")
+    parser.add_argument("--output", type=str, default=None, help="Write the results as JSON")
+    parser.add_argument("--baseline", type=str, default=None, help="Results JSON of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed slowdown against the baseline")
+    parser.add_argument("--min_seconds", type=float, default=0.05, help="Ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    cases = args.cases.split(",")
+    for name in cases:
+        if name not in CASES:
+            parser.error("Unknown case {}".format(name))
+    config = {
+        'images': args.images,
+        'boxes': args.boxes,
+        'classes': args.classes,
+        'workers': args.workers,
+        'seed': args.seed,
+        'full_size': args.full_size,
+        'set_name': "train"
+    }
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="dataset-benchmark-")
+    try:
+        results = run_benchmarks(cases, work_dir, config)
+    finally:
+        if args.work_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        'config': config,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'results': results
+    }
+    if args.output is not None:
+        with open(args.output, 'w') as fp:
+            json.dump(report, fp, indent=4)
+
+    if args.baseline is not None:
+        with open(args.baseline, 'r') as fp:
+            baseline = json.load(fp)
+        if baseline.get('config') != config:
+            print("Warning: the baseline was run with a different config {}".format(baseline.get('config')))
+        rows, regressions = compare(results, baseline, tolerance=args.tolerance,
+                                      min_seconds=args.min_seconds)
+        for name, stage, base_seconds, seconds, ratio in rows:
+            print("{:16s} {:20s} {:8.3f}s -> {:8.3f}s  x{:.2f}".format(name, stage, base_seconds, seconds, ratio))
+        if regressions:
+            print("{} timings are more than {:.0%} slower than the baseline".format(len(regressions), args.tolerance))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
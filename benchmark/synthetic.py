@@ -0,0 +1,119 @@
+# Generate synthetic VOC / YOLO / COCO datasets with placeholder images for benchmarking
+import argparse
+import io
+import os
+
+import numpy as np
+from PIL import Image
+
+from dataset.core import Dataset
+from dataset.writers import write_dataset
+
+IMAGE_SIZES = ((640, 480), (1280, 720), (1920, 1080), (800, 600))
+
+# Where each format keeps its images, relative to the dataset folder
+IMAGE_DIRS = {
+    'voc': "JPEGImages",
+    'yolo': "",
+    'coco': os.path.join("images", "{set_name}")
+}
+
+
+def placeholder_jpeg(width, height, tiny=False):
+    """ Bytes of a solid gray JPEG.
+
+    With tiny=True the image is 8x8 pixels, but its header still reports width x height, so header
+    based size probing (common.image_size) sees the intended size without the cost of real pixels.
+    """
+    fp = io.BytesIO()
+    Image.new("RGB", (8, 8) if tiny else (width, height), (128, 128, 128)).save(fp, format="JPEG", quality=50)
+    content = bytearray(fp.getvalue())
+    if tiny is True:
+        # The size is stored big-endian at offset 5 of the SOF0 segment
+        sof = content.find(b'\xff\xc0')
+        content[sof + 5:sof + 9] = height.to_bytes(2, 'big') + width.to_bytes(2, 'big')
+    return bytes(content)
+
+
+def synthetic_dataset(image_dir, num_images, boxes_per_image, num_classes, seed=0, image_sizes=IMAGE_SIZES):
+    """ Random Dataset of num_images images in image_dir, with about boxes_per_image boxes each.
+
+    Box counts are Poisson distributed, so some images have no boxes.
+    """
+    rng = np.random.default_rng(seed)
+    image_sizes = np.array(image_sizes, dtype=np.int32)[rng.integers(0, len(image_sizes), num_images)]
+    counts = rng.poisson(boxes_per_image, num_images)
+    box_image = np.repeat(np.arange(num_images, dtype=np.int32), counts)
+    sizes = image_sizes[box_image].astype(np.float32)
+
+    # Box corners snapped to whole pixels, like hand labelled VOC boxes
+    box_sizes = np.maximum(np.round(sizes * rng.uniform(0.05, 0.5, (len(box_image), 2))), 2)
+    xy = np.floor((sizes - box_sizes) * rng.random((len(box_image), 2))) + 1
+    boxes = np.concatenate([xy, xy + box_sizes - 1], axis=1).astype(np.float32)
+    box_class = rng.integers(0, num_classes, len(box_image)).astype(np.int32)
+
+    image_names = ["{:08d}.jpg".format(ind) for ind in range(num_images)]
+    class_names = ["class{}".format(ind) for ind in range(num_classes)]
+    return Dataset([image_dir], np.zeros(num_images, dtype=np.int32), image_names, image_sizes, class_names,
+                   box_image, box_class, boxes)
+
+
+def write_images(dataset, tiny=True):
+    """ Write a placeholder JPEG for every image of the dataset, encoding each distinct size once.
+    """
+    encoded = {}
+    os.makedirs(dataset.dirs[0], exist_ok=True)
+    for ind, (width, height) in enumerate(dataset.image_sizes.tolist()):
+        if (width, height) not in encoded:
+            encoded[width, height] = placeholder_jpeg(width, height, tiny=tiny)
+        with open(dataset.image_path(ind), 'wb') as fp:
+            fp.write(encoded[width, height])
+
+
+def generate_dataset(dataset_format, dataset_dir, num_images, boxes_per_image=5, num_classes=3, set_name="train",
+                     seed=0, tiny=True):
+    """ Write a synthetic dataset_format ('voc', 'yolo' or 'coco') dataset into dataset_dir.
+
+    Args
+        dataset_format: 'voc', 'yolo' or 'coco'.
+        dataset_dir: Output folder.
+        num_images: Number of images.
+        boxes_per_image: Mean number of boxes per image.
+        num_classes: Number of classes, named class0, class1, ...
+        set_name: COCO set name.
+        seed: Seed of the random boxes.
+        tiny: Write 8x8 placeholder JPEGs instead of full size ones.
+
+    Returns the generated Dataset.
+    """
+    dataset_dir = os.path.expanduser(dataset_dir)
+    image_dir = os.path.join(dataset_dir, IMAGE_DIRS[dataset_format].format(set_name=set_name))
+    dataset = synthetic_dataset(os.path.abspath(image_dir), num_images, boxes_per_image, num_classes, seed=seed)
+    write_images(dataset, tiny=tiny)
+    if dataset_format == 'coco':
+        write_dataset(dataset, 'coco', dataset_dir, set_name)
+    else:
+        write_dataset(dataset, dataset_format, dataset_dir)
+    return dataset
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic dataset with placeholder images")
+    parser.add_argument("--format", type=str, choices=sorted(IMAGE_DIRS))
+    parser.add_argument("--output_dir", type=str)
+    parser.add_argument("--images", type=int, default=1000)
+    parser.add_argument("--boxes", type=float, default=5, help="Mean number of boxes per image")
+    parser.add_argument("--classes", type=int, default=3)
+    parser.add_argument("--set_name", type=str, default="train", help="COCO set name")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--full_size", action="store_true", help="Write full size images instead of 8x8 placeholders")
+    args = parser.parse_args()
+
+    dataset = generate_dataset(args.format, args.output_dir, args.images, boxes_per_image=args.boxes,
+                               num_classes=args.classes, set_name=args.set_name, seed=args.seed,
+                               tiny=not args.full_size)
+    print("Wrote {} images, {} boxes".format(len(dataset), dataset.num_boxes))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+import glob
+import json
+import os
+import re
+
+from common.coco_writer import CocoJsonWriter
+
+# Largest id written; many COCO consumers keep image and annotation ids in int32
+MAX_COCO_ID = 2 ** 31 - 1
+
+
+def shard_bounds(num_items, num_shards, shard_index):
+    """ [start, stop) of shard shard_index when num_items sorted items are cut into num_shards contiguous shards.
+    """
+    if not 0 <= shard_index < num_shards:
+        raise ValueError("shard_index {} is not in [0, {})".format(shard_index, num_shards))
+    return num_items * shard_index // num_shards, num_items * (shard_index + 1) // num_shards
+
+
+def shard_id_stride(num_shards):
+    """ Annotation ids of shard k are k * stride + 1 .. (k + 1) * stride, so shards never need to know each
+    other's sizes and every id stays below 2**31. A shard holds at most stride annotations.
+    """
+    if num_shards < 1:
+        raise ValueError("num_shards must be at least 1, got {}".format(num_shards))
+    return MAX_COCO_ID // num_shards
+
+
+def shard_path(path, shard_index, num_shards):
+    """ instances_train.json -> instances_train-00001-of-00004.json
+    """
+    root, ext = os.path.splitext(path)
+    return "{}-{:05d}-of-{:05d}{}".format(root, shard_index, num_shards, ext)
+
+
+def find_shards(path):
+    """ Shard files written for path, in shard order.
+
+    Raises ValueError unless they form exactly one complete set: a single num_shards, with every index
+    from 0 to num_shards - 1 present once (shards left over from a run with another num_shards would
+    otherwise be merged as well).
+    """
+    root, ext = os.path.splitext(path)
+    pattern = re.compile(re.escape(os.path.basename(root)) + r"-(\d+)-of-(\d+)" + re.escape(ext) + "$")
+    shards = {}
+    for shard in glob.glob(glob.escape(root) + "-[0-9]*-of-[0-9]*" + ext):
+        match = pattern.match(os.path.basename(shard))
+        if match is not None:
+            shards.setdefault(int(match.group(2)), {}).setdefault(int(match.group(1)), []).append(shard)
+    if len(shards) == 0:
+        return []
+    if len(shards) > 1:
+        raise ValueError("Shards of {} were written with different shard counts {}, remove the stale ones".format(
+            path, sorted(shards)))
+    num_shards, indices = next(iter(shards.items()))
+    if sorted(indices) != list(range(num_shards)) or any(len(paths) > 1 for paths in indices.values()):
+        found = sorted(index for index, paths in indices.items() for _ in paths)
+        raise ValueError("Incomplete shard set for {}: expected each index 0..{} once, found {}".format(
+            path, num_shards - 1, found))
+    return [indices[index][0] for index in range(num_shards)]
+
+
+class _JsonStream:
+    """ Reads JSON values one at a time from a text file, keeping at most one value (plus a chunk) in memory.
+    """
+
+    def __init__(self, fp, chunk_size=1 << 20):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        chunk = self.fp.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """ Next non-whitespace character, or '' at the end of the file.
+        """
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buffer) or self._fill() is False:
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, chars):
+        char = self.peek()
+        if char == '' or char not in chars:
+            raise ValueError("Expected one of {!r} at {!r}".format(chars, self.buffer[self.pos:self.pos + 40]))
+        self.pos += 1
+        return char
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self._fill() is False:
+                    raise
+                continue
+            # A number running into the end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and self.eof is False and self._fill() is True:
+                continue
+            self.pos = end
+            return value
+
+
+def iter_coco(path, chunk_size=1 << 20):
+    """ Stream a COCO json file as (key, value) pairs.
+
+    Every item of a top-level array (images, annotations, categories, ...) is yielded on its own as
+    (key, item); any other top-level value is yielded whole. Memory use is bounded by the largest item.
+    """
+    with open(path, 'r') as fp:
+        stream = _JsonStream(fp, chunk_size=chunk_size)
+        stream.expect('{')
+        if stream.peek() == '}':
+            return
+        while True:
+            key = stream.value()
+            stream.expect(':')
+            if stream.peek() == '[':
+                stream.expect('[')
+                if stream.peek() == ']':
+                    stream.expect(']')
+                else:
+                    while True:
+                        yield key, stream.value()
+                        if stream.expect(',]') == ']':
+                            break
+            else:
+                yield key, stream.value()
+            if stream.expect(',}') == '}':
+                return
+
+
+def scan_shard(path):
+    """ Image / annotation id ranges and counts, categories and dataset type of one COCO file.
+    """
+    info = {'path': path, 'images': 0, 'annotations': 0, 'image_ids': None, 'ann_ids': None,
+            'categories': [], 'type': None}
+    for key, value in iter_coco(path):
+        if key in ('images', 'annotations'):
+            id_key = 'image_ids' if key == 'images' else 'ann_ids'
+            low, high = info[id_key] or (value['id'], value['id'])
+            info[id_key] = (min(low, value['id']), max(high, value['id']))
+            info[key] += 1
+        elif key == 'categories':
+            info['categories'].append(value)
+        elif key == 'type':
+            info['type'] = value
+    return info
+
+
+def _offsets(ranges, renumber):
+    """ Id offset of every shard so that no two shards' [low, high] ranges overlap.
+
+    A shard keeps its ids unless they overlap an earlier shard's, in which case it is moved past the
+    highest id so far; with renumber=True every shard is moved right after the previous one.
+    """
+    offsets = []
+    taken = []
+    next_id = 1
+    for id_range in ranges:
+        if id_range is None:
+            offsets.append(0)
+            continue
+        low, high = id_range
+        overlaps = any(low <= other_high and other_low <= high for other_low, other_high in taken)
+        offset = next_id - low if renumber is True or overlaps else 0
+        offsets.append(offset)
+        taken.append((low + offset, high + offset))
+        next_id = max(next_id, high + offset + 1)
+    return offsets
+
+
+def merge_coco_shards(shard_paths, output_path, renumber=False, indent=4):
+    """ Concatenate COCO files into one, streaming, in bounded memory.
+
+    Args
+        shard_paths: COCO json files, merged in this order. They must share the same categories.
+        output_path: Merged COCO json.
+        renumber: Renumber image and annotation ids of each shard to follow the previous shard's, so shards
+            written by VOC2COCO.create_coco_annotation(num_shards=...) merge into the same file as an
+            unsharded run. Otherwise ids are only shifted for shards whose ids clash with an earlier one.
+        indent: json indent of the output, None for compact json.
+
+    Returns the number of images and annotations written. Top-level keys other than images, annotations,
+    categories and type (e.g. info, licenses) are not copied. Raises ValueError, before writing anything,
+    when an id would be above 2**31 - 1.
+    """
+    shards = [scan_shard(path) for path in shard_paths]
+    if len(shards) == 0:
+        raise ValueError("No shards to merge")
+    categories = shards[0]['categories']
+    for shard in shards[1:]:
+        if shard['categories'] != categories:
+            raise ValueError("Categories of {} differ from {}".format(shard['path'], shards[0]['path']))
+    image_offsets = _offsets([shard['image_ids'] for shard in shards], renumber)
+    ann_offsets = _offsets([shard['ann_ids'] for shard in shards], renumber)
+    for id_key, offsets in (('image_ids', image_offsets), ('ann_ids', ann_offsets)):
+        highest = max((shard[id_key][1] + offset for shard, offset in zip(shards, offsets) if shard[id_key]),
+                      default=0)
+        if highest > MAX_COCO_ID:
+            raise ValueError("Merged {} would reach {}, above 2**31 - 1{}".format(
+                id_key, highest, "" if renumber is True else "; merge with renumber=True"))
+
+    with CocoJsonWriter(output_path, categories, indent=indent, dataset_type=shards[0]['type'] or "instances") \
+            as writer:
+        for shard, image_offset, ann_offset in zip(shards, image_offsets, ann_offsets):
+            for key, value in iter_coco(shard['path']):
+                if key == 'images':
+                    if image_offset != 0:
+                        value['id'] += image_offset
+                    writer.add_image(value)
+                elif key == 'annotations':
+                    if image_offset != 0 or ann_offset != 0:
+                        value.update({'image_id': value['image_id'] + image_offset, 'id': value['id'] + ann_offset})
+                    writer.add_annotation(value)
+    return writer.num_images, writer.num_annotations
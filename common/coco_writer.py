@@ -0,0 +1,92 @@
+import json
+import os
+import shutil
+import tempfile
+
+
+class CocoJsonWriter:
+    """ Write a COCO annotation file incrementally.
+
+    Images are written straight to the output file and annotations are spooled to a temporary file
+    next to it, so memory use is bounded by a single record whatever the size of the dataset.
+    With indent=4 the file is byte-identical to json.dump(coco_dict, fp, indent=4); indent=None
+    writes compact JSON.
+    """
+
+    def __init__(self, path, categories, indent=4, dataset_type="instances"):
+        self.path = path
+        self.categories = list(categories)
+        self.indent = indent
+        self.dataset_type = dataset_type
+        self.num_images = 0
+        self.num_annotations = 0
+        self.closed = False
+
+        out_dir = os.path.dirname(os.path.abspath(path))
+        os.makedirs(out_dir, exist_ok=True)
+        self._tmp_path = path + '.tmp'
+        self._fp = open(self._tmp_path, 'w')
+        self._spool = tempfile.TemporaryFile(mode='w+', dir=out_dir, suffix='.annotations')
+        self._fp.write('{' + self._newline(1) + self._key("images") + '[')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.closed is True:
+            return
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _newline(self, level):
+        if self.indent is None:
+            return ''
+        return '\n' + ' ' * (self.indent * level)
+
+    def _dumps(self, obj, level):
+        if self.indent is None:
+            return json.dumps(obj, separators=(',', ':'))
+        return json.dumps(obj, indent=self.indent).replace('\n', self._newline(level))
+
+    def _item_separator(self, count):
+        return (',' if count > 0 else '') + self._newline(2)
+
+    def _key(self, key):
+        return json.dumps(key) + (':' if self.indent is None else ': ')
+
+    def _close_array(self, count):
+        return (self._newline(1) if count > 0 else '') + ']'
+
+    def add_image(self, image_info):
+        self._fp.write(self._item_separator(self.num_images) + self._dumps(image_info, 2))
+        self.num_images += 1
+
+    def add_annotation(self, annotation):
+        self._spool.write(self._item_separator(self.num_annotations) + self._dumps(annotation, 2))
+        self.num_annotations += 1
+
+    def close(self):
+        self.closed = True
+        fp = self._fp
+        fp.write(self._close_array(self.num_images) + ',' + self._newline(1))
+        fp.write(self._key("type") + json.dumps(self.dataset_type) + ',' + self._newline(1))
+        fp.write(self._key("annotations") + '[')
+        self._spool.seek(0)
+        shutil.copyfileobj(self._spool, fp)
+        self._spool.close()
+        fp.write(self._close_array(self.num_annotations) + ',' + self._newline(1))
+        fp.write(self._key("categories") + '[')
+        for ind, category in enumerate(self.categories):
+            fp.write(self._item_separator(ind) + self._dumps(category, 2))
+        fp.write(self._close_array(len(self.categories)) + self._newline(0) + '}')
+        fp.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        self.closed = True
+        self._spool.close()
+        self._fp.close()
+        if os.path.isfile(self._tmp_path):
+            os.remove(self._tmp_path)
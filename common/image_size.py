@@ -0,0 +1,114 @@
+import os
+import sqlite3
+import struct
+import threading
+
+DEFAULT_CACHE_PATH = os.path.join("~", ".cache", "dataset-format-convert-factory", "image_size.sqlite3")
+
+# JPEG start-of-frame markers carrying the image size (DHT, JPG and DAC share the range)
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _jpeg_size(fp):
+    fp.seek(2)
+    while True:
+        byte = fp.read(1)
+        while byte and byte != b'\xff':
+            byte = fp.read(1)
+        while byte == b'\xff':
+            byte = fp.read(1)
+        if not byte:
+            return None
+        marker = byte[0]
+        if marker == 0x01 or 0xD0 <= marker <= 0xD9:
+            # markers without a length field
+            continue
+        segment_length = struct.unpack('>H', fp.read(2))[0]
+        if marker in _JPEG_SOF_MARKERS:
+            height, width = struct.unpack('>xHH', fp.read(5))
+            return width, height
+        fp.seek(segment_length - 2, os.SEEK_CUR)
+
+
+def read_image_size(image_path):
+    """ Return (width, height) of an image reading only its header.
+
+    JPEG and PNG headers are parsed directly; other formats go through PIL, which also only reads
+    the header until the pixel data is accessed.
+    """
+    with open(image_path, 'rb') as fp:
+        head = fp.read(24)
+        size = None
+        if head[:8] == b'\x89PNG\r\n\x1a\n' and head[12:16] == b'IHDR':
+            size = struct.unpack('>II', head[16:24])
+        elif head[:2] == b'\xff\xd8':
+            try:
+                size = _jpeg_size(fp)
+            except struct.error:
+                size = None
+    if size is None:
+        from PIL import Image
+        with Image.open(image_path) as img:
+            size = img.size
+    return int(size[0]), int(size[1])
+
+
+class ImageSizeCache:
+    """ Persistent (path, mtime) -> (width, height) cache backed by sqlite.
+
+    The cache is shared by every converter and survives reruns; a changed image gets a new mtime
+    and is probed again. Every insert is committed on its own (autocommit) and the database runs
+    in WAL mode, so readers never wait and a writer only holds the write lock for one row; several
+    threads and processes (e.g. process pool workers, which never run atexit hooks) can share it.
+    """
+
+    def __init__(self, cache_path=None):
+        cache_path = cache_path or os.environ.get("IMAGE_SIZE_CACHE", DEFAULT_CACHE_PATH)
+        self.cache_path = os.path.expanduser(cache_path)
+        os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        # isolation_level=None: autocommit, no transaction is left open between calls
+        self._conn = sqlite3.connect(self.cache_path, timeout=60, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS image_size ("
+                "path TEXT PRIMARY KEY, mtime_ns INTEGER, width INTEGER, height INTEGER)"
+            )
+
+    def get(self, image_path):
+        image_path = os.path.abspath(image_path)
+        mtime_ns = os.stat(image_path).st_mtime_ns
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT width, height FROM image_size WHERE path = ? AND mtime_ns = ?", (image_path, mtime_ns)
+            ).fetchone()
+        if row is not None:
+            return row[0], row[1]
+
+        width, height = read_image_size(image_path)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO image_size VALUES (?, ?, ?, ?)", (image_path, mtime_ns, width, height)
+            )
+        return width, height
+
+    def close(self):
+        self._conn.close()
+
+
+_default_cache = None
+_default_cache_pid = None
+
+
+def get_image_size(image_path, cache=True):
+    """ Return (width, height) of image_path, probing the header at most once per (path, mtime).
+    """
+    global _default_cache, _default_cache_pid
+    if cache is False:
+        return read_image_size(image_path)
+    if _default_cache is None or _default_cache_pid != os.getpid():
+        # sqlite connections must not be shared with forked workers
+        _default_cache = ImageSizeCache()
+        _default_cache_pid = os.getpid()
+    return _default_cache.get(image_path)
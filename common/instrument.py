@@ -0,0 +1,188 @@
+import cProfile
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Set to a file path to profile every instrumented run with cProfile (view with snakeviz / pstats)
+PROFILE_ENV = 'DATASET_PROFILE'
+
+
+class FieldsFormatter(logging.Formatter):
+    """ Appends the record's structured fields (log(..., extra={'fields': {...}})) as key=value pairs.
+    """
+
+    def format(self, record):
+        message = super().format(record)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            message += " " + " ".join("{}={}".format(key, value) for key, value in fields.items())
+        return message
+
+
+class JsonFormatter(logging.Formatter):
+    """ One JSON object per line with the time, level, logger, message and structured fields.
+    """
+
+    def format(self, record):
+        entry = {
+            'time': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        return json.dumps(entry, default=str)
+
+
+def setup_logging(level=logging.INFO, json_lines=False):
+    """ Log to stderr, as text with key=value fields or as JSON lines.
+    """
+    handler = logging.StreamHandler()
+    if json_lines is True:
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(FieldsFormatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level)
+
+
+def log_event(logger, message, level=logging.INFO, **fields):
+    logger.log(level, message, extra={'fields': fields})
+
+
+def peak_rss_mb():
+    """ Peak resident set size of this process and of its finished children, in MB.
+    """
+    if resource is None:
+        return None
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    return round(max(own, children), 1)
+
+
+class RunStats:
+    """ Per-stage wall time and counters of one run, summarised as JSON.
+
+    Stages may be entered from several threads; their times are summed, so a stage run on a
+    thread pool can take longer than the run itself. Counters (files, boxes, bytes_copied, ...)
+    are reported per second of the whole run as well.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.logger = logging.getLogger(name)
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def restart(self):
+        """ Clear the stages and counters and restart the run clock.
+        """
+        with self._lock:
+            self.started = time.time()
+            self._start = time.perf_counter()
+            self.stages = {}
+            self.counters = {}
+
+    def __getstate__(self):
+        # Converters are pickled into worker processes along with their stats; the lock stays behind
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds, calls=1):
+        with self._lock:
+            stage = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0})
+            stage['seconds'] += seconds
+            stage['calls'] += calls
+
+    def timed(self, name, iterable):
+        """ Iterate over iterable, counting the time spent producing each item towards stage name.
+        """
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add_time(name, time.perf_counter() - start, calls=0)
+                return
+            self.add_time(name, time.perf_counter() - start)
+            yield item
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self):
+        elapsed = time.perf_counter() - self._start
+        return {
+            'run': self.name,
+            'started': self.started,
+            'seconds': round(elapsed, 4),
+            'stages': {name: {'seconds': round(stage['seconds'], 4), 'calls': stage['calls']}
+                       for name, stage in self.stages.items()},
+            'counters': dict(self.counters),
+            'rates': {name + '_per_s': round(value / elapsed, 2) for name, value in self.counters.items()
+                      if elapsed > 0},
+            'peak_rss_mb': peak_rss_mb()
+        }
+
+    def finish(self, summary_path=None):
+        """ Log the summary and write it to summary_path (if given) as JSON; returns the summary.
+        """
+        summary = self.summary()
+        fields = {'seconds': summary['seconds']}
+        fields.update({name: stage['seconds'] for name, stage in summary['stages'].items()})
+        fields.update(summary['counters'])
+        log_event(self.logger, "{} finished".format(self.name), **fields)
+        if summary_path is not None:
+            with open(summary_path, 'w') as fp:
+                json.dump(summary, fp, indent=4)
+        return summary
+
+
+@contextmanager
+def profiled(path=None):
+    """ Run the block under cProfile and dump the stats to path (or $DATASET_PROFILE); no-op otherwise.
+
+    cProfile only sees this thread. For worker processes and threads, sample the whole run with
+    py-spy instead (py-spy record --subprocesses -o profile.svg -- python voc2coco.py ...).
+    """
+    path = path or os.environ.get(PROFILE_ENV)
+    if not path:
+        yield
+        return
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        profile.dump_stats(path)
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+
+
+def file_sha1(path, chunk_size=1 << 20):
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(chunk_size), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+class AnnotationManifest:
+    """ Sidecar manifest of annotation files and the records parsed from them.
+
+    Every entry is keyed by the annotation path relative to `root` and stores the file's mtime,
+    size and sha1 together with the parsed image / annotation records and the ids assigned to them.
+    `params` describes everything else the records depend on (e.g. label2id); when it differs from
+    the stored one the manifest starts empty.
+    """
+    VERSION = 1
+
+    def __init__(self, path, root, params=None):
+        self.path = path
+        self.root = root
+        self.params = params or {}
+        self.entries = {}
+        self.next_image_id = 1
+        self.next_ann_id = 1
+
+    @classmethod
+    def load(cls, path, root, params=None):
+        manifest = cls(path, root, params)
+        if not os.path.isfile(path):
+            return manifest
+        with open(path, 'r') as fp:
+            data = json.load(fp)
+        if data.get('version') != cls.VERSION or data.get('params') != manifest.params:
+            return manifest
+        manifest.entries = data['entries']
+        manifest.next_image_id = data['next_image_id']
+        manifest.next_ann_id = data['next_ann_id']
+        return manifest
+
+    def save(self):
+        data = {
+            'version': self.VERSION,
+            'params': self.params,
+            'next_image_id': self.next_image_id,
+            'next_ann_id': self.next_ann_id,
+            'entries': self.entries
+        }
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as fp:
+            json.dump(data, fp, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+    def key(self, path):
+        return os.path.relpath(path, self.root)
+
+    def is_fresh(self, path):
+        """ Return True if the stored records for path are still valid.
+
+        mtime and size are checked first; the sha1 is only computed when they differ, so touching
+        a file without changing it does not force a re-parse.
+        """
+        entry = self.entries.get(self.key(path))
+        if entry is None:
+            return False
+        stat = os.stat(path)
+        if entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+            return True
+        if entry['size'] != stat.st_size or entry['sha1'] != file_sha1(path):
+            return False
+        entry['mtime_ns'] = stat.st_mtime_ns
+        return True
+
+    def update(self, path, fingerprint, image_info, annotations):
+        """ Store freshly parsed records for path and assign their ids.
+
+        A changed file keeps its image id and reuses its previous annotation ids in order; new
+        images / annotations take ids that were never handed out before.
+        """
+        key = self.key(path)
+        old = self.entries.get(key)
+        if old is None:
+            image_id = self.next_image_id
+            self.next_image_id += 1
+            ann_ids = []
+        else:
+            image_id = old['image_id']
+            ann_ids = old['ann_ids'][:len(annotations)]
+        while len(ann_ids) < len(annotations):
+            ann_ids.append(self.next_ann_id)
+            self.next_ann_id += 1
+
+        entry = dict(fingerprint)
+        entry.update({
+            'image': image_info,
+            'annotations': annotations,
+            'image_id': image_id,
+            'ann_ids': ann_ids
+        })
+        self.entries[key] = entry
+        return entry
+
+    def prune(self, paths):
+        """ Drop entries whose file is not in paths any more. Their ids are not reused.
+        """
+        keep = {self.key(path) for path in paths}
+        for key in [key for key in self.entries if key not in keep]:
+            del self.entries[key]
+
+    def get(self, path):
+        return self.entries[self.key(path)]
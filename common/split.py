@@ -0,0 +1,106 @@
+import hashlib
+import os
+
+SPLITS = ('train', 'val', 'test')
+
+
+def hash_fraction(sample_id, seed=0):
+    """ Deterministic pseudo-random number in [0, 1) for sample_id, the same on every run and machine.
+    """
+    digest = hashlib.blake2b("{}:{}".format(seed, sample_id).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') / float(1 << 64)
+
+
+class SplitAssigner:
+    """ Assigns samples to train / val / test one at a time, without seeing the whole dataset.
+
+    train_val_percent of the samples go to trainval and the rest to test; train_percent of trainval
+    goes to train and the rest to val, as in YOLO2VOC.split_train_val_test.
+
+    By default the split of a sample only depends on a seeded hash of its id, so it is reproducible
+    and does not change when samples are added or removed. With stratify=True every sample is
+    filed under its rarest class so far, and goes to the split that is furthest below its target
+    share in that stratum (ties broken by the hash). That balances the classes across the splits,
+    but the assignment then depends on the order and the set of samples, so feed them in a fixed
+    (e.g. sorted) order.
+    """
+
+    def __init__(self, train_val_percent=1.0, train_percent=0.8, seed=0, stratify=False):
+        self.seed = seed
+        self.stratify = stratify
+        self.targets = {
+            'train': train_val_percent * train_percent,
+            'val': train_val_percent * (1 - train_percent),
+            'test': 1 - train_val_percent
+        }
+        self.class_counts = {}
+        self.strata = {}
+
+    def hash_split(self, fraction):
+        bound = 0.0
+        for split in SPLITS:
+            bound += self.targets[split]
+            if fraction < bound:
+                return split
+        return SPLITS[-1] if self.targets[SPLITS[-1]] > 0 else 'train'
+
+    def stratum(self, class_ids):
+        if len(class_ids) == 0:
+            return None
+        return min(set(class_ids), key=lambda class_id: (self.class_counts.get(class_id, 0), class_id))
+
+    def assign(self, sample_id, class_ids=()):
+        """ Returns 'train', 'val' or 'test' for sample_id; class_ids are its labels (for stratify=True).
+        """
+        fraction = hash_fraction(sample_id, self.seed)
+        if self.stratify is False:
+            return self.hash_split(fraction)
+
+        class_ids = [int(class_id) for class_id in class_ids]
+        counts = self.strata.setdefault(self.stratum(class_ids), dict.fromkeys(SPLITS, 0))
+        total = sum(counts.values()) + 1
+        preferred = self.hash_split(fraction)
+        split = max((split for split in SPLITS if self.targets[split] > 0),
+                    key=lambda split: (self.targets[split] * total - counts[split], split == preferred))
+        counts[split] += 1
+        for class_id in set(class_ids):
+            self.class_counts[class_id] = self.class_counts.get(class_id, 0) + 1
+        return split
+
+
+class SplitWriter:
+    """ Streams sample ids into the VOC ImageSets/Main trainval / train / val / test lists.
+
+    Files are only created once a sample is assigned to them, so empty splits leave no file.
+    """
+
+    def __init__(self, image_sets_dir, assigner):
+        self.image_sets_dir = image_sets_dir
+        self.assigner = assigner
+        self.counts = dict.fromkeys(SPLITS, 0)
+        self._files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _write(self, name, sample_id):
+        fp = self._files.get(name)
+        if fp is None:
+            fp = self._files[name] = open(os.path.join(self.image_sets_dir, name + ".txt"), 'w')
+        fp.write(sample_id + '\n')
+
+    def add(self, sample_id, class_ids=()):
+        split = self.assigner.assign(sample_id, class_ids)
+        self.counts[split] += 1
+        if split != 'test':
+            self._write('trainval', sample_id)
+        self._write(split, sample_id)
+        return split
+
+    def close(self):
+        for fp in self._files.values():
+            fp.close()
+        self._files = {}
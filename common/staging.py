@@ -0,0 +1,141 @@
+import errno
+import os
+import shutil
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+STAGE_MODES = ('copy', 'move', 'hardlink', 'reflink', 'symlink')
+
+# Linux FICLONE ioctl: share the source's extents copy-on-write (btrfs, xfs, ...)
+_FICLONE = 0x40049409
+# Errors meaning "this kind of link is not possible here", e.g. across devices
+_LINK_ERRORS = {errno.EXDEV, errno.EPERM, errno.EMLINK, errno.EOPNOTSUPP, errno.ENOTSUP,
+                errno.EINVAL, errno.ENOTTY, errno.ENOSYS, errno.EBADF}
+
+
+def _reflink(src, dst):
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError(errno.ENOTSUP, "reflink is not supported on this platform")
+    with open(src, 'rb') as src_fp, open(dst, 'wb') as dst_fp:
+        try:
+            fcntl.ioctl(dst_fp.fileno(), _FICLONE, src_fp.fileno())
+        except OSError:
+            dst_fp.close()
+            os.remove(dst)
+            raise
+    shutil.copymode(src, dst)
+
+
+def _remove_existing(src, dst):
+    if not os.path.lexists(dst):
+        return True
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        return False
+    os.remove(dst)
+    return True
+
+
+def _remove_alias(src, dst):
+    """ Remove dst if it is a symlink or another hardlink of src, so that copying or moving onto it
+    neither raises SameFileError nor writes through it into src.
+    """
+    if os.path.islink(dst):
+        os.remove(dst)
+    elif os.path.exists(dst) and os.path.samefile(src, dst) and os.path.realpath(src) != os.path.realpath(dst):
+        os.remove(dst)
+
+
+def stage_file(src, dst, mode='copy'):
+    """ Put src at dst using mode and return the mode that was actually used.
+
+    hardlink and reflink fall back to a plain copy when the source and destination are on
+    different devices or the filesystem does not support them.
+    """
+    if mode not in STAGE_MODES:
+        raise ValueError("Unknown stage mode {}, expected one of {}".format(mode, STAGE_MODES))
+    if mode == 'copy':
+        # dst may be a link to src left by a previous --stage_mode hardlink / symlink run
+        _remove_alias(src, dst)
+        shutil.copy(src, dst)
+        return mode
+    if mode == 'move':
+        _remove_alias(src, dst)
+        shutil.move(src, dst)
+        return mode
+
+    if _remove_existing(src, dst) is False:
+        # dst already is src (e.g. hardlinked by a previous run)
+        return mode
+    try:
+        if mode == 'hardlink':
+            os.link(src, dst)
+        elif mode == 'reflink':
+            _reflink(src, dst)
+        else:
+            os.symlink(os.path.abspath(src), dst)
+        return mode
+    except OSError as e:
+        if mode == 'symlink' or e.errno not in _LINK_ERRORS:
+            raise
+    shutil.copy(src, dst)
+    return 'copy'
+
+
+class Stager:
+    """ Stage files on a bounded thread pool.
+
+    At most `workers * 4` files are queued at a time, so submitting a whole dataset does not
+    build an unbounded backlog. Errors are re-raised by close().
+    """
+
+    def __init__(self, mode='copy', workers=8):
+        if mode not in STAGE_MODES:
+            raise ValueError("Unknown stage mode {}, expected one of {}".format(mode, STAGE_MODES))
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.counts = Counter()
+        self.bytes_copied = 0
+        self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        self._slots = threading.BoundedSemaphore(self.workers * 4)
+        self._lock = threading.Lock()
+        self._errors = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _stage(self, src, dst):
+        try:
+            used = stage_file(src, dst, self.mode)
+            size = os.path.getsize(dst) if used == 'copy' else 0
+            with self._lock:
+                self.counts[used] += 1
+                self.bytes_copied += size
+        except Exception as e:
+            with self._lock:
+                self._errors.append(e)
+        finally:
+            self._slots.release()
+
+    def submit(self, src, dst):
+        self._slots.acquire()
+        self._executor.submit(self._stage, src, dst)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        if self._errors:
+            raise self._errors[0]
+
+
+def stage_files(pairs, mode='copy', workers=8):
+    """ Stage every (src, dst) in pairs and return a Counter of the modes actually used.
+    """
+    with Stager(mode=mode, workers=workers) as stager:
+        for src, dst in pairs:
+            stager.submit(src, dst)
+    return stager.counts
@@ -0,0 +1,146 @@
+import os
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+from xml.sax.saxutils import escape
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+
+# Text of the VOC fields the converters use, exactly as found in the file (None if missing).
+# boxes holds one (xmin, ymin, xmax, ymax) tuple per name.
+VocRecord = namedtuple('VocRecord', ['filename', 'path', 'width', 'height', 'names', 'boxes'])
+
+BOX_TAGS = ('xmin', 'ymin', 'xmax', 'ymax')
+
+
+def _walk_root(root):
+    """ Collect a VocRecord in a single pass over the children of <annotation>.
+    """
+    fields = {}
+    names = []
+    boxes = []
+    for element in root:
+        tag = element.tag
+        if tag == 'object':
+            name = None
+            box = (None, None, None, None)
+            for child in element:
+                if child.tag == 'name':
+                    name = child.text
+                elif child.tag == 'bndbox':
+                    coords = {coord.tag: coord.text for coord in child}
+                    box = tuple(coords.get(coord_tag) for coord_tag in BOX_TAGS)
+            names.append(name)
+            boxes.append(box)
+        elif tag == 'size':
+            for child in element:
+                fields[child.tag] = child.text
+        elif tag == 'filename' or tag == 'path':
+            fields[tag] = element.text
+    return VocRecord(fields.get('filename'), fields.get('path'), fields.get('width'), fields.get('height'),
+                     names, boxes)
+
+
+def _parse_etree(source):
+    if isinstance(source, bytes):
+        return _walk_root(ET.fromstring(source))
+    return _walk_root(ET.parse(source).getroot())
+
+
+_LXML_TAGS = ('filename', 'path', 'width', 'height', 'object', 'name') + BOX_TAGS
+
+
+def _parse_lxml(source):
+    """ Collect a VocRecord from a single lxml iteration over the tags it needs.
+
+    The tags are matched inside libxml2 without building Python objects for the rest of the tree.
+    Files the flat scan cannot map back to objects unambiguously (parts, missing coordinates) are
+    handed to the per-element walk instead.
+    """
+    try:
+        if isinstance(source, bytes):
+            root = lxml_etree.fromstring(source)
+        else:
+            root = lxml_etree.parse(source).getroot()
+    except lxml_etree.XMLSyntaxError as e:
+        # lxml's error holds its error log, which cannot be pickled back from a process pool worker
+        raise ET.ParseError(str(e)) from None
+
+    fields = {}
+    names = []
+    coords = []
+    num_objects = 0
+    for element in root.iter(*_LXML_TAGS):
+        tag = element.tag
+        parent = element.getparent()
+        if tag == 'object':
+            num_objects += 1
+        elif tag == 'name':
+            names.append(element.text)
+        elif tag in BOX_TAGS:
+            coords.append((tag, element.text))
+        elif tag == 'filename' or tag == 'path':
+            # Header fields are matched by their parent, wherever they are relative to the objects
+            if parent is root:
+                fields[tag] = element.text
+        elif parent.tag == 'size' and parent.getparent() is root:
+            fields[tag] = element.text
+    if len(names) != num_objects or len(coords) != 4 * num_objects or \
+            any(coords[ind][0] != BOX_TAGS[ind % 4] for ind in range(len(coords))):
+        return _walk_root(root)
+
+    values = [text for _, text in coords]
+    boxes = [tuple(values[ind:ind + 4]) for ind in range(0, len(values), 4)]
+    return VocRecord(fields.get('filename'), fields.get('path'), fields.get('width'), fields.get('height'),
+                     names, boxes)
+
+
+PARSERS = {
+    'etree': _parse_etree
+}
+if lxml_etree is not None:
+    PARSERS['lxml'] = _parse_lxml
+
+BACKEND = os.environ.get('VOC_XML_BACKEND', 'lxml' if lxml_etree is not None else 'etree')
+
+
+def parse_voc(source, backend=None):
+    """ Parse a VOC annotation (a file path or the file's bytes) into a VocRecord.
+
+    Args
+        source: Path of the xml file, or its content as bytes.
+        backend: 'lxml' or 'etree'; defaults to lxml when it is installed (or $VOC_XML_BACKEND).
+    """
+    backend = backend or BACKEND
+    if backend not in PARSERS:
+        raise ValueError("Unknown xml backend {}, expected one of {}".format(backend, sorted(PARSERS)))
+    return PARSERS[backend](source)
+
+
+_HEAD_TEMPLATE = ("<annotations><filename>{filename}</filename><folder>{folder}</folder>"
+                  "<size><width>{width}</width><height>{height}</height><depth>3</depth></size>")
+_OBJECT_TEMPLATE = ("<object><name>{name}</name><pose>Unspecified</pose><truncated>0</truncated>"
+                    "<difficult>0</difficult><bndbox><xmin>{xmin}</xmin><ymin>{ymin}</ymin>"
+                    "<xmax>{xmax}</xmax><ymax>{ymax}</ymax></bndbox></object>")
+
+
+def format_voc(filename, folder, width, height, names, boxes):
+    """ Serialise a VOC annotation from string templates.
+
+    The result is byte for byte what building the tree with ElementTree and calling write() produces.
+    """
+    parts = [_HEAD_TEMPLATE.format(filename=escape(filename), folder=escape(folder),
+                                   width=str(width), height=str(height))]
+    for name, (xmin, ymin, xmax, ymax) in zip(names, boxes):
+        # str() rather than format(): numpy float32 formats through float and would print 136.75999450683594
+        parts.append(_OBJECT_TEMPLATE.format(name=escape(name), xmin=str(xmin), ymin=str(ymin),
+                                             xmax=str(xmax), ymax=str(ymax)))
+    parts.append("</annotations>")
+    return "".join(parts).encode('ascii', 'xmlcharrefreplace')
+
+
+def write_voc_xml(ann_path, filename, folder, width, height, names, boxes):
+    with open(ann_path, 'wb') as fp:
+        fp.write(format_voc(filename, folder, width, height, names, boxes))
@@ -0,0 +1,93 @@
+import warnings
+
+import numpy as np
+
+_EMPTY_LABELS = np.empty((0, 5), dtype=np.float64)
+
+
+def _parse_yolo_text(text):
+    with warnings.catch_warnings():
+        # np.loadtxt warns on input without any rows
+        warnings.simplefilter("ignore", UserWarning)
+        labels = np.loadtxt(text.splitlines(), dtype=np.float64, ndmin=2, usecols=range(5))
+    return labels if labels.size else _EMPTY_LABELS
+
+
+def load_yolo_labels(label_path):
+    """ Load a YOLO label file into an (N, 5) float64 array of class_id, center_x, center_y, width, height.
+
+    Extra columns (e.g. confidences) are ignored. The values are kept in float64 so that decode_yolo computes
+    the same corners as float() arithmetic on the text would.
+    """
+    with open(label_path, 'r') as fp:
+        return _parse_yolo_text(fp.read())
+
+
+def load_yolo_shard(label_paths):
+    """ Load many YOLO label files at once.
+
+    Returns the concatenated (N, 5) float64 labels and an int64 offsets array of len(label_paths) + 1,
+    so the labels of label_paths[i] are labels[offsets[i]:offsets[i + 1]].
+    """
+    texts = []
+    counts = np.zeros(len(label_paths), dtype=np.int64)
+    for ind, label_path in enumerate(label_paths):
+        with open(label_path, 'r') as fp:
+            lines = [line for line in fp.read().splitlines() if line.strip()]
+        counts[ind] = len(lines)
+        texts.extend(lines)
+    labels = _parse_yolo_text("\n".join(texts))
+    offsets = np.zeros(len(label_paths) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return labels, offsets
+
+
+def _round(values, decimals):
+    """ np.round(values, decimals), but rounding like round() on every float.
+
+    np.round scales by 10 ** decimals first, which can turn a value just below a tie into an exact tie;
+    values that close to a tie are rounded with round() instead.
+    """
+    rounded = np.round(values, decimals)
+    scaled = values * 10.0 ** decimals
+    for ind in np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6):
+        rounded.flat[ind] = round(float(values.flat[ind]), decimals)
+    return rounded
+
+
+def decode_yolo(labels, width, height, decimals=2, margin=1.0, drop_invalid=False):
+    """ Convert YOLO labels to pixel corner boxes.
+
+    Args
+        labels: (N, 5) array as returned by load_yolo_labels.
+        width, height: Image size, either scalars or per-row arrays (e.g. for a shard).
+        decimals: Round the corners to this many decimals, None to keep them as is.
+        margin: Clip the corners to [margin, size - margin]; None keeps them as they are.
+        drop_invalid: Drop boxes that are empty after clipping.
+
+    Returns
+        class_ids: (M,) int32 array of the YOLO class ids.
+        boxes: (M, 4) float64 array of xmin, ymin, xmax, ymax (dataset.core.Dataset stores them as float32).
+    """
+    labels = np.asarray(labels, dtype=np.float64).reshape(-1, 5)
+    width = np.asarray(width, dtype=np.float64)
+    height = np.asarray(height, dtype=np.float64)
+
+    center_x = labels[:, 1] * width
+    center_y = labels[:, 2] * height
+    half_width = labels[:, 3] * width / 2
+    half_height = labels[:, 4] * height / 2
+    boxes = np.stack([center_x - half_width, center_y - half_height,
+                      center_x + half_width, center_y + half_height], axis=1)
+    if decimals is not None:
+        boxes = _round(boxes, decimals)
+    if margin is not None:
+        np.maximum(boxes[:, :2], margin, out=boxes[:, :2])
+        np.minimum(boxes[:, 2], width - margin, out=boxes[:, 2])
+        np.minimum(boxes[:, 3], height - margin, out=boxes[:, 3])
+
+    class_ids = labels[:, 0].astype(np.int32)
+    if drop_invalid is True:
+        keep = (boxes[:, 0] < boxes[:, 2]) & (boxes[:, 1] < boxes[:, 3])
+        class_ids, boxes = class_ids[keep], boxes[keep]
+    return class_ids, boxes
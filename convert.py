@@ -0,0 +1,82 @@
+import argparse
+import os
+
+from dataset.readers import READERS, read_dataset
+from dataset.tiling import tile_dataset
+from dataset.writers import WRITERS, write_dataset
+
+
+def read_args(dataset_format, dataset_dir, set_name, class_names):
+    if dataset_format == 'coco':
+        return (dataset_dir, set_name), {}
+    if dataset_format == 'yolo':
+        return (dataset_dir,), {'class_names': class_names}
+    return (dataset_dir,), {'class_names': class_names or ()}
+
+
+def write_args(dataset_format, dataset_dir, set_name, class_names, stage_mode, workers):
+    if dataset_format == 'coco':
+        return (dataset_dir, set_name), {'stage_mode': stage_mode, 'workers': workers}
+    if dataset_format == 'yolo':
+        return (dataset_dir,), {'class_names': class_names, 'stage_mode': stage_mode, 'workers': workers}
+    if dataset_format == 'vott':
+        return (dataset_dir,), {}
+    if dataset_format == 'webdataset':
+        return (dataset_dir,), {'workers': workers}
+    return (dataset_dir,), {'stage_mode': stage_mode, 'workers': workers}
+
+
+def parse_size(value):
+    """ "1024x768" -> (1024, 768), "1024" -> (1024, 1024)
+    """
+    if value is None:
+        return None
+    sizes = [int(size) for size in value.lower().split("x")]
+    return sizes[0], sizes[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a detection dataset between any two supported formats")
+    parser.add_argument("--src_format", type=str, choices=sorted(READERS))
+    parser.add_argument("--src_dir", type=str)
+    parser.add_argument("--src_set", type=str, default="train", help="COCO set name of the source")
+    parser.add_argument("--dst_format", type=str, choices=sorted(WRITERS))
+    parser.add_argument("--dst_dir", type=str)
+    parser.add_argument("--dst_set", type=str, default="train", help="COCO set name of the destination")
+    parser.add_argument("--classes", type=str, default=None,
+                        help="Comma separated class names (YOLO class id order for YOLO)")
+    parser.add_argument("--stage_mode", type=str, default=None,
+                        help="How to stage images: copy, move, hardlink, reflink or symlink (default: labels only)")
+    parser.add_argument("--tile_size", type=str, default=None,
+                        help="Cut the images into tiles of WxH pixels (e.g. 1024x1024) and convert the tiles")
+    parser.add_argument("--tile_stride", type=str, default=None, help="Step between tiles, WxH (default: tile size)")
+    parser.add_argument("--min_visibility", type=float, default=0.5,
+                        help="Keep a box in a tile when at least this fraction of it is inside")
+    parser.add_argument("--drop_empty", action="store_true", help="Skip tiles without boxes")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    class_names = args.classes.split(",") if args.classes else None
+    src_args, src_kwargs = read_args(args.src_format, args.src_dir, args.src_set, class_names)
+    dataset = read_dataset(args.src_format, *src_args, **src_kwargs)
+    print("Read {} images, {} boxes".format(len(dataset), dataset.num_boxes))
+
+    stage_mode = args.stage_mode
+    tile_dir = os.path.join(os.path.expanduser(args.dst_dir), "tiles")
+    if args.tile_size is not None:
+        dataset = tile_dataset(dataset, tile_dir, parse_size(args.tile_size), stride=parse_size(args.tile_stride),
+                               min_visibility=args.min_visibility, drop_empty=args.drop_empty, workers=args.workers)
+        print("Cut {} tiles, {} boxes".format(len(dataset), dataset.num_boxes))
+        # The tiles are new files, move them into place
+        stage_mode = 'move'
+
+    dst_args, dst_kwargs = write_args(args.dst_format, args.dst_dir, args.dst_set, class_names, stage_mode,
+                                      args.workers)
+    write_dataset(dataset, args.dst_format, *dst_args, **dst_kwargs)
+    if args.tile_size is not None and 'stage_mode' in dst_kwargs:
+        os.rmdir(tile_dir)
+    print("Done")
+
+
+if __name__ == "__main__":
+    main()
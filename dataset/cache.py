@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+from dataset.core import Dataset, StringColumn
+
+CACHE_VERSION = 1
+DEFAULT_CACHE_DIR = os.path.join("~", ".cache", "dataset-format-convert-factory", "datasets")
+
+_ARRAYS = ('image_dir', 'image_sizes', 'image_ids', 'class_ids', 'box_image', 'box_class', 'boxes')
+
+
+def source_files(dataset_format, dataset_dir, *args, **kwargs):
+    """ The files a reader's output depends on, used to fingerprint the cache.
+    """
+    dataset_dir = Path(os.path.expanduser(dataset_dir))
+    extension = kwargs.get('extension', '.jpg')
+    if dataset_format == 'coco':
+        coco_set_name = args[0] if args else kwargs['coco_set_name']
+        return [dataset_dir.joinpath('annotations', 'instances_' + coco_set_name + '.json')]
+    if dataset_format == 'voc':
+        return sorted(dataset_dir.joinpath("Annotations").glob("*.xml"))
+    if dataset_format == 'vott':
+        return sorted(dataset_dir.glob("*-asset.json"))
+    if dataset_format == 'yolo':
+        return sorted(dataset_dir.glob("*.txt")) + sorted(dataset_dir.glob("*" + extension))
+    if dataset_format == 'kitti':
+        return sorted(dataset_dir.joinpath("label").glob("*.txt")) + \
+            sorted(dataset_dir.joinpath("image").glob("*" + extension))
+    raise ValueError("Unknown format {}".format(dataset_format))
+
+
+def _describe(dataset_format, dataset_dir, args, kwargs):
+    return json.dumps([dataset_format, os.path.abspath(os.path.expanduser(dataset_dir)), list(args),
+                       sorted((key, repr(value)) for key, value in kwargs.items() if key != 'workers')])
+
+
+def fingerprint(dataset_format, dataset_dir, *args, **kwargs):
+    sha1 = hashlib.sha1(_describe(dataset_format, dataset_dir, args, kwargs).encode('utf-8'))
+    for path in source_files(dataset_format, dataset_dir, *args, **kwargs):
+        stat = path.stat()
+        sha1.update("{}\0{}\0{}\n".format(path, stat.st_mtime_ns, stat.st_size).encode('utf-8'))
+    return sha1.hexdigest()
+
+
+def cache_path(dataset_format, dataset_dir, *args, cache_dir=None, **kwargs):
+    cache_dir = os.path.expanduser(cache_dir or os.environ.get("DATASET_CACHE_DIR", DEFAULT_CACHE_DIR))
+    key = hashlib.sha1(_describe(dataset_format, dataset_dir, args, kwargs).encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, "{}-{}".format(dataset_format, key))
+
+
+def save_cache(dataset, path, source_fingerprint=None):
+    """ Write dataset as a folder of .npy arrays plus a meta.json.
+    """
+    tmp_path = path + '.tmp'
+    if os.path.isdir(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+    for name in _ARRAYS:
+        np.save(os.path.join(tmp_path, name + '.npy'), np.ascontiguousarray(getattr(dataset, name)))
+    image_names = StringColumn.from_strings(dataset.image_names)
+    np.save(os.path.join(tmp_path, 'image_names.npy'), image_names.data)
+    np.save(os.path.join(tmp_path, 'image_name_offsets.npy'), image_names.offsets)
+    with open(os.path.join(tmp_path, 'meta.json'), 'w') as fp:
+        json.dump({
+            'version': CACHE_VERSION,
+            'fingerprint': source_fingerprint,
+            'dirs': dataset.dirs,
+            'class_names': dataset.class_names
+        }, fp)
+
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+
+
+def load_cache(path, source_fingerprint=None, mmap=True):
+    """ Load a cached dataset, or return None when it is missing or stale.
+
+    With mmap=True the arrays are memory-mapped, so loading takes milliseconds whatever the size.
+    """
+    meta_path = os.path.join(path, 'meta.json')
+    if not os.path.isfile(meta_path):
+        return None
+    with open(meta_path, 'r') as fp:
+        meta = json.load(fp)
+    if meta.get('version') != CACHE_VERSION:
+        return None
+    if source_fingerprint is not None and meta.get('fingerprint') != source_fingerprint:
+        return None
+
+    mmap_mode = 'r' if mmap is True else None
+    arrays = {name: np.load(os.path.join(path, name + '.npy'), mmap_mode=mmap_mode) for name in _ARRAYS}
+    image_names = StringColumn(np.load(os.path.join(path, 'image_names.npy'), mmap_mode=mmap_mode),
+                               np.load(os.path.join(path, 'image_name_offsets.npy'), mmap_mode=mmap_mode))
+    return Dataset(meta['dirs'], arrays['image_dir'], image_names, arrays['image_sizes'], meta['class_names'],
+                   arrays['box_image'], arrays['box_class'], arrays['boxes'],
+                   image_ids=arrays['image_ids'], class_ids=arrays['class_ids'])
+
+
+def cached_read(reader, dataset_format, dataset_dir, *args, cache_dir=None, **kwargs):
+    """ reader(dataset_dir, *args, **kwargs) through the binary cache.
+
+    The cache is keyed by the reader arguments and validated against the mtime / size of every
+    source file; it is rebuilt whenever one of them changes.
+    """
+    path = cache_path(dataset_format, dataset_dir, *args, cache_dir=cache_dir, **kwargs)
+    source_fingerprint = fingerprint(dataset_format, dataset_dir, *args, **kwargs)
+    dataset = load_cache(path, source_fingerprint)
+    if dataset is not None:
+        return dataset
+    dataset = reader(dataset_dir, *args, **kwargs)
+    save_cache(dataset, path, source_fingerprint)
+    return dataset
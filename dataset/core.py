@@ -0,0 +1,222 @@
+import os
+
+import numpy as np
+
+from common.image_size import get_image_size
+
+
+class StringTable:
+    """ Interns strings to dense int ids.
+    """
+
+    def __init__(self, values=()):
+        self.values = []
+        self.index = {}
+        for value in values:
+            self.add(value)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, ind):
+        return self.values[ind]
+
+    def add(self, value):
+        ind = self.index.get(value)
+        if ind is None:
+            ind = len(self.values)
+            self.index[value] = ind
+            self.values.append(value)
+        return ind
+
+
+class StringColumn:
+    """ Read-only sequence of strings stored as one utf-8 byte buffer plus int64 offsets.
+
+    Both arrays may be memory-mapped; strings are only decoded when accessed.
+    """
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, values):
+        encoded = [value.encode('utf-8') for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        return cls(data, offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, ind):
+        if isinstance(ind, slice):
+            return [self[i] for i in range(*ind.indices(len(self)))]
+        if ind < 0:
+            ind += len(self)
+        return self.data[self.offsets[ind]:self.offsets[ind + 1]].tobytes().decode('utf-8')
+
+    def __iter__(self):
+        for ind in range(len(self)):
+            yield self[ind]
+
+
+class Dataset:
+    """ Columnar, in-memory detection dataset shared by all readers and writers.
+
+    Images are stored as a folder table plus per-image folder ids and file names; boxes are stored
+    as contiguous arrays sorted by image, so no Python object is created per box.
+
+    Attributes
+        dirs: List of image folders.
+        image_dir: (I,) int32 index into dirs.
+        image_names: List of image file names.
+        image_sizes: (I, 2) int32 width, height (0 when unknown).
+        class_names: List of class names.
+        box_image: (B,) int32 image index of every box, sorted.
+        box_class: (B,) int32 index into class_names.
+        boxes: (B, 4) float32 xmin, ymin, xmax, ymax in pixels, as stored by the source format.
+        image_ids: (I,) int64 ids of the images in the source (COCO image ids), 1..I by default.
+        class_ids: (C,) int64 ids of the classes in the source (COCO category ids), 1..C by default.
+    """
+
+    def __init__(self, dirs, image_dir, image_names, image_sizes, class_names, box_image, box_class, boxes,
+                 image_ids=None, class_ids=None):
+        self.dirs = list(dirs)
+        self.image_dir = np.asarray(image_dir, dtype=np.int32)
+        # StringColumn (e.g. from the binary cache) decodes names on access; anything else is copied to a list
+        self.image_names = image_names if isinstance(image_names, StringColumn) else list(image_names)
+        self.image_sizes = np.asarray(image_sizes, dtype=np.int32).reshape(-1, 2)
+        self.class_names = list(class_names)
+        if image_ids is None:
+            image_ids = np.arange(1, len(self.image_names) + 1)
+        self.image_ids = np.asarray(image_ids, dtype=np.int64)
+        if class_ids is None:
+            class_ids = np.arange(1, len(self.class_names) + 1)
+        self.class_ids = np.asarray(class_ids, dtype=np.int64)
+        self.box_image = np.asarray(box_image, dtype=np.int32)
+        self.box_class = np.asarray(box_class, dtype=np.int32)
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+
+        if np.any(self.box_image[1:] < self.box_image[:-1]):
+            order = np.argsort(self.box_image, kind='stable')
+            self.box_image = self.box_image[order]
+            self.box_class = self.box_class[order]
+            self.boxes = self.boxes[order]
+        self._offsets = None
+
+    @classmethod
+    def from_paths(cls, image_paths, image_sizes, class_names, box_image, box_class, boxes, **kwargs):
+        dirs = StringTable()
+        image_dir = np.empty(len(image_paths), dtype=np.int32)
+        image_names = []
+        for ind, image_path in enumerate(image_paths):
+            folder, image_name = os.path.split(image_path)
+            image_dir[ind] = dirs.add(folder)
+            image_names.append(image_name)
+        return cls(dirs.values, image_dir, image_names, image_sizes, class_names, box_image, box_class, boxes,
+                   **kwargs)
+
+    def __len__(self):
+        return len(self.image_names)
+
+    @property
+    def num_boxes(self):
+        return len(self.boxes)
+
+    @property
+    def offsets(self):
+        """ (I + 1,) int64 array; the boxes of image i are boxes[offsets[i]:offsets[i + 1]].
+        """
+        if self._offsets is None:
+            counts = np.bincount(self.box_image, minlength=len(self))
+            self._offsets = np.zeros(len(self) + 1, dtype=np.int64)
+            np.cumsum(counts, out=self._offsets[1:])
+        return self._offsets
+
+    def image_path(self, ind):
+        return os.path.join(self.dirs[self.image_dir[ind]], self.image_names[ind])
+
+    def image_paths(self):
+        return [self.image_path(ind) for ind in range(len(self))]
+
+    def image_boxes(self, ind):
+        """ Returns (box_class, boxes) of image ind as array views.
+        """
+        start, end = self.offsets[ind], self.offsets[ind + 1]
+        return self.box_class[start:end], self.boxes[start:end]
+
+    def class_id_map(self, class_names):
+        """ Returns an int32 array mapping this dataset's class ids to ids in class_names (-1 if missing).
+        """
+        index = {name: ind for ind, name in enumerate(class_names)}
+        return np.array([index.get(name, -1) for name in self.class_names], dtype=np.int32)
+
+
+class DatasetBuilder:
+    """ Accumulates images and their box arrays, then builds a Dataset in one concatenation.
+    """
+
+    def __init__(self, class_names=()):
+        self.dirs = StringTable()
+        self.classes = StringTable(class_names)
+        self.image_dir = []
+        self.image_names = []
+        self.image_sizes = []
+        self.box_class = []
+        self.boxes = []
+
+    def class_ids(self, names):
+        return np.array([self.classes.add(name) for name in names], dtype=np.int32)
+
+    def add_image(self, image_path, width, height, box_class=None, boxes=None):
+        """ Add an image and return its index. box_class are class ids (see class_ids), boxes an (N, 4) array.
+        """
+        image_dir, image_name = os.path.split(image_path)
+        self.image_dir.append(self.dirs.add(image_dir))
+        self.image_names.append(image_name)
+        self.image_sizes.append((width or 0, height or 0))
+        if box_class is None:
+            box_class = np.empty((0,), dtype=np.int32)
+            boxes = np.empty((0, 4), dtype=np.float32)
+        self.box_class.append(np.asarray(box_class, dtype=np.int32))
+        self.boxes.append(np.asarray(boxes, dtype=np.float32).reshape(-1, 4))
+        return len(self.image_names) - 1
+
+    def build(self):
+        counts = [len(box_class) for box_class in self.box_class]
+        box_image = np.repeat(np.arange(len(counts), dtype=np.int32), counts)
+        box_class = np.concatenate(self.box_class) if self.box_class else np.empty((0,), dtype=np.int32)
+        boxes = np.concatenate(self.boxes) if self.boxes else np.empty((0, 4), dtype=np.float32)
+        return Dataset(
+            dirs=self.dirs.values,
+            image_dir=self.image_dir,
+            image_names=self.image_names,
+            image_sizes=np.array(self.image_sizes, dtype=np.int32).reshape(-1, 2),
+            class_names=self.classes.values,
+            box_image=box_image,
+            box_class=box_class,
+            boxes=boxes
+        )
+
+
+def as_float64(values):
+    """ Widen float32 values to the float64 closest to their shortest decimal representation.
+
+    Serialising the result prints e.g. 136.76 instead of 136.75999450683594.
+    """
+    values = np.asarray(values)
+    if values.dtype != np.float32:
+        return values.astype(np.float64)
+    return values.astype(str).astype(np.float64)
+
+
+def probe_image_sizes(dataset):
+    """ The dataset's image sizes, probing images whose size is unknown.
+    """
+    image_sizes = dataset.image_sizes.copy()
+    for ind in np.flatnonzero((image_sizes == 0).any(axis=1)):
+        image_sizes[ind] = get_image_size(dataset.image_path(ind))
+    return image_sizes
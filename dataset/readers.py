@@ -0,0 +1,251 @@
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from common.image_size import get_image_size
+from common.voc_xml import parse_voc
+from common.yolo import decode_yolo, load_yolo_shard
+from dataset.cache import cached_read
+from dataset.core import Dataset, DatasetBuilder
+
+
+def _to_number(text, convert, default):
+    try:
+        return convert(text)
+    except (TypeError, ValueError):
+        return default
+
+
+def parse_voc_xml(ann_path, strict=True):
+    """ Returns (filename, width, height, names, boxes) of a VOC annotation file.
+
+    With strict=False nothing but malformed xml raises: a missing or unparsable size becomes 0 (unknown),
+    unparsable or missing coordinates become NaN and a missing filename becomes <annotation name>.jpg,
+    so that dataset.validate can report them.
+    """
+    record = parse_voc(ann_path)
+    filename = record.filename if record.path is None else os.path.basename(record.path)
+    if strict is True:
+        width = int(record.width)
+        height = int(record.height)
+        boxes = np.array(record.boxes, dtype=np.float32).reshape(-1, 4)
+    else:
+        if filename is None:
+            filename = os.path.splitext(os.path.basename(ann_path))[0] + '.jpg'
+        width = _to_number(record.width, int, 0)
+        height = _to_number(record.height, int, 0)
+        boxes = np.array([[_to_number(text, float, np.nan) for text in box] for box in record.boxes],
+                         dtype=np.float32).reshape(-1, 4)
+    names = record.names
+    return filename, width, height, names, boxes
+
+
+def _parse_voc_xml_lenient(ann_path):
+    try:
+        return parse_voc_xml(ann_path, strict=False), None
+    except (SyntaxError, OSError) as e:
+        # ElementTree's ParseError and lxml's XMLSyntaxError are both SyntaxErrors
+        return None, str(e)
+
+
+def read_voc(voc_dir, class_names=(), workers=1, errors=None):
+    """ Read a VOC folder (Annotations/*.xml, images in JPEGImages).
+
+    errors: None to raise on the first bad annotation. Otherwise a list that collects (annotation path,
+        message) of the files that are not well-formed xml, which are skipped; the other files are read
+        with parse_voc_xml(strict=False).
+    """
+    voc_dir = os.path.expanduser(voc_dir)
+    image_dir = os.path.join(voc_dir, "JPEGImages")
+    ann_paths = sorted(str(ann.absolute()) for ann in Path(voc_dir, "Annotations").glob("*.xml"))
+    parse = parse_voc_xml if errors is None else _parse_voc_xml_lenient
+
+    builder = DatasetBuilder(class_names)
+    if workers is None or workers <= 1:
+        _add_voc_images(builder, image_dir, ann_paths, map(parse, ann_paths), errors)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parsed = executor.map(parse, ann_paths, chunksize=max(1, min(256, len(ann_paths) // (workers * 4))))
+            _add_voc_images(builder, image_dir, ann_paths, parsed, errors)
+    return builder.build()
+
+
+def _add_voc_images(builder, image_dir, ann_paths, parsed, errors):
+    for ann_path, item in zip(ann_paths, parsed):
+        if errors is not None:
+            item, message = item
+            if item is None:
+                errors.append((ann_path, message))
+                continue
+        filename, width, height, names, boxes = item
+        builder.add_image(os.path.join(image_dir, filename), width, height, builder.class_ids(names), boxes)
+
+
+def read_yolo(yolo_dir, class_names=None, extension='.jpg', clip=True):
+    """ Read a flat YOLO folder (<name>.txt next to <name><extension>).
+
+    class_names lists the names in YOLO class id order; ids are used as names when it is None.
+    Boxes are clipped to the image for conversion; clip=False keeps them as labelled (for validation).
+    """
+    yolo_dir = os.path.expanduser(yolo_dir)
+    label_paths = []
+    image_paths = []
+    for label_txt in sorted(Path(yolo_dir).glob("*.txt")):
+        image_path = str(label_txt.absolute())[:-4] + extension
+        if os.path.isfile(image_path) is True:
+            label_paths.append(str(label_txt.absolute()))
+            image_paths.append(image_path)
+
+    image_sizes = np.array([get_image_size(image_path) for image_path in image_paths], dtype=np.int32).reshape(-1, 2)
+    labels, offsets = load_yolo_shard(label_paths)
+    counts = np.diff(offsets)
+    box_class, boxes = decode_yolo(labels, np.repeat(image_sizes[:, 0], counts), np.repeat(image_sizes[:, 1], counts),
+                                   decimals=None, margin=0 if clip is True else None)
+    if class_names is None:
+        class_names = [str(ind) for ind in range(box_class.max() + 1 if len(box_class) else 0)]
+    elif len(box_class) and box_class.max() >= len(class_names):
+        raise ValueError("YOLO class id {} has no name in class_names".format(box_class.max()))
+
+    box_image = np.repeat(np.arange(len(image_paths), dtype=np.int32), counts)
+    return Dataset.from_paths(image_paths, image_sizes, class_names, box_image, box_class, boxes)
+
+
+def load_coco_tables(coco_dir, coco_set_name, include_crowd=True):
+    """ Parse annotations/instances_<coco_set_name>.json into flat tables.
+
+    Returns (categories, images, box_image, box_class, bboxes): the categories sorted by id, the image
+    dicts in file order, the int32 image index and category index of every annotation (in file order)
+    and the (B, 4) float64 COCO bboxes (x, y, width, height) exactly as stored in the file.
+    """
+    coco_dir = os.path.expanduser(coco_dir)
+    with open(os.path.join(coco_dir, 'annotations', 'instances_' + coco_set_name + '.json'), 'r') as fp:
+        coco_json = json.load(fp)
+
+    categories = sorted(coco_json.get('categories', []), key=lambda category: category['id'])
+    category_index = {category['id']: ind for ind, category in enumerate(categories)}
+    images = coco_json['images']
+    image_index = {image['id']: ind for ind, image in enumerate(images)}
+
+    annotations = coco_json['annotations']
+    if include_crowd is False:
+        annotations = [ann for ann in annotations if not ann.get('iscrowd', 0)]
+    box_image = np.array([image_index[ann['image_id']] for ann in annotations], dtype=np.int32)
+    box_class = np.array([category_index[ann['category_id']] for ann in annotations], dtype=np.int32)
+    bboxes = np.array([ann['bbox'] for ann in annotations], dtype=np.float64).reshape(-1, 4)
+    return categories, images, box_image, box_class, bboxes
+
+
+def read_coco(coco_dir, coco_set_name, include_crowd=True):
+    categories, images, box_image, box_class, boxes = load_coco_tables(coco_dir, coco_set_name,
+                                                                       include_crowd=include_crowd)
+    image_dir = os.path.join(os.path.expanduser(coco_dir), "images", coco_set_name)
+    image_paths = [os.path.join(image_dir, image['file_name']) for image in images]
+    image_sizes = [(image.get('width') or 0, image.get('height') or 0) for image in images]
+    boxes[:, 2:] += boxes[:, :2]
+    return Dataset.from_paths(image_paths, image_sizes, [category['name'] for category in categories],
+                              box_image, box_class, boxes,
+                              image_ids=[image['id'] for image in images],
+                              class_ids=[category['id'] for category in categories])
+
+
+VOTT_NOT_VISITED, VOTT_VISITED, VOTT_TAGGED = 0, 1, 2
+VOTT_LABELED_STATES = (VOTT_VISITED, VOTT_TAGGED)
+
+
+def parse_vott_asset(asset_path, states=None):
+    """ Returns (image_path, width, height, names, boxes) of a VoTT <id>-asset.json file.
+
+    Returns None if states is given and the asset's state is not one of them.
+    """
+    with open(asset_path, 'r') as fp:
+        asset_data = json.load(fp)
+    asset = asset_data['asset']
+    if states is not None and asset.get('state', VOTT_NOT_VISITED) not in states:
+        return None
+    image_path = asset['path']
+    if image_path.startswith("file:"):
+        image_path = image_path[len("file:"):]
+    names = []
+    coords = []
+    for region in asset_data.get('regions', []):
+        bounding_box = region['boundingBox']
+        names.append(region['tags'][0])
+        coords.append([bounding_box['left'], bounding_box['top'],
+                       bounding_box['left'] + bounding_box['width'], bounding_box['top'] + bounding_box['height']])
+    boxes = np.array(coords, dtype=np.float32).reshape(-1, 4)
+    return image_path, asset['size']['width'], asset['size']['height'], names, boxes
+
+
+def iter_vott_assets(vott_dir, workers=8, states=VOTT_LABELED_STATES):
+    """ Yield parse_vott_asset(...) of every <id>-asset.json in vott_dir, sorted by file name.
+
+    The files are read on a thread pool with at most workers * 4 reads in flight, so records can be
+    streamed into a writer without holding the whole project in memory. Assets whose state is not
+    in states are skipped (states=None keeps all of them).
+    """
+    asset_paths = sorted(str(asset_path) for asset_path in Path(os.path.expanduser(vott_dir)).glob("*-asset.json"))
+    if workers is None or workers <= 1:
+        parsed = (parse_vott_asset(asset_path, states) for asset_path in asset_paths)
+        yield from (item for item in parsed if item is not None)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for asset_path in asset_paths:
+            pending.append(executor.submit(parse_vott_asset, asset_path, states))
+            if len(pending) >= workers * 4:
+                item = pending.popleft().result()
+                if item is not None:
+                    yield item
+        while pending:
+            item = pending.popleft().result()
+            if item is not None:
+                yield item
+
+
+def read_vott(vott_dir, class_names=(), workers=8, states=VOTT_LABELED_STATES):
+    builder = DatasetBuilder(class_names)
+    for image_path, width, height, names, boxes in iter_vott_assets(vott_dir, workers=workers, states=states):
+        builder.add_image(image_path, width, height, builder.class_ids(names), boxes)
+    return builder.build()
+
+
+def read_kitti(kitti_dir, class_names=(), extension='.jpg'):
+    kitti_dir = os.path.expanduser(kitti_dir)
+    image_dir = os.path.join(kitti_dir, "image")
+    builder = DatasetBuilder(class_names)
+    for label_txt in sorted(Path(kitti_dir, "label").glob("*.txt")):
+        image_path = os.path.join(image_dir, label_txt.name[:-4] + extension)
+        width, height = get_image_size(image_path) if os.path.isfile(image_path) else (0, 0)
+        with open(str(label_txt), 'r') as fp:
+            rows = [line.split() for line in fp.read().splitlines() if line.strip()]
+        names = [row[0] for row in rows]
+        boxes = np.array([row[4:8] for row in rows], dtype=np.float32).reshape(-1, 4)
+        builder.add_image(image_path, width, height, builder.class_ids(names), boxes)
+    return builder.build()
+
+
+READERS = {
+    'voc': read_voc,
+    'yolo': read_yolo,
+    'coco': read_coco,
+    'vott': read_vott,
+    'kitti': read_kitti
+}
+
+
+def read_dataset(dataset_format, *args, cache=True, cache_dir=None, **kwargs):
+    """ Read a dataset with the reader for dataset_format.
+
+    With cache=True the parsed dataset is stored in a binary cache (see dataset.cache) and
+    memory-mapped back on the next call as long as the source files did not change.
+    """
+    if dataset_format not in READERS:
+        raise ValueError("Unknown format {}, expected one of {}".format(dataset_format, sorted(READERS)))
+    if cache is True:
+        return cached_read(READERS[dataset_format], dataset_format, *args, cache_dir=cache_dir, **kwargs)
+    return READERS[dataset_format](*args, **kwargs)
@@ -0,0 +1,149 @@
+# Cut large images into overlapping tiles and remap their boxes into tile coordinates
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+from tqdm import tqdm
+
+from dataset.core import DatasetBuilder
+
+
+def tile_starts(size, tile_size, stride):
+    """ Start offsets of tiles along one axis; the last tile is aligned to the far edge so every pixel is covered.
+    """
+    if size <= tile_size:
+        return np.zeros(1, dtype=np.int64)
+    starts = np.arange(0, size - tile_size + 1, stride, dtype=np.int64)
+    if starts[-1] + tile_size < size:
+        starts = np.append(starts, size - tile_size)
+    return starts
+
+
+def tile_grid(width, height, tile_size, stride):
+    """ (T, 4) int64 tiles (xmin, ymin, xmax, ymax) covering a width x height image, row by row.
+
+    tile_size and stride are (width, height) pairs; tiles are clipped to images smaller than a tile.
+    """
+    xs = tile_starts(width, tile_size[0], stride[0])
+    ys = tile_starts(height, tile_size[1], stride[1])
+    x1, y1 = np.meshgrid(xs, ys)
+    x1, y1 = x1.reshape(-1), y1.reshape(-1)
+    return np.stack([x1, y1, np.minimum(x1 + tile_size[0], width), np.minimum(y1 + tile_size[1], height)], axis=1)
+
+
+def tile_boxes(boxes, tiles, min_visibility=0.5):
+    """ Intersect every box with every tile at once.
+
+    Args
+        boxes: (B, 4) xmin, ymin, xmax, ymax.
+        tiles: (T, 4) from tile_grid.
+        min_visibility: Keep a box in a tile when at least this fraction of its area is inside the tile.
+
+    Returns (tile_ind, box_ind, tile_boxes): the kept (tile, box) pairs, sorted by tile, and the boxes
+    clipped to their tile in tile coordinates (float32).
+    """
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    tiles = tiles.astype(np.float32)
+    # (T, B, 2) corners of the intersections
+    top_left = np.maximum(tiles[:, None, :2], boxes[None, :, :2])
+    bottom_right = np.minimum(tiles[:, None, 2:], boxes[None, :, 2:])
+    sides = bottom_right - top_left
+    inter = np.where((sides > 0).all(axis=2), sides[..., 0] * sides[..., 1], 0)
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        keep = (inter > 0) & (inter >= min_visibility * areas[None, :])
+    tile_ind, box_ind = np.nonzero(keep)
+    offsets = np.tile(tiles[tile_ind, :2], 2)
+    clipped = np.concatenate([top_left[tile_ind, box_ind], bottom_right[tile_ind, box_ind]], axis=1) - offsets
+    return tile_ind, box_ind, clipped.astype(np.float32)
+
+
+def tile_image(image_path, tile_dir, tile_size, stride, box_class, boxes, min_visibility=0.5, drop_empty=False,
+               jpeg_quality=95, name=None):
+    """ Cut one image into tiles, write them to tile_dir and return their (tile_path, width, height, box_class, boxes).
+
+    Tiles are named <name>_<x>_<y> after their top-left corner, name being the image's file name without
+    extension by default; with drop_empty=True tiles without boxes are neither written nor returned.
+    """
+    image = cv2.imread(image_path)
+    if image is None:
+        raise IOError("Cannot read image {}".format(image_path))
+    height, width = image.shape[:2]
+    tiles = tile_grid(width, height, tile_size, stride)
+    tile_ind, box_ind, clipped = tile_boxes(boxes, tiles, min_visibility=min_visibility)
+    box_class = np.asarray(box_class, dtype=np.int32)
+    # Boxes of tile t are rows bounds[t]:bounds[t + 1], as tile_ind is sorted
+    bounds = np.searchsorted(tile_ind, np.arange(len(tiles) + 1))
+
+    stem, extension = os.path.splitext(os.path.basename(image_path))
+    name = name or stem
+    params = [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality] if extension.lower() in ('.jpg', '.jpeg') else []
+    results = []
+    for ind, (x1, y1, x2, y2) in enumerate(tiles.tolist()):
+        start, end = bounds[ind], bounds[ind + 1]
+        if drop_empty is True and start == end:
+            continue
+        tile_path = os.path.join(tile_dir, "{}_{}_{}{}".format(name, x1, y1, extension))
+        cv2.imwrite(tile_path, image[y1:y2, x1:x2], params)
+        results.append((tile_path, x2 - x1, y2 - y1, box_class[box_ind[start:end]], clipped[start:end]))
+    return results
+
+
+def tile_names(dataset):
+    """ One tile name prefix per image: the file name without extension. Images of different folders
+    (or with different extensions) with the same name get the image index appended, so that their
+    tiles do not overwrite each other in the flat tile folder.
+    """
+    names = []
+    seen = set()
+    for ind, image_name in enumerate(dataset.image_names):
+        name = os.path.splitext(image_name)[0]
+        while name in seen:
+            name = "{}_{}".format(name, ind)
+        seen.add(name)
+        names.append(name)
+    return names
+
+
+def _tile_sample(args):
+    return tile_image(*args)
+
+
+def tile_dataset(dataset, tile_dir, tile_size, stride=None, min_visibility=0.5, drop_empty=False, jpeg_quality=95,
+                 workers=8):
+    """ Tile every image of dataset into tile_dir and return the Dataset of the tiles.
+
+    Args
+        dataset: dataset.core.Dataset.
+        tile_dir: Folder the tile images are written to. Pass the result to dataset.writers.write_dataset
+            (e.g. with stage_mode='move') to get the tiles in any output format.
+        tile_size: (width, height) of the tiles.
+        stride: (x, y) step between tiles; tile_size (no overlap) when None.
+        min_visibility: Minimum fraction of a box's area that has to be inside a tile for it to be kept.
+        drop_empty: Skip tiles without boxes.
+        jpeg_quality: JPEG quality of the tiles.
+        workers: Images are decoded, cut and encoded on a process pool of this size.
+    """
+    tile_dir = os.path.expanduser(tile_dir)
+    os.makedirs(tile_dir, exist_ok=True)
+    stride = stride or tile_size
+    names = tile_names(dataset)
+    samples = ((dataset.image_path(ind), tile_dir, tile_size, stride) + dataset.image_boxes(ind) +
+               (min_visibility, drop_empty, jpeg_quality, names[ind]) for ind in range(len(dataset)))
+
+    builder = DatasetBuilder(dataset.class_names)
+    if workers is None or workers <= 1:
+        tiled = map(_tile_sample, samples)
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        chunk_size = max(1, min(16, len(dataset) // (workers * 4)))
+        tiled = executor.map(_tile_sample, samples, chunksize=chunk_size)
+    try:
+        for tiles in tqdm(tiled, total=len(dataset)):
+            for tile_path, width, height, box_class, boxes in tiles:
+                builder.add_image(tile_path, width, height, box_class, boxes)
+    finally:
+        if workers is not None and workers > 1:
+            executor.shutdown()
+    return builder.build()
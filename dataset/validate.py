@@ -0,0 +1,251 @@
+# Validate a dataset and collect its statistics in one vectorized pass, reported as JSON
+import argparse
+import json
+import os
+
+import numpy as np
+
+from dataset.core import as_float64
+from dataset.readers import READERS, read_dataset
+
+BOX_ISSUES = ('non_finite', 'degenerate', 'too_small', 'out_of_bounds', 'duplicate', 'unknown_label')
+IMAGE_ISSUES = ('missing_image', 'unknown_size', 'no_annotations')
+
+# COCO's small / medium / large split on box area
+AREA_BUCKETS = (32 ** 2, 96 ** 2)
+PERCENTILES = (0, 1, 5, 25, 50, 75, 95, 99, 100)
+# Largest images x classes table used to count the images per class without a sort
+PRESENCE_LIMIT = 1 << 28
+
+
+def duplicate_boxes(dataset):
+    """ (B,) bool mask of boxes equal to an earlier box of the same image and class.
+
+    Rows are hashed to one int64 key. Sorting the keys (without an argsort) finds the few keys that
+    occur more than once; only the boxes with those keys are ordered and compared in full, so hash
+    collisions never produce false duplicates.
+    """
+    num_boxes = dataset.num_boxes
+    duplicate = np.zeros(num_boxes, dtype=bool)
+    if num_boxes < 2:
+        return duplicate
+    # + 0.0 maps -0.0 to 0.0 so that both get the same bits
+    coords = (dataset.boxes + np.float32(0.0)).view(np.int32).astype(np.int64)
+    keys = dataset.box_image.astype(np.int64) * np.int64(1000003) + dataset.box_class
+    for column in range(4):
+        keys = keys * np.int64(0x100000001b3) ^ coords[:, column]
+    sorted_keys = np.sort(keys)
+    repeated = np.unique(sorted_keys[1:][sorted_keys[1:] == sorted_keys[:-1]])
+    if len(repeated) == 0:
+        return duplicate
+
+    candidates = np.flatnonzero(np.isin(keys, repeated))
+    candidates = candidates[np.argsort(keys[candidates], kind='stable')]
+    current, previous = candidates[1:], candidates[:-1]
+    same = (keys[current] == keys[previous]) & \
+           (dataset.box_image[current] == dataset.box_image[previous]) & \
+           (dataset.box_class[current] == dataset.box_class[previous]) & \
+           (coords[current] == coords[previous]).all(axis=1)
+    # Within a run of equal keys the stable sort keeps the original order, so the later box is flagged
+    duplicate[current[same]] = True
+    return duplicate
+
+
+def geometry_issues(dataset, min_size=1.0):
+    """ Dict of (B,) bool masks of the non_finite, degenerate, too_small and out_of_bounds boxes.
+
+    Boxes of images with an unknown size are never out_of_bounds.
+    """
+    boxes = dataset.boxes
+    widths = boxes[:, 2] - boxes[:, 0]
+    heights = boxes[:, 3] - boxes[:, 1]
+    sizes = dataset.image_sizes[dataset.box_image].astype(np.float32)
+    known = (sizes > 0).all(axis=1)
+
+    issues = {}
+    issues['non_finite'] = ~np.isfinite(boxes).all(axis=1)
+    issues['degenerate'] = (widths <= 0) | (heights <= 0)
+    issues['too_small'] = ~issues['degenerate'] & ((widths < min_size) | (heights < min_size))
+    issues['out_of_bounds'] = known & ((boxes[:, :2] < 0).any(axis=1) |
+                                       (boxes[:, 2] > sizes[:, 0]) | (boxes[:, 3] > sizes[:, 1]))
+    return issues
+
+
+def box_issues(dataset, class_names=None, min_size=1.0):
+    """ Dict of (B,) bool masks, one per BOX_ISSUES entry.
+
+    Args
+        dataset: dataset.core.Dataset.
+        class_names: Allowed class names; None allows every class of the dataset.
+        min_size: Boxes narrower or lower than this many pixels (but not degenerate) are too_small.
+    """
+    issues = geometry_issues(dataset, min_size=min_size)
+    issues['duplicate'] = duplicate_boxes(dataset)
+    if class_names is None:
+        issues['unknown_label'] = np.zeros(dataset.num_boxes, dtype=bool)
+    else:
+        issues['unknown_label'] = (dataset.class_id_map(class_names) < 0)[dataset.box_class]
+    return issues
+
+
+def missing_images(dataset):
+    """ (I,) bool mask of images whose file does not exist, listing every image folder once.
+    """
+    missing = np.ones(len(dataset), dtype=bool)
+    for dir_ind, folder in enumerate(dataset.dirs):
+        try:
+            existing = set(os.listdir(folder))
+        except OSError:
+            continue
+        for ind in np.flatnonzero(dataset.image_dir == dir_ind).tolist():
+            missing[ind] = dataset.image_names[ind] not in existing
+    return missing
+
+
+def image_issues(dataset, check_files=True):
+    """ Dict of (I,) bool masks, one per IMAGE_ISSUES entry.
+    """
+    issues = {}
+    if check_files is True:
+        issues['missing_image'] = missing_images(dataset)
+    else:
+        issues['missing_image'] = np.zeros(len(dataset), dtype=bool)
+    issues['unknown_size'] = (dataset.image_sizes <= 0).any(axis=1)
+    issues['no_annotations'] = np.diff(dataset.offsets) == 0
+    return issues
+
+
+def distribution(values):
+    """ Count, mean and percentiles of values, as plain floats for JSON.
+    """
+    values = np.asarray(values)
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return {'count': 0}
+    result = {'count': int(len(values)), 'mean': float(values.mean(dtype=np.float64))}
+    percentiles = as_float64(np.percentile(values, PERCENTILES).astype(values.dtype))
+    for percentile, value in zip(PERCENTILES, percentiles.tolist()):
+        result['p{}'.format(percentile)] = value
+    return result
+
+
+def statistics(dataset):
+    """ Class histograms and box / image size distributions of the dataset.
+    """
+    boxes = dataset.boxes
+    widths = boxes[:, 2] - boxes[:, 0]
+    heights = boxes[:, 3] - boxes[:, 1]
+    areas = widths * heights
+    sizes = dataset.image_sizes[dataset.box_image].astype(np.float32)
+    known = (sizes > 0).all(axis=1)
+    num_classes = len(dataset.class_names)
+
+    box_counts = np.bincount(dataset.box_class, minlength=num_classes)
+    # Every (image, class) pair counted once
+    pairs = dataset.box_image.astype(np.int64) * max(num_classes, 1) + dataset.box_class
+    if len(dataset) * num_classes <= PRESENCE_LIMIT:
+        present = np.zeros((len(dataset), max(num_classes, 1)), dtype=bool)
+        present.reshape(-1)[pairs] = True
+        image_counts = present.sum(axis=0)[:num_classes]
+    else:
+        image_counts = np.bincount(np.unique(pairs) % max(num_classes, 1), minlength=num_classes)
+    area_buckets = np.bincount(np.searchsorted(AREA_BUCKETS, areas[np.isfinite(areas)], side='right'), minlength=3)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        aspect_ratios = widths / heights
+    size_keys, image_size_counts = np.unique(dataset.image_sizes[:, 0].astype(np.int64) << 32 |
+                                             dataset.image_sizes[:, 1].astype(np.uint32), return_counts=True)
+    top_sizes = np.argsort(-image_size_counts, kind='stable')[:20]
+
+    return {
+        'images': len(dataset),
+        'boxes': dataset.num_boxes,
+        'classes': {
+            name: {'boxes': int(box_counts[ind]), 'images': int(image_counts[ind])}
+            for ind, name in enumerate(dataset.class_names)
+        },
+        'boxes_per_image': distribution(np.diff(dataset.offsets)),
+        'box_width': distribution(widths),
+        'box_height': distribution(heights),
+        'box_area': distribution(areas),
+        'box_area_buckets': dict(zip(('small', 'medium', 'large'), area_buckets.tolist())),
+        'box_aspect_ratio': distribution(aspect_ratios),
+        'box_relative_width': distribution(widths[known] / sizes[known, 0]),
+        'box_relative_height': distribution(heights[known] / sizes[known, 1]),
+        'image_sizes': [{'width': int(size_keys[ind] >> 32), 'height': int(size_keys[ind] & 0xffffffff),
+                         'images': int(image_size_counts[ind])} for ind in top_sizes.tolist()]
+    }
+
+
+def validate(dataset, class_names=None, min_size=1.0, check_files=True, max_examples=100, annotation_errors=()):
+    """ Run every check and return the JSON-serialisable report.
+
+    Every problem is counted; the first max_examples of each kind are listed with their image and
+    box (max_examples=None lists all of them). annotation_errors are the (path, message) of annotation
+    files the reader skipped (see dataset.readers.read_voc), reported as unreadable_annotation.
+    """
+    report = {'summary': {}, 'box_issues': {}, 'image_issues': {}}
+    report['summary']['unreadable_annotation'] = len(annotation_errors)
+    report['unreadable_annotation'] = [{'file': path, 'error': message}
+                                       for path, message in list(annotation_errors)[:max_examples]]
+    for issue, mask in box_issues(dataset, class_names=class_names, min_size=min_size).items():
+        indices = np.flatnonzero(mask)
+        report['summary'][issue] = int(len(indices))
+        report['box_issues'][issue] = [{
+            'image': dataset.image_path(image_ind),
+            'class': dataset.class_names[class_ind],
+            'box': box
+        } for image_ind, class_ind, box in zip(dataset.box_image[indices[:max_examples]].tolist(),
+                                               dataset.box_class[indices[:max_examples]].tolist(),
+                                               dataset.boxes[indices[:max_examples]].tolist())]
+    for issue, mask in image_issues(dataset, check_files=check_files).items():
+        indices = np.flatnonzero(mask)
+        report['summary'][issue] = int(len(indices))
+        report['image_issues'][issue] = [dataset.image_path(ind) for ind in indices[:max_examples].tolist()]
+    if class_names is not None:
+        report['unknown_classes'] = [name for name in dataset.class_names if name not in set(class_names)]
+    report['statistics'] = statistics(dataset)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate a dataset and write a JSON report")
+    parser.add_argument("--format", type=str, choices=sorted(READERS))
+    parser.add_argument("--dataset_dir", type=str)
+    parser.add_argument("--set_name", type=str, default="train", help="COCO set name")
+    parser.add_argument("--classes", type=str, default=None, help="Comma separated allowed class names")
+    parser.add_argument("--min_size", type=float, default=1.0, help="Minimum box width / height in pixels")
+    parser.add_argument("--max_examples", type=int, default=100, help="Examples listed per issue, -1 for all")
+    parser.add_argument("--skip_files", action="store_true", help="Do not check that image files exist")
+    parser.add_argument("--output", type=str, default=None, help="Report path (default: print)")
+    args = parser.parse_args()
+
+    annotation_errors = []
+    if args.format == 'coco':
+        dataset = read_dataset('coco', args.dataset_dir, args.set_name)
+    elif args.format == 'voc':
+        # Every file is parsed leniently (not cached) so that each broken one is reported
+        dataset = read_dataset('voc', args.dataset_dir, cache=False, errors=annotation_errors)
+    elif args.format == 'yolo':
+        # Unclipped, so that boxes running off the image are reported
+        dataset = read_dataset('yolo', args.dataset_dir, clip=False)
+    else:
+        dataset = read_dataset(args.format, args.dataset_dir)
+    class_names = args.classes.split(",") if args.classes else None
+    report = validate(dataset, class_names=class_names, min_size=args.min_size, check_files=not args.skip_files,
+                      max_examples=None if args.max_examples < 0 else args.max_examples,
+                      annotation_errors=annotation_errors)
+
+    if args.output is None:
+        print(json.dumps(report, indent=4))
+    else:
+        with open(args.output, 'w') as fp:
+            json.dump(report, fp, indent=4)
+        print("Wrote {}".format(args.output))
+    for issue, count in report['summary'].items():
+        if count > 0:
+            print("{}: {}".format(issue, count))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+# Pack a dataset into WebDataset style tar shards and stream them back
+import io
+import json
+import os
+import re
+import tarfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from dataset.core import as_float64, probe_image_sizes
+
+INDEX_NAME = "index.json"
+SHARD_NAME = "shard-{:06d}.tar"
+# WebDataset splits member names at the first dot into sample key and extension
+_KEY_UNSAFE = re.compile(r'[^0-9A-Za-z_\-]')
+
+
+def sample_keys(dataset):
+    """ One WebDataset key per image: the file name without extension, with dots and other unsafe
+    characters replaced by '_'. Clashing keys get the image index appended.
+    """
+    keys = []
+    seen = set()
+    for ind, image_name in enumerate(dataset.image_names):
+        key = _KEY_UNSAFE.sub('_', os.path.splitext(image_name)[0])
+        while key in seen:
+            key = "{}_{}".format(key, ind)
+        seen.add(key)
+        keys.append(key)
+    return keys
+
+
+def _sample_annotation(dataset, ind, width, height):
+    box_class, boxes = dataset.image_boxes(ind)
+    return {
+        'file_name': dataset.image_names[ind],
+        'width': width,
+        'height': height,
+        'labels': [dataset.class_names[class_id] for class_id in box_class.tolist()],
+        'boxes': as_float64(boxes).tolist()
+    }
+
+
+def _add_member(tar, name, fileobj, size):
+    info = tarfile.TarInfo(name)
+    info.size = size
+    # Fixed metadata so that the same dataset always gives the same bytes
+    info.mtime = 0
+    info.mode = 0o644
+    tar.addfile(info, fileobj)
+    # The data is padded to whole blocks and directly follows the header(s)
+    padded = (size + tarfile.BLOCKSIZE - 1) // tarfile.BLOCKSIZE * tarfile.BLOCKSIZE
+    return tar.offset - padded, size
+
+
+def write_shard(shard_path, samples):
+    """ Write one tar shard and return its index entry.
+
+    samples is a list of (key, image_path, annotation dict); every sample is stored as <key>.<image ext>
+    followed by <key>.json. The index entry lists the data offset and size of each member.
+    """
+    entries = []
+    num_bytes = 0
+    tmp_path = shard_path + '.tmp'
+    with open(tmp_path, 'wb') as fp, tarfile.open(fileobj=fp, mode='w', format=tarfile.GNU_FORMAT) as tar:
+        for key, image_path, annotation in samples:
+            extension = os.path.splitext(image_path)[1][1:].lower() or 'jpg'
+            members = {}
+            with open(image_path, 'rb') as image_fp:
+                size = os.fstat(image_fp.fileno()).st_size
+                members[extension] = _add_member(tar, key + '.' + extension, image_fp, size)
+            content = json.dumps(annotation, separators=(',', ':')).encode('utf-8')
+            members['json'] = _add_member(tar, key + '.json', io.BytesIO(content), len(content))
+            entries.append({'key': key, 'members': members})
+            num_bytes += size + len(content)
+    os.replace(tmp_path, shard_path)
+    return {'name': os.path.basename(shard_path), 'samples': entries, 'bytes': num_bytes}
+
+
+def write_webdataset(dataset, output_dir, samples_per_shard=1000, workers=8):
+    """ Pack images and their annotations into tar shards of samples_per_shard samples each.
+
+    Shards are written on a process pool (at most workers * 2 shards in flight) to
+    output_dir/shard-000000.tar, ...; output_dir/index.json lists the class names and, for every
+    shard, its samples with the offset and size of each member, so that a single sample can be read
+    with one seek (see ShardIndex). Sample annotations are json: file_name, width, height, labels and
+    boxes (xmin, ymin, xmax, ymax in pixels).
+
+    Returns the index.
+    """
+    output_dir = os.path.expanduser(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    image_sizes = probe_image_sizes(dataset).tolist()
+    keys = sample_keys(dataset)
+    num_shards = -(-len(dataset) // samples_per_shard)
+
+    def shard_samples(shard_ind):
+        start = shard_ind * samples_per_shard
+        stop = min(start + samples_per_shard, len(dataset))
+        return [(keys[ind], dataset.image_path(ind), _sample_annotation(dataset, ind, *image_sizes[ind]))
+                for ind in range(start, stop)]
+
+    shards = []
+    if workers is None or workers <= 1:
+        for shard_ind in range(num_shards):
+            shard_path = os.path.join(output_dir, SHARD_NAME.format(shard_ind))
+            shards.append(write_shard(shard_path, shard_samples(shard_ind)))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for shard_ind in range(num_shards):
+                shard_path = os.path.join(output_dir, SHARD_NAME.format(shard_ind))
+                pending.append(executor.submit(write_shard, shard_path, shard_samples(shard_ind)))
+                if len(pending) >= workers * 2:
+                    shards.append(pending.popleft().result())
+            while pending:
+                shards.append(pending.popleft().result())
+
+    index = {'classes': dataset.class_names, 'samples': len(dataset), 'shards': shards}
+    with open(os.path.join(output_dir, INDEX_NAME), 'w') as fp:
+        json.dump(index, fp, separators=(',', ':'))
+    return index
+
+
+def shard_paths(shards_dir):
+    """ Shard files of shards_dir in order, from its index (or sorted by name without one).
+    """
+    shards_dir = os.path.expanduser(shards_dir)
+    index_path = os.path.join(shards_dir, INDEX_NAME)
+    if os.path.isfile(index_path):
+        with open(index_path, 'r') as fp:
+            return [os.path.join(shards_dir, shard['name']) for shard in json.load(fp)['shards']]
+    return sorted(os.path.join(shards_dir, name) for name in os.listdir(shards_dir) if name.endswith('.tar'))
+
+
+def _decode(extension, content):
+    return json.loads(content) if extension == 'json' else content
+
+
+def iter_webdataset(shards, decode=True, buffer_size=1 << 22):
+    """ Stream samples out of tar shards, front to back, without seeking.
+
+    Args
+        shards: A folder written by write_webdataset, or a list of shard paths (e.g. this worker's part).
+        decode: Parse the json members; otherwise every member is returned as bytes.
+        buffer_size: Read buffer of each shard file; large reads keep network filesystems at their
+            sequential bandwidth.
+
+    Yields one dict per sample: {'__key__': key, <extension>: content, ...}.
+    """
+    if isinstance(shards, str):
+        shards = shard_paths(shards)
+    for path in shards:
+        sample = None
+        with open(path, 'rb', buffering=buffer_size) as fp, tarfile.open(fileobj=fp, mode='r|') as tar:
+            for member in tar:
+                if member.isfile() is False:
+                    continue
+                key, _, extension = member.name.partition('.')
+                if sample is not None and sample['__key__'] != key:
+                    yield sample
+                    sample = None
+                if sample is None:
+                    sample = {'__key__': key}
+                content = tar.extractfile(member).read()
+                sample[extension] = _decode(extension, content) if decode is True else content
+        if sample is not None:
+            yield sample
+
+
+class ShardIndex:
+    """ Random access to single samples of a folder written by write_webdataset.
+    """
+
+    def __init__(self, shards_dir):
+        self.shards_dir = os.path.expanduser(shards_dir)
+        with open(os.path.join(self.shards_dir, INDEX_NAME), 'r') as fp:
+            index = json.load(fp)
+        self.class_names = index['classes']
+        self.samples = {}
+        for shard in index['shards']:
+            for entry in shard['samples']:
+                self.samples[entry['key']] = (shard['name'], entry['members'])
+
+    def __len__(self):
+        return len(self.samples)
+
+    def keys(self):
+        return list(self.samples)
+
+    def read(self, key, decode=True):
+        """ Returns the sample dict of key, like iter_webdataset.
+        """
+        shard_name, members = self.samples[key]
+        sample = {'__key__': key}
+        with open(os.path.join(self.shards_dir, shard_name), 'rb') as fp:
+            for extension, (offset, size) in members.items():
+                fp.seek(offset)
+                content = fp.read(size)
+                sample[extension] = _decode(extension, content) if decode is True else content
+        return sample
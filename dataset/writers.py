@@ -0,0 +1,237 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from common.coco_writer import CocoJsonWriter
+from common.staging import Stager
+from common.voc_xml import write_voc_xml
+from dataset.core import as_float64, probe_image_sizes
+from dataset.webdataset import write_webdataset
+
+VOTT_COLORS = [
+    "#808000", "#800000", "#FFFF00", "#FF0000",
+    "#8F0080", "#8F0000", "#8FFF00", "#8F0000",
+    "#8F0F80", "#8F0F00", "#8FFFF0", "#8F0F00",
+]
+
+
+def _stage_images(dataset, image_dir, stage_mode, workers):
+    if stage_mode is None:
+        return
+    os.makedirs(image_dir, exist_ok=True)
+    with Stager(mode=stage_mode, workers=workers) as stager:
+        for ind in range(len(dataset)):
+            stager.submit(dataset.image_path(ind), os.path.join(image_dir, dataset.image_names[ind]))
+
+
+def write_voc(dataset, voc_dir, stage_mode=None, workers=8):
+    voc_dir = os.path.expanduser(voc_dir)
+    voc_ann_dir = os.path.join(voc_dir, "Annotations")
+    os.makedirs(voc_ann_dir, exist_ok=True)
+    image_sizes = probe_image_sizes(dataset)
+
+    for ind, image_file in enumerate(dataset.image_names):
+        width, height = image_sizes[ind].tolist()
+        box_class, boxes = dataset.image_boxes(ind)
+        write_voc_xml(os.path.join(voc_ann_dir, os.path.splitext(image_file)[0] + '.xml'), image_file,
+                      os.path.basename(dataset.dirs[dataset.image_dir[ind]]), width, height,
+                      [dataset.class_names[class_id] for class_id in box_class.tolist()], boxes)
+
+    _stage_images(dataset, os.path.join(voc_dir, "JPEGImages"), stage_mode, workers)
+
+
+def write_yolo(dataset, yolo_dir, class_names=None, stage_mode=None, workers=8):
+    """ Write <name>.txt label files (and optionally the images) into yolo_dir.
+
+    class_names gives the YOLO class id order; the dataset's class order is used when it is None.
+    """
+    yolo_dir = os.path.expanduser(yolo_dir)
+    os.makedirs(yolo_dir, exist_ok=True)
+    class_map = dataset.class_id_map(class_names) if class_names is not None else None
+    image_sizes = probe_image_sizes(dataset).astype(np.float64)
+
+    for ind, image_file in enumerate(dataset.image_names):
+        width, height = image_sizes[ind]
+        box_class, boxes = dataset.image_boxes(ind)
+        if class_map is not None:
+            box_class = class_map[box_class]
+        boxes = boxes.astype(np.float64)
+        labels = np.stack([
+            (boxes[:, 0] + boxes[:, 2]) / 2 / width,
+            (boxes[:, 1] + boxes[:, 3]) / 2 / height,
+            (boxes[:, 2] - boxes[:, 0]) / width,
+            (boxes[:, 3] - boxes[:, 1]) / height
+        ], axis=1)
+        with open(os.path.join(yolo_dir, os.path.splitext(image_file)[0] + '.txt'), 'w') as fp:
+            for class_id, label in zip(box_class.tolist(), labels):
+                fp.write("{} {:.6f} {:.6f} {:.6f} {:.6f}\n".format(class_id, *label))
+
+    _stage_images(dataset, yolo_dir, stage_mode, workers)
+
+
+def coco_annotations(category_ids, boxes):
+    """ COCO annotations (without image_id / id) of the float32 boxes (xmin, ymin, xmax, ymax).
+    """
+    boxes = as_float64(boxes)
+    boxes[:, 2:] -= boxes[:, :2]
+    areas = as_float64((boxes[:, 2] * boxes[:, 3]).astype(np.float32)).tolist()
+    return [{
+        'area': area,
+        'iscrowd': 0,
+        'bbox': bbox,
+        'category_id': category_id,
+        'ignore': 0,
+        'segmentation': []
+    } for category_id, bbox, area in zip(category_ids, boxes.tolist(), areas)]
+
+
+def write_coco(dataset, coco_dir, coco_set_name, label2id=None, indent=4, stage_mode=None, workers=8):
+    """ Write annotations/instances_<coco_set_name>.json (and optionally the images).
+
+    Category ids come from label2id, or from dataset.class_ids; image ids from dataset.image_ids.
+    """
+    coco_dir = os.path.expanduser(coco_dir)
+    if label2id is None:
+        label2id = dict(zip(dataset.class_names, dataset.class_ids.tolist()))
+    category_ids = np.array([label2id[name] for name in dataset.class_names], dtype=np.int64)
+    categories = [{'supercategory': 'none', 'id': label_id, 'name': label} for label, label_id in label2id.items()]
+    coco_ann_path = os.path.join(coco_dir, "annotations", "instances_" + coco_set_name + '.json')
+    image_sizes = probe_image_sizes(dataset).tolist()
+    image_ids = dataset.image_ids.tolist()
+
+    bnd_id = 1
+    with CocoJsonWriter(coco_ann_path, categories, indent=indent) as writer:
+        for ind, image_file in enumerate(dataset.image_names):
+            image_id = image_ids[ind]
+            width, height = image_sizes[ind]
+            writer.add_image({'file_name': image_file, 'height': height, 'width': width, 'id': image_id})
+
+            box_class, boxes = dataset.image_boxes(ind)
+            for ann in coco_annotations(category_ids[box_class].tolist(), boxes):
+                ann.update({'image_id': image_id, 'id': bnd_id})
+                writer.add_annotation(ann)
+                bnd_id += 1
+
+    _stage_images(dataset, os.path.join(coco_dir, "images", coco_set_name), stage_mode, workers)
+
+
+def vott_asset_id(asset_path):
+    """ Deterministic 32 character VoTT asset id: the md5 of the asset's "file:" path, as VoTT computes it.
+    """
+    if not asset_path.startswith("file:"):
+        asset_path = "file:" + os.path.abspath(asset_path)
+    return hashlib.md5(asset_path.encode('utf-8')).hexdigest()
+
+
+def vott_region_id(asset_id, region_index):
+    return hashlib.md5("{}-{}".format(asset_id, region_index).encode('utf-8')).hexdigest()
+
+
+def vott_asset(dataset, ind, width, height):
+    image_path = os.path.abspath(dataset.image_path(ind))
+    asset_id = vott_asset_id(image_path)
+    box_class, boxes = dataset.image_boxes(ind)
+    regions = []
+    for region_ind, (class_id, (xmin, ymin, xmax, ymax)) in enumerate(zip(box_class.tolist(),
+                                                                         as_float64(boxes).tolist())):
+        regions.append({
+            'id': vott_region_id(asset_id, region_ind),
+            'type': "RECTANGLE",
+            'tags': [dataset.class_names[class_id]],
+            "boundingBox": {
+                "height": ymax - ymin,
+                "width": xmax - xmin,
+                "left": xmin,
+                "top": ymin
+            },
+            'points': [
+                {"x": xmin, "y": ymin},
+                {"x": xmax, "y": ymin},
+                {"x": xmax, "y": ymax},
+                {"x": xmin, "y": ymax}
+            ]
+        })
+    return {
+        "asset": {
+            "name": dataset.image_names[ind],
+            "path": "file:" + image_path,
+            "size": {
+                "width": width,
+                "height": height
+            },
+            "id": asset_id,
+            "format": dataset.image_names[ind].split('.')[-1],
+            "state": 2,
+            "type": 1
+        },
+        "regions": regions,
+        "version": "2.1.0"
+    }
+
+
+def write_vott(dataset, vott_dir, indent=4):
+    """ Write <id>-asset.json files into vott_dir.
+
+    If vott_dir holds exactly one .vott project, <project>.vott.json is written with the tags and
+    assets, like Voc2Vott does.
+    """
+    vott_dir = os.path.expanduser(vott_dir)
+    os.makedirs(vott_dir, exist_ok=True)
+    image_sizes = probe_image_sizes(dataset).tolist()
+
+    vott_assets = {}
+    for ind in range(len(dataset)):
+        width, height = image_sizes[ind]
+        asset_data = vott_asset(dataset, ind, width, height)
+        asset_id = asset_data['asset']['id']
+        vott_assets[asset_id] = asset_data['asset']
+        with open(os.path.join(vott_dir, "{}-asset.json".format(asset_id)), 'w') as fp:
+            json.dump(asset_data, fp, indent=indent, sort_keys=True)
+
+    vott_projects = list(Path(vott_dir).glob("*.vott"))
+    if len(vott_projects) != 1:
+        return
+    dst_vott = str(vott_projects[0].absolute())
+    with open(dst_vott) as fp:
+        vott_data = json.load(fp)
+    vott_data['tags'] = [{"name": tag, "color": VOTT_COLORS[ind % len(VOTT_COLORS)]}
+                         for ind, tag in enumerate(dataset.class_names)]
+    if vott_assets:
+        vott_data['lastVisitedAssetId'] = next(iter(vott_assets))
+    vott_data['assets'] = vott_assets
+    with open(dst_vott + '.json', 'w') as ofp:
+        json.dump(vott_data, ofp, indent=indent, sort_keys=True)
+
+
+def write_kitti(dataset, kitti_dir, stage_mode=None, workers=8):
+    kitti_dir = os.path.expanduser(kitti_dir)
+    kitti_labels_dir = os.path.join(kitti_dir, "label")
+    os.makedirs(kitti_labels_dir, exist_ok=True)
+
+    for ind, image_file in enumerate(dataset.image_names):
+        box_class, boxes = dataset.image_boxes(ind)
+        kitti_labels = ["{} 0 0 0 {} 0 0 0 0 0 0 0".format(dataset.class_names[class_id], " ".join(map(str, box)))
+                        for class_id, box in zip(box_class.tolist(), boxes)]
+        with open(os.path.join(kitti_labels_dir, os.path.splitext(image_file)[0] + '.txt'), 'w') as fp:
+            fp.write("\n".join(kitti_labels))
+
+    _stage_images(dataset, os.path.join(kitti_dir, "image"), stage_mode, workers)
+
+
+WRITERS = {
+    'voc': write_voc,
+    'yolo': write_yolo,
+    'coco': write_coco,
+    'vott': write_vott,
+    'kitti': write_kitti,
+    'webdataset': write_webdataset
+}
+
+
+def write_dataset(dataset, dataset_format, *args, **kwargs):
+    if dataset_format not in WRITERS:
+        raise ValueError("Unknown format {}, expected one of {}".format(dataset_format, sorted(WRITERS)))
+    return WRITERS[dataset_format](dataset, *args, **kwargs)
@@ -0,0 +1,32 @@
+# Merge COCO annotation shards into one file
+import argparse
+
+from common.coco_shards import find_shards, merge_coco_shards
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge COCO annotation files (e.g. shards written by VOC2COCO)")
+    parser.add_argument("shards", type=str, nargs="*",
+                        help="COCO json files in merge order (default: every shard of --output)")
+    parser.add_argument("--output", type=str, help="Merged COCO json, e.g. annotations/instances_train.json")
+    parser.add_argument("--renumber", action="store_true",
+                        help="Renumber ids consecutively (otherwise only clashing shards are renumbered)")
+    parser.add_argument("--compact", action="store_true", help="Write compact json instead of indent=4")
+    args = parser.parse_args()
+
+    try:
+        shards = args.shards or find_shards(args.output)
+    except ValueError as e:
+        parser.error(str(e))
+    if len(shards) == 0:
+        parser.error("No shards given or found next to {}".format(args.output))
+    try:
+        num_images, num_annotations = merge_coco_shards(shards, args.output, renumber=args.renumber,
+                                                        indent=None if args.compact else 4)
+    except ValueError as e:
+        parser.error(str(e))
+    print("Merged {} shards: {} images, {} annotations".format(len(shards), num_images, num_annotations))
+
+
+if __name__ == "__main__":
+    main()
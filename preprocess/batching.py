@@ -0,0 +1,142 @@
+"""
+Aspect-ratio grouped batching and background prefetching for the generators in this folder.
+
+A generator only needs size(), image_aspect_ratio(i), load_image(i) and load_annotations(i).
+"""
+
+import collections
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+
+class AspectRatioBatchSampler:
+    """ Yields batches of image indices whose aspect ratios are close, to minimise padding.
+
+    Images are bucketed on the log of their aspect ratio; batches are cut inside a bucket
+    (shuffled first when shuffle=True) and the order of the batches is shuffled as well.
+    """
+
+    def __init__(self, aspect_ratios, batch_size, shuffle=True, num_buckets=16, drop_last=False, seed=None):
+        self.aspect_ratios = np.asarray(aspect_ratios, dtype=np.float64)
+        self.batch_size    = batch_size
+        self.shuffle       = shuffle
+        self.num_buckets   = num_buckets
+        self.drop_last     = drop_last
+        self.random        = np.random.RandomState(seed)
+
+        log_ratios = np.log(self.aspect_ratios)
+        edges      = np.linspace(log_ratios.min(), log_ratios.max(), num_buckets + 1)[1:-1] if len(log_ratios) else []
+        self.buckets = np.digitize(log_ratios, edges)
+
+    def batches(self):
+        order = self.random.permutation(len(self.aspect_ratios)) if self.shuffle else np.arange(len(self.aspect_ratios))
+        if self.shuffle:
+            # stable sort keeps the shuffled order inside each bucket
+            order = order[np.argsort(self.buckets[order], kind='stable')]
+        else:
+            order = np.argsort(self.aspect_ratios, kind='stable')
+
+        batches = []
+        for bucket in np.unique(self.buckets):
+            indices = order[self.buckets[order] == bucket]
+            for start in range(0, len(indices), self.batch_size):
+                batch = indices[start:start + self.batch_size]
+                if len(batch) < self.batch_size and self.drop_last:
+                    continue
+                batches.append(batch.tolist())
+        if self.shuffle:
+            self.random.shuffle(batches)
+        return batches
+
+    def __iter__(self):
+        return iter(self.batches())
+
+    def __len__(self):
+        counts = np.bincount(self.buckets)
+        if self.drop_last:
+            return int(np.sum(counts // self.batch_size))
+        return int(np.sum(-(-counts // self.batch_size)))
+
+
+def resize_scale(height, width, min_side=800, max_side=1333):
+    """ Scale so the smallest side is min_side without the largest side exceeding max_side.
+    """
+    scale = min_side / min(height, width)
+    if max(height, width) * scale > max_side:
+        scale = max_side / max(height, width)
+    return scale
+
+
+def load_sample(generator, image_index, min_side=800, max_side=1333):
+    """ Load, resize and scale one sample. Returns (image, boxes) with boxes as (N, 5) x1, y1, x2, y2, label.
+    """
+    image       = generator.load_image(image_index)
+    annotations = generator.load_annotations(image_index)
+
+    scale = resize_scale(image.shape[0], image.shape[1], min_side=min_side, max_side=max_side)
+    if scale != 1:
+        image = cv2.resize(image, None, fx=scale, fy=scale)
+    boxes = np.empty((len(annotations['labels']), 5), dtype=np.float32)
+    boxes[:, :4] = annotations['bboxes'] * scale
+    boxes[:, 4]  = annotations['labels']
+    return image, boxes
+
+
+def collate(samples, pad_value=0):
+    """ Pad a list of (image, boxes) samples into an image batch and a box batch padded with -1.
+    """
+    max_height = max(image.shape[0] for image, _ in samples)
+    max_width  = max(image.shape[1] for image, _ in samples)
+    max_boxes  = max(len(boxes) for _, boxes in samples)
+    first      = samples[0][0]
+
+    images = np.full((len(samples), max_height, max_width) + first.shape[2:], pad_value, dtype=first.dtype)
+    boxes  = np.full((len(samples), max_boxes, 5), -1, dtype=np.float32)
+    for ind, (image, sample_boxes) in enumerate(samples):
+        images[ind, :image.shape[0], :image.shape[1]] = image
+        boxes[ind, :len(sample_boxes)] = sample_boxes
+    return images, boxes
+
+
+class PrefetchLoader:
+    """ Decodes and resizes the samples of upcoming batches on a worker pool.
+
+    At most `prefetch` batches are in flight, which bounds memory; iterating yields
+    (images, boxes) NumPy batches as produced by collate().
+    """
+
+    def __init__(self, generator, batch_sampler, min_side=800, max_side=1333, workers=4, prefetch=2,
+                 use_processes=False):
+        self.generator     = generator
+        self.batch_sampler = batch_sampler
+        self.min_side      = min_side
+        self.max_side      = max_side
+        self.workers       = workers
+        self.prefetch      = max(1, prefetch)
+        self.use_processes = use_processes
+
+    def __len__(self):
+        return len(self.batch_sampler)
+
+    def _submit(self, executor, batch):
+        return [executor.submit(load_sample, self.generator, image_index, self.min_side, self.max_side)
+                for image_index in batch]
+
+    def __iter__(self):
+        # processes avoid the GIL for pure-Python generators, but the generator has to be picklable
+        executor_class = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+        with executor_class(max_workers=self.workers) as executor:
+            batches   = iter(self.batch_sampler)
+            in_flight = collections.deque()
+            for batch in batches:
+                in_flight.append(self._submit(executor, batch))
+                if len(in_flight) >= self.prefetch:
+                    break
+            while in_flight:
+                futures = in_flight.popleft()
+                next_batch = next(batches, None)
+                if next_batch is not None:
+                    in_flight.append(self._submit(executor, next_batch))
+                yield collate([future.result() for future in futures])
@@ -16,12 +16,15 @@ limitations under the License.
 
 from ..preprocessing.generator import Generator
 from ..utils.image import read_image_bgr
+from .batching import AspectRatioBatchSampler, PrefetchLoader
 
 import os
 import numpy as np
 
 from pycocotools.coco import COCO
 
+from dataset.readers import load_coco_tables
+
 
 class CocoGenerator(Generator):
     """ Generate data from the COCO dataset.
@@ -38,24 +41,34 @@ class CocoGenerator(Generator):
         """
         self.data_dir  = data_dir
         self.set_name  = set_name
-        self.coco      = COCO(os.path.join(data_dir, 'annotations', 'instances_' + set_name + '.json'))
-        self.image_ids = self.coco.getImgIds()
+        self._coco     = None
+
+        # full precision COCO bboxes, the columnar dataset.core.Dataset would round them to float32
+        self.categories, self.images, self.box_image, self.box_class, self.coco_bboxes = load_coco_tables(
+            data_dir, set_name, include_crowd=False)
+        self.image_ids = [image['id'] for image in self.images]
 
         self.load_classes()
+        self.load_annotation_tables()
 
         super(CocoGenerator, self).__init__(**kwargs)
 
+    @property
+    def coco(self):
+        """ The pycocotools COCO object, only loaded when needed (e.g. for evaluation).
+        """
+        if self._coco is None:
+            self._coco = COCO(os.path.join(self.data_dir, 'annotations', 'instances_' + self.set_name + '.json'))
+        return self._coco
+
     def load_classes(self):
         """ Loads the class to label mapping (and inverse) for COCO.
         """
-        # load class names (name -> label)
-        categories = self.coco.loadCats(self.coco.getCatIds())
-        categories.sort(key=lambda x: x['id'])
-
+        # load class names (name -> label), the categories are sorted by id
         self.classes             = {}
         self.coco_labels         = {}
         self.coco_labels_inverse = {}
-        for c in categories:
+        for c in self.categories:
             self.coco_labels[len(self.classes)] = c['id']
             self.coco_labels_inverse[c['id']] = len(self.classes)
             self.classes[c['name']] = len(self.classes)
@@ -65,6 +78,25 @@ class CocoGenerator(Generator):
         for key, value in self.classes.items():
             self.labels[value] = key
 
+    def load_annotation_tables(self):
+        """ Precompute the per-image tables so that every per-sample lookup is O(1).
+
+        Labels and boxes of all images are kept in one flat array each, sorted by image, with
+        offsets[i]:offsets[i + 1] selecting the boxes of image i.
+        """
+        bboxes = self.coco_bboxes
+
+        # some annotations have basically no width / height, skip them
+        keep  = (bboxes[:, 2] >= 1) & (bboxes[:, 3] >= 1)
+        # stable, so the boxes of an image stay in file order
+        order = np.flatnonzero(keep)[np.argsort(self.box_image[keep], kind='stable')]
+
+        self.annotation_labels  = self.box_class[order].astype(np.float64)
+        self.annotation_bboxes  = np.concatenate([bboxes[order, :2], bboxes[order, :2] + bboxes[order, 2:]], axis=1)
+        self.annotation_offsets = np.searchsorted(self.box_image[order], np.arange(len(self.images) + 1))
+        self.image_paths        = [os.path.join(self.data_dir, 'images', self.set_name, image['file_name']) for image in self.images]
+        self.aspect_ratios      = np.array([float(image['width']) / float(image['height']) for image in self.images])
+
     def size(self):
         """ Size of the COCO dataset.
         """
@@ -114,15 +146,12 @@ class CocoGenerator(Generator):
     def image_path(self, image_index):
         """ Returns the image path for image_index.
         """
-        image_info = self.coco.loadImgs(self.image_ids[image_index])[0]
-        path       = os.path.join(self.data_dir, 'images', self.set_name, image_info['file_name'])
-        return path
+        return self.image_paths[image_index]
 
     def image_aspect_ratio(self, image_index):
         """ Compute the aspect ratio for an image with image_index.
         """
-        image = self.coco.loadImgs(self.image_ids[image_index])[0]
-        return float(image['width']) / float(image['height'])
+        return float(self.aspect_ratios[image_index])
 
     def load_image(self, image_index):
         """ Load an image at the image_index.
@@ -133,27 +162,24 @@ class CocoGenerator(Generator):
     def load_annotations(self, image_index):
         """ Load annotations for an image_index.
         """
-        # get ground truth annotations
-        annotations_ids = self.coco.getAnnIds(imgIds=self.image_ids[image_index], iscrowd=False)
-        annotations     = {'labels': np.empty((0,)), 'bboxes': np.empty((0, 4))}
-
-        # some images appear to miss annotations (like image with id 257034)
-        if len(annotations_ids) == 0:
-            return annotations
-
-        # parse annotations
-        coco_annotations = self.coco.loadAnns(annotations_ids)
-        for idx, a in enumerate(coco_annotations):
-            # some annotations have basically no width / height, skip them
-            if a['bbox'][2] < 1 or a['bbox'][3] < 1:
-                continue
-
-            annotations['labels'] = np.concatenate([annotations['labels'], [self.coco_label_to_label(a['category_id'])]], axis=0)
-            annotations['bboxes'] = np.concatenate([annotations['bboxes'], [[
-                a['bbox'][0],
-                a['bbox'][1],
-                a['bbox'][0] + a['bbox'][2],
-                a['bbox'][1] + a['bbox'][3],
-            ]]], axis=0)
-
-        return annotations
+        # copies, callers scale the boxes in place
+        start, end = self.annotation_offsets[image_index], self.annotation_offsets[image_index + 1]
+        return {
+            'labels': self.annotation_labels[start:end].copy(),
+            'bboxes': self.annotation_bboxes[start:end].copy()
+        }
+
+    def prefetch_batches(self, batch_size, shuffle=True, workers=4, prefetch=2, min_side=800, max_side=1333, seed=None):
+        """ Iterate aspect-ratio grouped batches that are decoded and resized on a thread pool.
+
+        Args
+            batch_size: Number of images per batch.
+            shuffle: Shuffle images within aspect-ratio buckets and the order of the batches.
+            workers: Number of decoding threads.
+            prefetch: Number of batches decoded ahead of the consumer.
+
+        Returns
+            A PrefetchLoader yielding (images, boxes) with boxes as (B, N, 5) x1, y1, x2, y2, label padded with -1.
+        """
+        sampler = AspectRatioBatchSampler(self.aspect_ratios, batch_size, shuffle=shuffle, seed=seed)
+        return PrefetchLoader(self, sampler, min_side=min_side, max_side=max_side, workers=workers, prefetch=prefetch)
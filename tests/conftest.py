@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+
+@pytest.fixture(autouse=True, scope='session')
+def isolated_caches(tmp_path_factory):
+    """ Keep the image size and dataset caches of the test run out of ~/.cache.
+    """
+    cache_dir = tmp_path_factory.mktemp("cache")
+    os.environ['IMAGE_SIZE_CACHE'] = str(cache_dir / "image_size.sqlite3")
+    os.environ['DATASET_CACHE_DIR'] = str(cache_dir / "datasets")
+    yield cache_dir
+
+
+def write_voc_annotation(ann_path, filename, width, height, objects):
+    """ objects: (name, xmin, ymin, xmax, ymax) tuples.
+    """
+    parts = ["<annotation><folder>voc</folder><filename>{}</filename><size><width>{}</width><height>{}</height>"
+             "<depth>3</depth></size>".format(filename, width, height)]
+    for name, xmin, ymin, xmax, ymax in objects:
+        parts.append("<object><name>{}</name><pose>Unspecified</pose><truncated>0</truncated><difficult>0</difficult>"
+                     "<bndbox><xmin>{}</xmin><ymin>{}</ymin><xmax>{}</xmax><ymax>{}</ymax></bndbox></object>".format(
+                         name, xmin, ymin, xmax, ymax))
+    parts.append("</annotation>")
+    with open(str(ann_path), 'w') as fp:
+        fp.write("".join(parts))
+
+
+@pytest.fixture
+def voc_dir(tmp_path):
+    """ A VOC folder of 7 images (sample_0.jpg .. sample_6.jpg) with 0 to 3 boxes each.
+    """
+    from PIL import Image
+
+    root = tmp_path / "voc"
+    (root / "Annotations").mkdir(parents=True)
+    (root / "JPEGImages").mkdir()
+    for ind in range(7):
+        width, height = 64 + 8 * ind, 48
+        filename = "sample_{}.jpg".format(ind)
+        Image.new('RGB', (width, height), (ind * 30, 80, 160)).save(str(root / "JPEGImages" / filename))
+        objects = [("item" if box % 2 == 0 else "person", 2 + box, 3 + box, 20 + 5 * box + ind, 30 + box)
+                   for box in range(ind % 4)]
+        write_voc_annotation(root / "Annotations" / "sample_{}.xml".format(ind), filename, width, height, objects)
+    return str(root)
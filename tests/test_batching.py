@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from preprocess.batching import AspectRatioBatchSampler, PrefetchLoader, collate, load_sample, resize_scale
+
+
+class FakeGenerator:
+    """ Images of the given (height, width) sizes, filled with their index, with one box each.
+    """
+
+    def __init__(self, sizes):
+        self.sizes = sizes
+
+    def size(self):
+        return len(self.sizes)
+
+    def image_aspect_ratio(self, image_index):
+        height, width = self.sizes[image_index]
+        return width / height
+
+    def load_image(self, image_index):
+        return np.full(self.sizes[image_index] + (3,), image_index, dtype=np.uint8)
+
+    def load_annotations(self, image_index):
+        return {'labels': np.array([image_index % 3]), 'bboxes': np.array([[1.0, 2.0, 3.0, 4.0]])}
+
+
+ASPECT_RATIOS = [0.5, 2.0, 0.52, 1.0, 1.98, 1.01, 0.5, 2.0, 1.0, 0.51]
+
+
+@pytest.mark.parametrize('drop_last', [False, True])
+def test_batches_group_aspect_ratios(drop_last):
+    sampler = AspectRatioBatchSampler(ASPECT_RATIOS, batch_size=2, num_buckets=3, drop_last=drop_last, seed=1)
+    batches = sampler.batches()
+    assert len(batches) == len(sampler)
+    for batch in batches:
+        assert len(set(sampler.buckets[batch].tolist())) == 1
+    indices = sorted(ind for batch in batches for ind in batch)
+    if drop_last:
+        assert all(len(batch) == 2 for batch in batches)
+        assert len(batches) == 4
+    else:
+        assert indices == list(range(len(ASPECT_RATIOS)))
+        assert len(batches) == 6
+
+
+def test_seeded_shuffle_is_deterministic():
+    first = AspectRatioBatchSampler(ASPECT_RATIOS, batch_size=2, seed=3).batches()
+    second = AspectRatioBatchSampler(ASPECT_RATIOS, batch_size=2, seed=3).batches()
+    assert first == second
+    ordered = AspectRatioBatchSampler(ASPECT_RATIOS, batch_size=4, shuffle=False, num_buckets=1).batches()
+    assert ordered == [[0, 6, 9, 2], [3, 8, 5, 4], [1, 7]]
+
+
+def test_resize_and_collate():
+    assert resize_scale(100, 200, min_side=50, max_side=1000) == 0.5
+    assert resize_scale(100, 1000, min_side=200, max_side=500) == 0.5
+
+    generator = FakeGenerator([(10, 20), (20, 10)])
+    image, boxes = load_sample(generator, 1, min_side=20, max_side=100)
+    assert image.shape == (40, 20, 3)
+    assert boxes.tolist() == [[2.0, 4.0, 6.0, 8.0, 1.0]]
+
+    images, boxes = collate([load_sample(generator, ind, min_side=10, max_side=100) for ind in range(2)])
+    assert images.shape == (2, 20, 20, 3)
+    assert images[0, 10:].max() == 0 and images[1, :, 10:].max() == 0
+    assert boxes.shape == (2, 1, 5)
+
+
+@pytest.mark.parametrize('prefetch', [1, 3])
+def test_prefetch_loader_keeps_batch_order(prefetch):
+    sizes = [(10, 20), (20, 10), (10, 10), (10, 21), (21, 10)]
+    generator = FakeGenerator(sizes)
+    sampler = AspectRatioBatchSampler([generator.image_aspect_ratio(ind) for ind in range(len(sizes))],
+                                      batch_size=2, seed=0)
+    loader = PrefetchLoader(generator, sampler, min_side=10, max_side=100, workers=3, prefetch=prefetch)
+    batches = list(loader)
+    expected = AspectRatioBatchSampler([generator.image_aspect_ratio(ind) for ind in range(len(sizes))],
+                                       batch_size=2, seed=0).batches()
+    assert len(batches) == len(loader) == len(expected)
+    for (images, boxes), batch in zip(batches, expected):
+        # Every image is filled with its own index
+        assert [int(images[ind, 0, 0, 0]) for ind in range(len(batch))] == batch
+        assert boxes[:, 0, 4].tolist() == [ind % 3 for ind in batch]
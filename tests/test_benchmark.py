@@ -0,0 +1,103 @@
+import os
+
+import numpy as np
+import pytest
+
+from benchmark.run import compare, record_stages, run_benchmarks, run_case, use_fresh_caches
+from benchmark.synthetic import generate_dataset, placeholder_jpeg, synthetic_dataset
+from common.image_size import read_image_size
+from common.instrument import RunStats
+from dataset.readers import read_dataset
+
+CONFIG = {'images': 12, 'boxes': 3, 'classes': 2, 'workers': 2, 'seed': 0, 'full_size': False, 'set_name': "train"}
+
+
+@pytest.fixture
+def fresh_env(monkeypatch):
+    """ Restore the cache variables that use_fresh_caches overwrites.
+    """
+    monkeypatch.setenv('IMAGE_SIZE_CACHE', os.environ['IMAGE_SIZE_CACHE'])
+    monkeypatch.setenv('DATASET_CACHE_DIR', os.environ['DATASET_CACHE_DIR'])
+
+
+def test_placeholder_jpeg_reports_the_full_size(tmp_path):
+    path = str(tmp_path / "tiny.jpg")
+    with open(path, 'wb') as fp:
+        fp.write(placeholder_jpeg(1920, 1080, tiny=True))
+    assert read_image_size(path) == (1920, 1080)
+    assert os.path.getsize(path) < 1000
+
+
+def test_synthetic_dataset_is_seeded_and_inside_the_images():
+    first = synthetic_dataset("/images", 200, 4, 3, seed=5)
+    second = synthetic_dataset("/images", 200, 4, 3, seed=5)
+    np.testing.assert_array_equal(first.boxes, second.boxes)
+    assert not np.array_equal(first.boxes, synthetic_dataset("/images", 200, 4, 3, seed=6).boxes)
+
+    sizes = first.image_sizes[first.box_image]
+    assert (first.boxes[:, :2] >= 1).all()
+    assert (first.boxes[:, 2:] <= sizes).all()
+    assert (first.boxes[:, 2:] - first.boxes[:, :2] >= 1).all()
+    assert set(first.box_class.tolist()) == {0, 1, 2}
+
+
+@pytest.mark.parametrize('dataset_format', ['voc', 'yolo', 'coco'])
+def test_generated_datasets_read_back(tmp_path, dataset_format):
+    dataset_dir = str(tmp_path / dataset_format)
+    dataset = generate_dataset(dataset_format, dataset_dir, 10, boxes_per_image=3, num_classes=2)
+    if dataset_format == 'coco':
+        result = read_dataset('coco', dataset_dir, "train", cache=False)
+    elif dataset_format == 'yolo':
+        result = read_dataset('yolo', dataset_dir, class_names=dataset.class_names, cache=False)
+    else:
+        result = read_dataset('voc', dataset_dir, cache=False)
+    assert len(result) == 10
+    assert result.num_boxes == dataset.num_boxes
+    np.testing.assert_array_equal(result.image_sizes, dataset.image_sizes)
+    np.testing.assert_allclose(result.boxes, dataset.boxes, atol=0.01)
+
+
+def test_record_stages():
+    converter = RunStats('convert')
+    converter.add_time('parse', 1.5, calls=3)
+    timer = RunStats('case')
+    record_stages(timer, converter.summary(), 'convert')
+    assert timer.stages == {'convert.parse': {'seconds': 1.5, 'calls': 3}}
+
+
+def test_compare():
+    baseline = {'results': {
+        'a': {'status': 'ok', 'total': 1.0, 'stages': {'parse': 0.5, 'write': 0.01}},
+        'b': {'status': 'error', 'total': 1.0, 'stages': {}}
+    }}
+    results = {
+        'a': {'status': 'ok', 'total': 1.05, 'stages': {'parse': 0.8, 'write': 0.05, 'new': 1.0}},
+        'b': {'status': 'ok', 'total': 9.0, 'stages': {}}
+    }
+    rows, regressions = compare(results, baseline, tolerance=0.1, min_seconds=0.05)
+    assert [row[:2] for row in rows] == [('a', 'total'), ('a', 'parse'), ('a', 'write')]
+    # write is 5x slower but only by 0.04 s
+    assert [row[:2] for row in regressions] == [('a', 'parse')]
+
+
+def test_run_case_uses_fresh_caches(tmp_path, fresh_env):
+    sources = {'voc': str(tmp_path / "voc")}
+    generate_dataset('voc', sources['voc'], 6, boxes_per_image=2, num_classes=2)
+    cache_dir = str(tmp_path / "cache")
+    result = run_case('read_voc', sources, str(tmp_path / "output"), CONFIG, cache_dir)
+    assert result['status'] == 'ok'
+    assert set(result['stages']) == {'read'}
+    assert os.environ['IMAGE_SIZE_CACHE'] == os.path.join(cache_dir, "image_size.sqlite3")
+
+    use_fresh_caches(str(tmp_path / "other"))
+    assert os.environ['DATASET_CACHE_DIR'] == os.path.join(str(tmp_path / "other"), "datasets")
+    assert run_case('read_coco', {'coco': str(tmp_path / "missing")}, str(tmp_path / "output"), CONFIG,
+                    cache_dir)['status'] == 'error'
+
+
+def test_run_benchmarks(tmp_path, fresh_env):
+    results = run_benchmarks(['read_yolo', 'voc2coco'], str(tmp_path), CONFIG)
+    assert results['read_yolo']['status'] == 'ok'
+    assert results['voc2coco']['status'] == 'ok'
+    assert {'stage_images', 'parse', 'serialise', 'convert', 'convert.parse'} <= set(results['voc2coco']['stages'])
+    assert results['voc2coco']['images_per_s'] > 0
@@ -0,0 +1,42 @@
+import json
+
+import numpy as np
+import pytest
+
+# preprocess/coco.py replaces keras_retinanet/preprocessing/coco.py and only imports from there
+coco = pytest.importorskip("keras_retinanet.preprocessing.coco")
+
+
+def write_coco(coco_dir, annotations):
+    (coco_dir / "annotations").mkdir(parents=True)
+    coco_json = {
+        'images': [{'id': 7, 'file_name': "a.jpg", 'width': 100, 'height': 50},
+                   {'id': 3, 'file_name': "b.jpg", 'width': 40, 'height': 80}],
+        'categories': [{'id': 5, 'name': "item"}, {'id': 2, 'name': "person"}],
+        'annotations': annotations
+    }
+    with open(str(coco_dir / "annotations" / "instances_train.json"), 'w') as fp:
+        json.dump(coco_json, fp)
+
+
+def test_load_annotations_keeps_full_precision(tmp_path):
+    write_coco(tmp_path, [
+        {'id': 1, 'image_id': 3, 'category_id': 5, 'bbox': [1.51, 2.0, 1.0, 1.0], 'iscrowd': 0},
+        {'id': 2, 'image_id': 7, 'category_id': 2, 'bbox': [10.123456789, 5.5, 20.25, 0.99], 'iscrowd': 0},
+        {'id': 3, 'image_id': 7, 'category_id': 2, 'bbox': [0.1, 0.2, 30.3, 10.7], 'iscrowd': 1},
+        {'id': 4, 'image_id': 7, 'category_id': 5, 'bbox': [10.123456789, 5.5, 20.25, 3.3], 'iscrowd': 0}
+    ])
+    generator = coco.CocoGenerator(str(tmp_path), "train")
+    assert generator.image_ids == [7, 3]
+    assert generator.coco_label_to_label(2) == 0
+
+    first = generator.load_annotations(0)
+    assert first['labels'].tolist() == [1.0]
+    assert first['bboxes'].dtype == np.float64
+    assert first['bboxes'].tolist() == [[10.123456789, 5.5, 10.123456789 + 20.25, 5.5 + 3.3]]
+
+    # A width of exactly 1 is kept, even where a float32 round trip would make it smaller
+    second = generator.load_annotations(1)
+    assert second['labels'].tolist() == [1.0]
+    assert second['bboxes'].tolist() == [[1.51, 2.0, 1.51 + 1.0, 3.0]]
+    assert generator.image_aspect_ratio(1) == 0.5
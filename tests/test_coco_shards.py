@@ -0,0 +1,151 @@
+import json
+import os
+
+import pytest
+
+from common.coco_shards import (MAX_COCO_ID, find_shards, iter_coco, merge_coco_shards, shard_bounds,
+                                shard_id_stride, shard_path)
+from common.coco_writer import CocoJsonWriter
+from voc2coco import VOC2COCO
+
+LABEL2ID = {'item': 1, 'person': 2}
+
+
+def test_shard_bounds_cover_every_item_once():
+    for num_items in (0, 1, 7, 100):
+        for num_shards in (1, 3, 8):
+            bounds = [shard_bounds(num_items, num_shards, index) for index in range(num_shards)]
+            assert bounds[0][0] == 0 and bounds[-1][1] == num_items
+            assert all(bounds[ind][1] == bounds[ind + 1][0] for ind in range(num_shards - 1))
+    with pytest.raises(ValueError):
+        shard_bounds(10, 2, 2)
+
+
+def test_shard_id_stride_stays_below_int32():
+    for num_shards in (1, 2, 3, 4, 16, 1000):
+        stride = shard_id_stride(num_shards)
+        assert stride >= 1
+        assert num_shards * stride <= MAX_COCO_ID < 2 ** 31
+    with pytest.raises(ValueError):
+        shard_id_stride(0)
+
+
+def test_find_shards(tmp_path):
+    path = str(tmp_path / "instances_train.json")
+    assert shard_path(path, 1, 4) == str(tmp_path / "instances_train-00001-of-00004.json")
+    assert find_shards(path) == []
+    for index in range(3):
+        open(shard_path(path, index, 3), 'w').close()
+    (tmp_path / "instances_train-backup.json").write_text("{}")
+    assert find_shards(path) == [shard_path(path, index, 3) for index in range(3)]
+
+    # Left over from a run with another shard count
+    open(shard_path(path, 0, 2), 'w').close()
+    with pytest.raises(ValueError, match="different shard counts"):
+        find_shards(path)
+    os.remove(shard_path(path, 0, 2))
+
+    os.remove(shard_path(path, 1, 3))
+    with pytest.raises(ValueError, match="Incomplete"):
+        find_shards(path)
+
+
+def test_iter_coco_streams_items(tmp_path):
+    path = str(tmp_path / "coco.json")
+    coco_json = {'images': [{'id': ind, 'file_name': "{}.jpg".format(ind)} for ind in range(50)],
+                 'type': "instances", 'annotations': [], 'categories': [{'id': 1, 'name': "a"}]}
+    with open(path, 'w') as fp:
+        json.dump(coco_json, fp, indent=4)
+    # A tiny chunk size makes every value cross chunk boundaries
+    items = list(iter_coco(path, chunk_size=7))
+    assert [value for key, value in items if key == 'images'] == coco_json['images']
+    assert ('type', "instances") in items
+    assert [value for key, value in items if key == 'categories'] == coco_json['categories']
+    assert not any(key == 'annotations' for key, _ in items)
+
+
+def read_bytes(path):
+    with open(path, 'rb') as fp:
+        return fp.read()
+
+
+@pytest.mark.parametrize('num_shards', [2, 3])
+def test_sharded_conversion_merges_into_the_unsharded_file(tmp_path, voc_dir, num_shards):
+    unsharded = VOC2COCO(voc_dir, str(tmp_path / "full"), "train", LABEL2ID)
+    unsharded.create_coco_annotation()
+    expected = str(tmp_path / "full" / "annotations" / "instances_train.json")
+
+    sharded = VOC2COCO(voc_dir, str(tmp_path / "sharded"), "train", LABEL2ID)
+    for index in range(num_shards):
+        sharded.create_coco_annotation(num_shards=num_shards, shard_index=index)
+    merged = str(tmp_path / "sharded" / "annotations" / "instances_train.json")
+    shards = find_shards(merged)
+    assert len(shards) == num_shards
+
+    stride = shard_id_stride(num_shards)
+    for index, path in enumerate(shards):
+        with open(path, 'r') as fp:
+            ann_ids = [ann['id'] for ann in json.load(fp)['annotations']]
+        assert all(index * stride < ann_id <= (index + 1) * stride for ann_id in ann_ids)
+
+    assert merge_coco_shards(shards, merged, renumber=True) == (7, 9)
+    assert read_bytes(merged) == read_bytes(expected)
+
+    # Without renumbering the shards keep their (non clashing) ids
+    merge_coco_shards(shards, merged)
+    with open(merged, 'r') as fp:
+        merged_json = json.load(fp)
+    with open(expected, 'r') as fp:
+        expected_json = json.load(fp)
+    assert merged_json['images'] == expected_json['images']
+    assert len({ann['id'] for ann in merged_json['annotations']}) == 9
+    assert max(ann['id'] for ann in merged_json['annotations']) <= MAX_COCO_ID
+
+
+def write_coco(path, image_ids, ann_ids):
+    with CocoJsonWriter(path, [{'id': 1, 'name': "a"}]) as writer:
+        for image_id in image_ids:
+            writer.add_image({'id': image_id, 'file_name': "{}.jpg".format(image_id)})
+        for ann_id in ann_ids:
+            writer.add_annotation({'id': ann_id, 'image_id': image_ids[0], 'category_id': 1})
+
+
+def test_merge_shifts_clashing_shards(tmp_path):
+    first, second = str(tmp_path / "a.json"), str(tmp_path / "b.json")
+    write_coco(first, [1, 2], [1, 2, 3])
+    write_coco(second, [1], [2])
+    merged = str(tmp_path / "merged.json")
+    merge_coco_shards([first, second], merged)
+    with open(merged, 'r') as fp:
+        merged_json = json.load(fp)
+    assert [image['id'] for image in merged_json['images']] == [1, 2, 3]
+    assert [(ann['id'], ann['image_id']) for ann in merged_json['annotations']] == [(1, 1), (2, 1), (3, 1), (4, 3)]
+
+
+def test_merge_rejects_ids_above_int32(tmp_path):
+    first, second = str(tmp_path / "a.json"), str(tmp_path / "b.json")
+    write_coco(first, [1], [MAX_COCO_ID - 1, MAX_COCO_ID])
+    # Clashes with the first shard, so it would be moved past 2**31 - 1
+    write_coco(second, [2], [MAX_COCO_ID])
+    with pytest.raises(ValueError, match="renumber"):
+        merge_coco_shards([first, second], str(tmp_path / "merged.json"))
+    assert merge_coco_shards([first, second], str(tmp_path / "merged.json"), renumber=True) == (2, 3)
+
+
+def test_merge_rejects_different_categories(tmp_path):
+    first, second = str(tmp_path / "a.json"), str(tmp_path / "b.json")
+    write_coco(first, [1], [1])
+    with CocoJsonWriter(second, [{'id': 2, 'name': "b"}]):
+        pass
+    with pytest.raises(ValueError, match="Categories"):
+        merge_coco_shards([first, second], str(tmp_path / "merged.json"))
+
+
+def test_shard_with_too_many_annotations_is_not_written(tmp_path, voc_dir):
+    converter = VOC2COCO(voc_dir, str(tmp_path / "coco"), "train", LABEL2ID)
+    path = str(tmp_path / "coco" / "annotations" / "instances_train.json")
+    parsed = converter.parse_annotations(sorted(str(path) for path in
+                                                (tmp_path / "voc" / "Annotations").glob("*.xml")))
+    with pytest.raises(ValueError, match="below 2"):
+        converter.write_coco_records(parsed, path, converter.categories(), first_ann_id=11, last_ann_id=15)
+    assert os.listdir(str(tmp_path / "coco" / "annotations")) == []
@@ -0,0 +1,51 @@
+import json
+import os
+
+import pytest
+
+from common.coco_writer import CocoJsonWriter
+
+CATEGORIES = [{'supercategory': 'none', 'id': 1, 'name': 'item'},
+              {'supercategory': 'none', 'id': 2, 'name': 'person'}]
+IMAGES = [{'file_name': 'a.jpg', 'height': 480, 'width': 640, 'id': 1},
+          {'file_name': 'b "quoted" é.jpg', 'height': 1080, 'width': 1920, 'id': 2}]
+ANNOTATIONS = [{'area': 1200.0, 'iscrowd': 0, 'bbox': [1.0, 2.5, 30.0, 40.0], 'category_id': 1, 'ignore': 0,
+                'segmentation': [], 'image_id': 1, 'id': 1},
+               {'area': 0.5, 'iscrowd': 0, 'bbox': [0.1, 0.2, 1.0, 0.5], 'category_id': 2, 'ignore': 0,
+                'segmentation': [], 'image_id': 2, 'id': 2}]
+
+
+def write(path, images, annotations, indent=4):
+    with CocoJsonWriter(path, CATEGORIES, indent=indent) as writer:
+        # Interleaved like VOC2COCO does, so the spooled annotations must still come after all images
+        for image in images:
+            writer.add_image(image)
+            for ann in annotations:
+                if ann['image_id'] == image['id']:
+                    writer.add_annotation(ann)
+    with open(path, 'r') as fp:
+        return fp.read()
+
+
+def expected(images, annotations):
+    return {'images': images, 'type': 'instances', 'annotations': annotations, 'categories': CATEGORIES}
+
+
+@pytest.mark.parametrize('images,annotations', [(IMAGES, ANNOTATIONS), (IMAGES, []), ([], [])])
+def test_matches_json_dump(tmp_path, images, annotations):
+    text = write(str(tmp_path / "out.json"), images, annotations)
+    assert text == json.dumps(expected(images, annotations), indent=4)
+
+
+def test_compact_output(tmp_path):
+    text = write(str(tmp_path / "out.json"), IMAGES, ANNOTATIONS, indent=None)
+    assert text == json.dumps(expected(IMAGES, ANNOTATIONS), separators=(',', ':'))
+
+
+def test_abort_leaves_no_file(tmp_path):
+    path = str(tmp_path / "out.json")
+    with pytest.raises(RuntimeError):
+        with CocoJsonWriter(path, CATEGORIES) as writer:
+            writer.add_image(IMAGES[0])
+            raise RuntimeError("stop")
+    assert os.listdir(str(tmp_path)) == []
@@ -0,0 +1,60 @@
+import json
+import os
+
+import cv2
+import numpy as np
+
+from dataset.core import Dataset
+from dataset.readers import read_voc
+from visualize.contact_sheet import invalid_boxes, render_contact_sheets, render_thumbnail, select_images
+
+
+def test_select_images(voc_dir):
+    dataset = read_voc(voc_dir)
+    # Image i has i % 4 boxes, alternating item / person
+    assert select_images(dataset).tolist() == list(range(7))
+    assert select_images(dataset, classes=["person"]).tolist() == [2, 3, 6]
+    assert select_images(dataset, min_boxes=2).tolist() == [2, 3, 6]
+    assert select_images(dataset, min_boxes=1, max_boxes=1).tolist() == [1, 5]
+    assert select_images(dataset, only_invalid=True).tolist() == []
+
+
+def test_invalid_boxes():
+    dataset = Dataset.from_paths(["a.jpg", "b.jpg"], [(10, 10), (0, 0)], ["item"], [0, 0, 0, 1], [0, 0, 0, 0],
+                                 [[1, 1, 5, 5], [5, 5, 5, 9], [2, 2, 11, 8], [50, 50, 60, 60]])
+    # Boxes of images without a size are never out of bounds
+    assert invalid_boxes(dataset).tolist() == [False, True, True, False]
+    assert select_images(dataset, only_invalid=True).tolist() == [0]
+
+
+def test_render_thumbnail(tmp_path):
+    image_path = str(tmp_path / "a.png")
+    cv2.imwrite(image_path, np.full((100, 200, 3), 255, dtype=np.uint8))
+    tile = render_thumbnail(image_path, ["item"], np.array([[20, 20, 180, 80]], dtype=np.float32),
+                            np.array([True]), (100, 100), show_name=False)
+    assert tile.shape == (100, 100, 3)
+    # Fitted to the tile width, the invalid box drawn in red and the rest of the tile left black
+    assert tile[10, 10].tolist() == [0, 0, 255]
+    assert tile[75, 50].tolist() == [0, 0, 0]
+    missing = render_thumbnail(str(tmp_path / "missing.png"), [], np.zeros((0, 4)), np.zeros(0, dtype=bool),
+                               (100, 100))
+    assert missing.shape == (100, 100, 3) and missing.any()
+
+
+def test_render_contact_sheets(tmp_path, voc_dir):
+    dataset = read_voc(voc_dir)
+    output_dir = str(tmp_path / "sheets")
+    sheet_paths = render_contact_sheets(dataset, output_dir, columns=3, rows=2, tile_size=(40, 30), workers=2)
+    assert [os.path.basename(path) for path in sheet_paths] == ["sheet_00000.jpg", "sheet_00001.jpg"]
+    assert cv2.imread(sheet_paths[0]).shape == (60, 120, 3)
+    # The last sheet only has the rows it needs
+    assert cv2.imread(sheet_paths[1]).shape == (30, 120, 3)
+    with open(os.path.join(output_dir, "index.json"), 'r') as fp:
+        index = json.load(fp)
+    assert [os.path.basename(path) for path in index["sheet_00000.jpg"]] == \
+        ["sample_{}.jpg".format(ind) for ind in range(6)]
+    assert [os.path.basename(path) for path in index["sheet_00001.jpg"]] == ["sample_6.jpg"]
+
+    sheet_paths = render_contact_sheets(dataset, str(tmp_path / "subset"), np.array([1]), columns=3, rows=1,
+                                        tile_size=(40, 30), workers=1)
+    assert cv2.imread(sheet_paths[0]).shape == (30, 120, 3)
@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from dataset.core import Dataset, DatasetBuilder, StringColumn, as_float64
+from dataset.readers import READERS, read_dataset, read_voc
+from dataset.writers import WRITERS, write_dataset
+
+CLASS_NAMES = ["item", "person"]
+
+
+def contents(dataset):
+    """ image name -> (size, [(class name, box)]) independent of the image and class order.
+    """
+    result = {}
+    for ind, name in enumerate(dataset.image_names):
+        box_class, boxes = dataset.image_boxes(ind)
+        result[name] = (tuple(dataset.image_sizes[ind].tolist()),
+                        [(dataset.class_names[class_id], box) for class_id, box in zip(box_class.tolist(),
+                                                                                         boxes.tolist())])
+    return result
+
+
+def test_builder_and_columns():
+    builder = DatasetBuilder(["person"])
+    builder.add_image("/a/x.jpg", 10, 20, builder.class_ids(["item", "person"]), [[1, 2, 3, 4], [5, 6, 7, 8]])
+    builder.add_image("/b/y.jpg", None, None)
+    builder.add_image("/a/z.jpg", 30, 40, builder.class_ids(["item"]), [[0, 0, 1, 1]])
+    dataset = builder.build()
+
+    assert dataset.dirs == ["/a", "/b"]
+    assert dataset.image_paths() == ["/a/x.jpg", "/b/y.jpg", "/a/z.jpg"]
+    assert dataset.class_names == ["person", "item"]
+    assert dataset.image_sizes.tolist() == [[10, 20], [0, 0], [30, 40]]
+    assert dataset.offsets.tolist() == [0, 2, 2, 3]
+    assert dataset.image_boxes(0)[0].tolist() == [1, 0]
+    assert dataset.image_boxes(1)[1].shape == (0, 4)
+    assert dataset.class_id_map(["item", "car"]).tolist() == [-1, 0]
+    assert dataset.image_ids.tolist() == [1, 2, 3]
+
+
+def test_boxes_are_sorted_by_image():
+    dataset = Dataset.from_paths(["a.jpg", "b.jpg"], [(1, 1), (2, 2)], ["c"], [1, 0, 1], [0, 0, 0],
+                                 [[1, 1, 2, 2], [3, 3, 4, 4], [5, 5, 6, 6]])
+    assert dataset.box_image.tolist() == [0, 1, 1]
+    assert dataset.boxes[:, 0].tolist() == [3, 1, 5]
+
+
+def test_string_column():
+    column = StringColumn.from_strings(["a.jpg", "", "é.png"])
+    assert len(column) == 3
+    assert list(column) == ["a.jpg", "", "é.png"]
+    assert column[-1] == "é.png"
+    assert column[1:] == ["", "é.png"]
+
+
+def test_as_float64():
+    values = np.array([136.76, 0.1], dtype=np.float32)
+    assert as_float64(values).tolist() == [136.76, 0.1]
+    assert as_float64(np.array([0.1])).tolist() == [0.1]
+
+
+def write_and_read(dataset, dataset_format, out_dir):
+    if dataset_format == 'coco':
+        write_dataset(dataset, 'coco', out_dir, "train", stage_mode='copy', workers=1)
+        return read_dataset('coco', out_dir, "train", cache=False)
+    if dataset_format == 'yolo':
+        write_dataset(dataset, 'yolo', out_dir, class_names=CLASS_NAMES, stage_mode='copy', workers=1)
+        return read_dataset('yolo', out_dir, class_names=CLASS_NAMES, cache=False)
+    if dataset_format == 'vott':
+        write_dataset(dataset, 'vott', out_dir)
+        return read_dataset('vott', out_dir, workers=1, cache=False)
+    write_dataset(dataset, dataset_format, out_dir, stage_mode='copy', workers=1)
+    return read_dataset(dataset_format, out_dir, class_names=CLASS_NAMES, cache=False)
+
+
+@pytest.mark.parametrize('dataset_format', ['voc', 'coco', 'vott', 'kitti', 'yolo'])
+def test_round_trip(tmp_path, voc_dir, dataset_format):
+    dataset = read_voc(voc_dir)
+    result = write_and_read(dataset, dataset_format, str(tmp_path / "out" / dataset_format))
+    expected, actual = contents(dataset), contents(result)
+    assert sorted(actual) == sorted(expected)
+    for name, (size, boxes) in expected.items():
+        assert actual[name][0] == size
+        assert [label for label, _ in actual[name][1]] == [label for label, _ in boxes]
+        if dataset_format == 'yolo':
+            # Normalised to 6 decimals
+            np.testing.assert_allclose([box for _, box in actual[name][1]], [box for _, box in boxes], atol=1e-3)
+        else:
+            assert actual[name][1] == boxes
+
+
+def test_registries():
+    assert sorted(READERS) == ['coco', 'kitti', 'voc', 'vott', 'yolo']
+    assert sorted(WRITERS) == ['coco', 'kitti', 'voc', 'vott', 'webdataset', 'yolo']
+    with pytest.raises(ValueError):
+        read_dataset('csv', "unused")
+    with pytest.raises(ValueError):
+        write_dataset(None, 'csv', "unused")
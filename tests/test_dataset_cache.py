@@ -0,0 +1,70 @@
+import json
+import os
+
+import numpy as np
+
+from conftest import write_voc_annotation
+from dataset.cache import cache_path, cached_read, load_cache, save_cache
+from dataset.core import StringColumn
+from dataset.readers import read_dataset, read_voc
+
+
+def assert_same(left, right):
+    assert left.dirs == right.dirs
+    assert list(left.image_names) == list(right.image_names)
+    assert left.class_names == right.class_names
+    for name in ('image_dir', 'image_sizes', 'image_ids', 'class_ids', 'box_image', 'box_class', 'boxes'):
+        np.testing.assert_array_equal(getattr(left, name), getattr(right, name))
+
+
+def test_save_and_load(tmp_path, voc_dir):
+    dataset = read_voc(voc_dir)
+    path = str(tmp_path / "cache")
+    save_cache(dataset, path, source_fingerprint="abc")
+
+    loaded = load_cache(path, "abc")
+    assert_same(loaded, dataset)
+    # Read-only views of the memory-mapped files, not copies
+    assert loaded.boxes.flags.owndata is False and loaded.boxes.flags.writeable is False
+    assert isinstance(loaded.image_names, StringColumn)
+    assert load_cache(path, "abc", mmap=False).boxes.flags.writeable is True
+    assert load_cache(path, "other") is None
+    assert load_cache(str(tmp_path / "missing")) is None
+
+    meta_path = os.path.join(path, "meta.json")
+    with open(meta_path, 'r') as fp:
+        meta = json.load(fp)
+    meta['version'] = -1
+    with open(meta_path, 'w') as fp:
+        json.dump(meta, fp)
+    assert load_cache(path, "abc") is None
+
+
+def test_cached_read_is_invalidated_by_source_changes(tmp_path, voc_dir):
+    calls = []
+
+    def reader(*args, **kwargs):
+        calls.append(args)
+        return read_voc(*args, **kwargs)
+
+    cache_dir = str(tmp_path / "cache")
+    first = cached_read(reader, 'voc', voc_dir, cache_dir=cache_dir)
+    second = cached_read(reader, 'voc', voc_dir, cache_dir=cache_dir, workers=2)
+    assert len(calls) == 1
+    assert_same(first, second)
+
+    write_voc_annotation(os.path.join(voc_dir, "Annotations", "sample_7.xml"), "sample_7.jpg", 10, 10,
+                         [("item", 1, 1, 5, 5)])
+    third = cached_read(reader, 'voc', voc_dir, cache_dir=cache_dir)
+    assert len(calls) == 2
+    assert len(third) == 8
+
+
+def test_cache_key_depends_on_reader_arguments(tmp_path, voc_dir):
+    assert cache_path('voc', voc_dir, cache_dir="c") == cache_path('voc', voc_dir, cache_dir="c", workers=4)
+    assert cache_path('voc', voc_dir, cache_dir="c") != cache_path('voc', voc_dir, cache_dir="c",
+                                                                   class_names=("person",))
+    # The default cache dir comes from DATASET_CACHE_DIR (pointed at a temp dir by conftest)
+    dataset = read_dataset('voc', voc_dir)
+    assert os.path.isdir(cache_path('voc', voc_dir))
+    assert_same(read_dataset('voc', voc_dir), dataset)
@@ -0,0 +1,63 @@
+import cv2
+import numpy as np
+import pytest
+
+from visualize.draw_settings import CLASS_COLORS
+from visualize.draw_utils import GlyphCache, apply_boxes, apply_labels, apply_polygon, box_polygons
+
+BOXES = np.array([[10, 10, 100, 50], [-20, 80, 60, 130], [150, 0, 230, 30], [30, 60, 90, 110]])
+CLASS_IDS = np.array([0, 1, 0, 2])
+NAMES = ["item", "gypsy", "Wj"]
+
+
+def background():
+    image = np.zeros((120, 200, 3), dtype=np.uint8)
+    image[:, :, 0] = np.arange(200) % 256
+    image[:, :, 1] = 40
+    return image
+
+
+def test_box_polygons():
+    assert box_polygons([[1.9, 2, 3, 4]]).tolist() == [[[1, 2], [3, 2], [3, 4], [1, 4]]]
+    assert box_polygons(np.zeros((0, 4))).shape == (0, 4, 2)
+
+
+def test_apply_boxes_matches_apply_polygon():
+    expected = background()
+    for (x1, y1, x2, y2), class_id in zip(BOXES.tolist(), CLASS_IDS.tolist()):
+        apply_polygon(expected, [(x1, y1), (x2, y1), (x2, y2), (x1, y2)], color=CLASS_COLORS[class_id])
+    assert (apply_boxes(background(), BOXES, CLASS_IDS) == expected).all()
+    assert (apply_boxes(background(), np.zeros((0, 4)), []) == background()).all()
+
+
+def test_apply_boxes_alpha():
+    opaque = apply_boxes(background(), BOXES, CLASS_IDS)
+    assert (apply_boxes(background(), BOXES, CLASS_IDS, alpha=1.0) == opaque).all()
+    blended = apply_boxes(background(), BOXES, CLASS_IDS, alpha=0.5).astype(np.int32)
+    expected = (opaque.astype(np.int32) + background()) / 2
+    assert np.abs(blended - expected).max() <= 1
+
+
+@pytest.mark.parametrize('font_scale,thickness', [(0.5, 1), (0.8, 2)])
+def test_apply_labels_matches_put_text(font_scale, thickness):
+    color = (255, 255, 0)
+    expected = background()
+    for (x1, y1, x2, y2), class_id in zip(BOXES.tolist(), CLASS_IDS.tolist()):
+        cv2.putText(expected, NAMES[class_id], (x1 + 5, (y1 + y2) // 2), cv2.FONT_HERSHEY_DUPLEX, font_scale, color,
+                    thickness)
+    glyph_cache = GlyphCache(font_scale=font_scale, thickness=thickness)
+    image = apply_labels(background(), BOXES, CLASS_IDS, NAMES, color=color, glyph_cache=glyph_cache)
+    # Boxes run off the image on every side; descenders ("gypsy") and strokes past the text box are kept.
+    # Only pixels where strokes of one glyph overlap may differ by a few levels
+    difference = np.abs(image.astype(np.int32) - expected)
+    assert difference.max() <= 8
+    assert (difference.max(axis=2) > 0).sum() <= 0.02 * (expected != background()).any(axis=2).sum()
+
+
+def test_glyph_cache_renders_each_text_once():
+    glyph_cache = GlyphCache()
+    dy, dx, weight = glyph_cache.get("gypsy")
+    assert glyph_cache.get("gypsy")[0] is dy
+    # Descenders reach below the putText origin
+    assert dy.max() > 0 and dy.min() < 0
+    assert weight.dtype == np.float32 and 0 < weight.min() and weight.max() <= 1
@@ -0,0 +1,67 @@
+import threading
+
+import numpy as np
+
+from visualize.frame_cache import FrameCache, FramePrefetcher
+
+
+def frame(value, num_bytes=100):
+    return np.full(num_bytes, value, dtype=np.uint8)
+
+
+def test_cache_evicts_least_recently_used():
+    cache = FrameCache(max_bytes=300)
+    for key in range(3):
+        cache.put(key, frame(key))
+    assert cache.get(0)[0] == 0
+    cache.put(3, frame(3))
+    assert 1 not in cache
+    assert [key in cache for key in (0, 2, 3)] == [True, True, True]
+    assert cache.num_bytes == 300
+
+    # Replacing a frame does not count it twice; a frame above the limit is still kept on its own
+    cache.put(3, frame(3))
+    assert cache.num_bytes == 300
+    cache.put(4, frame(4, num_bytes=1000))
+    assert cache.num_bytes == 1000 and cache.get(4) is not None
+
+
+def wait_for_prefetch(prefetcher):
+    with prefetcher._lock:
+        futures = list(prefetcher._pending.values())
+    for future in futures:
+        future.result()
+
+
+def test_prefetcher_renders_each_frame_once():
+    rendered = []
+    lock = threading.Lock()
+
+    def render(ind):
+        with lock:
+            rendered.append(ind)
+        return frame(ind)
+
+    with FramePrefetcher(render, size=10, radius=2, workers=2) as prefetcher:
+        assert prefetcher.get(0)[0] == 0
+        # Neighbours are rendered in the background, the next ones first
+        wait_for_prefetch(prefetcher)
+        assert sorted(rendered) == [0, 1, 2]
+        assert prefetcher.get(1)[0] == 1
+        wait_for_prefetch(prefetcher)
+        assert prefetcher.get(2)[0] == 2
+    assert sorted(set(rendered)) == sorted(rendered)
+    assert set(rendered) <= {0, 1, 2, 3, 4}
+
+
+def test_prefetcher_does_not_cache_missing_frames():
+    calls = []
+
+    def render(ind):
+        calls.append(ind)
+        return None
+
+    with FramePrefetcher(render, size=1, radius=1) as prefetcher:
+        assert prefetcher.get(0) is None
+        assert prefetcher.get(0) is None
+    assert calls == [0, 0]
@@ -0,0 +1,69 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+from PIL import Image
+
+from common import image_size
+from common.image_size import ImageSizeCache, get_image_size, read_image_size
+
+
+def exif_bytes():
+    exif = Image.Exif()
+    exif[0x010e] = "x" * 300
+    return exif.tobytes()
+
+
+@pytest.mark.parametrize('name,options', [
+    ('baseline.jpg', {}),
+    ('progressive.jpg', {'progressive': True}),
+    # An APP1 segment ahead of the start-of-frame marker has to be skipped
+    ('exif.jpg', {'exif': exif_bytes()}),
+    ('image.png', {}),
+    # Neither JPEG nor PNG: read through PIL
+    ('image.bmp', {}),
+])
+def test_read_image_size(tmp_path, name, options):
+    path = str(tmp_path / name)
+    Image.new('RGB', (123, 45)).save(path, **options)
+    assert read_image_size(path) == (123, 45)
+
+
+def test_cache_reprobes_changed_images(tmp_path, monkeypatch):
+    path = str(tmp_path / "image.png")
+    Image.new('RGB', (30, 20)).save(path)
+    cache = ImageSizeCache(str(tmp_path / "cache.sqlite3"))
+    assert cache.get(path) == (30, 20)
+
+    probes = []
+    monkeypatch.setattr(image_size, 'read_image_size', lambda p: probes.append(p) or read_image_size(p))
+    assert cache.get(path) == (30, 20)
+    assert probes == []
+
+    Image.new('RGB', (31, 21)).save(path)
+    os.utime(path, ns=(1, 1))
+    assert cache.get(path) == (31, 21)
+    assert probes == [os.path.abspath(path)]
+    cache.close()
+
+    # Committed straight away, so a new connection sees the rows
+    reopened = ImageSizeCache(str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr(image_size, 'read_image_size', None)
+    assert reopened.get(path) == (31, 21)
+    reopened.close()
+
+
+def test_shared_by_worker_processes(tmp_path):
+    paths = []
+    for ind in range(16):
+        paths.append(str(tmp_path / "image_{}.png".format(ind)))
+        Image.new('RGB', (10 + ind, 5 + ind)).save(paths[-1])
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        sizes = list(executor.map(get_image_size, paths))
+    assert sizes == [(10 + ind, 5 + ind) for ind in range(16)]
+
+    cache = ImageSizeCache()
+    rows = cache._conn.execute("SELECT COUNT(*) FROM image_size WHERE path LIKE ?",
+                               (str(tmp_path) + '%',)).fetchone()
+    cache.close()
+    assert rows == (16,)
@@ -0,0 +1,93 @@
+import json
+import logging
+import pickle
+import pstats
+import threading
+
+from common.instrument import FieldsFormatter, JsonFormatter, RunStats, log_event, profiled
+from voc2coco import VOC2COCO
+
+
+def test_stages_and_counters():
+    stats = RunStats('run')
+    with stats.stage('parse'):
+        pass
+
+    def work():
+        with stats.stage('parse'):
+            stats.count('files')
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert list(stats.timed('read', iter([1, 2, 3]))) == [1, 2, 3]
+    stats.count('bytes', 10)
+
+    summary = stats.summary()
+    assert summary['run'] == 'run'
+    assert summary['stages']['parse']['calls'] == 9
+    # The final StopIteration adds time but not a call
+    assert summary['stages']['read']['calls'] == 3
+    assert summary['counters'] == {'files': 8, 'bytes': 10}
+    assert set(summary['rates']) == {'files_per_s', 'bytes_per_s'}
+    json.dumps(summary)
+
+    stats.restart()
+    assert stats.summary()['stages'] == {} and stats.summary()['counters'] == {}
+
+
+def test_pickled_with_its_converter():
+    stats = RunStats('run')
+    stats.count('files', 2)
+    copy = pickle.loads(pickle.dumps(stats))
+    copy.count('files')
+    assert copy.counters == {'files': 3}
+    assert stats.counters == {'files': 2}
+
+
+def test_finish_logs_and_writes_the_summary(tmp_path, caplog):
+    stats = RunStats('run')
+    stats.add_time('parse', 0.25, calls=2)
+    stats.count('boxes', 7)
+    with caplog.at_level(logging.INFO, logger='run'):
+        summary = stats.finish(str(tmp_path / "summary.json"))
+    record = caplog.records[-1]
+    assert record.getMessage() == "run finished"
+    assert record.fields['parse'] == 0.25 and record.fields['boxes'] == 7
+    with open(str(tmp_path / "summary.json"), 'r') as fp:
+        assert json.load(fp) == summary
+
+
+def test_formatters(caplog):
+    with caplog.at_level(logging.INFO, logger='formatter-test'):
+        log_event(logging.getLogger('formatter-test'), "Done", files=3, mode='copy')
+    record = caplog.records[-1]
+    assert FieldsFormatter("%(message)s").format(record) == "Done files=3 mode=copy"
+    entry = json.loads(JsonFormatter().format(record))
+    assert (entry['message'], entry['files'], entry['mode'], entry['level']) == ("Done", 3, 'copy', 'INFO')
+
+
+def test_profiled(tmp_path, monkeypatch):
+    path = str(tmp_path / "run.prof")
+    monkeypatch.setenv('DATASET_PROFILE', path)
+    with profiled():
+        sorted(range(1000), key=lambda value: -value)
+    assert pstats.Stats(path).total_calls > 0
+
+    monkeypatch.delenv('DATASET_PROFILE')
+    with profiled():
+        pass
+
+
+def test_converter_summary(tmp_path, voc_dir):
+    summary_path = str(tmp_path / "summary.json")
+    summary = VOC2COCO(voc_dir, str(tmp_path / "coco"), "train", {'item': 1, 'person': 2}).convert(
+        stage_mode='copy', summary_path=summary_path)
+    assert summary['counters']['files'] == 7
+    assert summary['counters']['boxes'] == 9
+    assert summary['counters']['images_staged'] == 7
+    assert {'stage_images', 'glob', 'parse', 'serialise'} <= set(summary['stages'])
+    with open(summary_path, 'r') as fp:
+        assert json.load(fp)['counters'] == summary['counters']
@@ -0,0 +1,103 @@
+import json
+import os
+
+from common.manifest import AnnotationManifest
+from conftest import write_voc_annotation
+from voc2coco import VOC2COCO
+
+LABEL2ID = {'item': 1, 'person': 2}
+
+
+def run(voc_dir, coco_dir, label2id=LABEL2ID, incremental=True):
+    converter = VOC2COCO(voc_dir, coco_dir, "train", label2id)
+    converter.create_coco_annotation(incremental=incremental)
+    with open(os.path.join(coco_dir, "annotations", "instances_train.json"), 'r') as fp:
+        text = fp.read()
+    return text, converter.stats.summary()['counters'].get('files_parsed')
+
+
+def ids_by_file(text):
+    coco_json = json.loads(text)
+    image_ids = {image['id']: image['file_name'] for image in coco_json['images']}
+    result = {}
+    for image in coco_json['images']:
+        result[image['file_name']] = (image['id'], [])
+    for ann in coco_json['annotations']:
+        result[image_ids[ann['image_id']]][1].append(ann['id'])
+    return result
+
+
+def test_first_run_matches_full_conversion(tmp_path, voc_dir):
+    full, _ = run(voc_dir, str(tmp_path / "full"), incremental=False)
+    incremental, parsed = run(voc_dir, str(tmp_path / "incremental"))
+    assert incremental == full
+    assert parsed == 7
+
+
+def test_unchanged_and_touched_files_are_not_parsed(tmp_path, voc_dir):
+    coco_dir = str(tmp_path / "coco")
+    first, _ = run(voc_dir, coco_dir)
+    second, parsed = run(voc_dir, coco_dir)
+    assert (second, parsed) == (first, 0)
+
+    # A new mtime alone falls back to the sha1, which still matches
+    ann_path = os.path.join(voc_dir, "Annotations", "sample_2.xml")
+    os.utime(ann_path, ns=(1, 1))
+    third, parsed = run(voc_dir, coco_dir)
+    assert (third, parsed) == (first, 0)
+
+
+def test_ids_are_stable_and_never_reused(tmp_path, voc_dir):
+    coco_dir = str(tmp_path / "coco")
+    before = ids_by_file(run(voc_dir, coco_dir)[0])
+    assert before['sample_3.jpg'] == (4, [4, 5, 6])
+
+    ann_dir = os.path.join(voc_dir, "Annotations")
+    # sample_3 loses its last box, sample_1 gains one, sample_5 goes away and sample_9 is new
+    write_voc_annotation(os.path.join(ann_dir, "sample_3.xml"), "sample_3.jpg", 88, 48,
+                         [("item", 2, 3, 23, 30), ("person", 3, 4, 29, 31)])
+    write_voc_annotation(os.path.join(ann_dir, "sample_1.xml"), "sample_1.jpg", 72, 48,
+                         [("item", 2, 3, 21, 30), ("item", 5, 5, 15, 15)])
+    os.remove(os.path.join(ann_dir, "sample_5.xml"))
+    write_voc_annotation(os.path.join(ann_dir, "sample_9.xml"), "sample_9.jpg", 64, 48, [("person", 1, 1, 9, 9)])
+
+    text, parsed = run(voc_dir, coco_dir)
+    after = ids_by_file(text)
+    assert parsed == 3
+    assert after['sample_3.jpg'] == (4, [4, 5])
+    assert after['sample_1.jpg'] == (2, [1, 10])
+    assert 'sample_5.jpg' not in after
+    # sample_5 had image id 6 and no boxes; its id is not handed out again
+    assert after['sample_9.jpg'] == (8, [11])
+    for name in ('sample_0.jpg', 'sample_2.jpg', 'sample_4.jpg', 'sample_6.jpg'):
+        assert after[name] == before[name]
+
+
+def test_changed_params_reset_the_manifest(tmp_path, voc_dir):
+    coco_dir = str(tmp_path / "coco")
+    run(voc_dir, coco_dir)
+    text, parsed = run(voc_dir, coco_dir, label2id={'item': 2, 'person': 1})
+    assert parsed == 7
+    assert {ann['category_id'] for ann in json.loads(text)['annotations']} == {1, 2}
+
+
+def test_manifest_round_trip(tmp_path):
+    root = tmp_path / "Annotations"
+    root.mkdir()
+    ann_path = root / "a.xml"
+    ann_path.write_text("<annotation/>")
+    path = str(tmp_path / "manifest.json")
+
+    manifest = AnnotationManifest.load(path, str(root), params={'label2id': LABEL2ID})
+    assert manifest.is_fresh(str(ann_path)) is False
+    stat = os.stat(str(ann_path))
+    fingerprint = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'sha1': 'unused'}
+    entry = manifest.update(str(ann_path), fingerprint, {'file_name': 'a.jpg'}, [{'bbox': [0, 0, 1, 1]}] * 2)
+    assert (entry['image_id'], entry['ann_ids']) == (1, [1, 2])
+    manifest.save()
+
+    loaded = AnnotationManifest.load(path, str(root), params={'label2id': LABEL2ID})
+    assert loaded.get(str(ann_path)) == entry
+    assert (loaded.next_image_id, loaded.next_ann_id) == (2, 3)
+    assert loaded.is_fresh(str(ann_path)) is True
+    assert AnnotationManifest.load(path, str(root), params={'label2id': {}}).entries == {}
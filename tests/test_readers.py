@@ -0,0 +1,75 @@
+import json
+import multiprocessing
+import os
+
+import numpy as np
+import pytest
+
+from dataset.readers import load_coco_tables, read_coco, read_voc
+
+
+def write_coco(coco_dir, coco_json, set_name="train"):
+    (coco_dir / "annotations").mkdir(parents=True, exist_ok=True)
+    with open(str(coco_dir / "annotations" / "instances_{}.json".format(set_name)), 'w') as fp:
+        json.dump(coco_json, fp)
+
+
+COCO_JSON = {
+    'images': [{'id': 7, 'file_name': "a.jpg", 'width': 100, 'height': 50},
+               {'id': 3, 'file_name': "b.jpg", 'width': 40, 'height': 80}],
+    'categories': [{'id': 5, 'name': "item"}, {'id': 2, 'name': "person"}],
+    'annotations': [
+        {'id': 1, 'image_id': 3, 'category_id': 5, 'bbox': [1.51, 2.0, 1.0, 1.0], 'iscrowd': 0},
+        {'id': 2, 'image_id': 7, 'category_id': 2, 'bbox': [10.123456789, 5.5, 20.25, 3.3], 'iscrowd': 1},
+        {'id': 3, 'image_id': 7, 'category_id': 5, 'bbox': [0.5, 0.5, 10.0, 10.0]}
+    ]
+}
+
+
+def test_load_coco_tables(tmp_path):
+    write_coco(tmp_path, COCO_JSON)
+    categories, images, box_image, box_class, bboxes = load_coco_tables(str(tmp_path), "train")
+    assert [category['name'] for category in categories] == ["person", "item"]
+    assert [image['id'] for image in images] == [7, 3]
+    assert box_image.tolist() == [1, 0, 0]
+    assert box_class.tolist() == [1, 0, 1]
+    assert bboxes.dtype == np.float64
+    assert bboxes.tolist() == [ann['bbox'] for ann in COCO_JSON['annotations']]
+
+    _, _, box_image, _, bboxes = load_coco_tables(str(tmp_path), "train", include_crowd=False)
+    assert box_image.tolist() == [1, 0]
+    assert bboxes[:, 0].tolist() == [1.51, 0.5]
+
+
+def test_read_coco(tmp_path):
+    write_coco(tmp_path, COCO_JSON)
+    dataset = read_coco(str(tmp_path), "train", include_crowd=False)
+    assert dataset.image_names == ["a.jpg", "b.jpg"]
+    assert dataset.image_ids.tolist() == [7, 3]
+    assert dataset.class_ids.tolist() == [2, 5]
+    assert dataset.image_sizes.tolist() == [[100, 50], [40, 80]]
+    # Sorted by image, corners instead of width / height
+    assert dataset.box_image.tolist() == [0, 1]
+    np.testing.assert_allclose(dataset.boxes, [[0.5, 0.5, 10.5, 10.5], [1.51, 2.0, 2.51, 3.0]], rtol=1e-6)
+
+
+def test_read_voc_parallel_matches_serial(voc_dir):
+    serial = read_voc(voc_dir, workers=1)
+    parallel = read_voc(voc_dir, workers=3)
+    assert serial.image_names == parallel.image_names == ["sample_{}.jpg".format(ind) for ind in range(7)]
+    assert serial.class_names == parallel.class_names == ["item", "person"]
+    assert serial.num_boxes == 9
+    np.testing.assert_array_equal(serial.boxes, parallel.boxes)
+    np.testing.assert_array_equal(serial.box_image, parallel.box_image)
+    assert serial.image_sizes[1].tolist() == [72, 48]
+
+
+def test_read_voc_raises_from_workers(voc_dir):
+    with open(os.path.join(voc_dir, "Annotations", "broken.xml"), 'w') as fp:
+        fp.write("<annotation><filename>")
+    with pytest.raises(SyntaxError):
+        read_voc(voc_dir, workers=2)
+    assert multiprocessing.active_children() == []
+    errors = []
+    assert len(read_voc(voc_dir, workers=2, errors=errors)) == 7
+    assert [os.path.basename(path) for path, _ in errors] == ["broken.xml"]
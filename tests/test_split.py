@@ -0,0 +1,95 @@
+import os
+
+import pytest
+from PIL import Image
+
+from common.split import SPLITS, SplitAssigner, SplitWriter, hash_fraction
+from yolo2voc.yolo2voc import YOLO2VOC
+
+SAMPLE_IDS = ["image_{:05d}".format(ind) for ind in range(5000)]
+
+
+def test_hash_fraction():
+    assert hash_fraction("a") == hash_fraction("a", seed=0)
+    assert hash_fraction("a") != hash_fraction("a", seed=1)
+    assert all(0 <= hash_fraction(sample_id) < 1 for sample_id in SAMPLE_IDS[:100])
+
+
+def test_hash_splits_are_stable():
+    assigner = SplitAssigner(train_val_percent=0.9, train_percent=0.8, seed=3)
+    splits = {sample_id: assigner.assign(sample_id) for sample_id in SAMPLE_IDS}
+    # The same in any order and with any other samples around
+    other = SplitAssigner(train_val_percent=0.9, train_percent=0.8, seed=3)
+    assert all(other.assign(sample_id) == splits[sample_id] for sample_id in reversed(SAMPLE_IDS[::7]))
+
+    shares = {split: sum(value == split for value in splits.values()) / len(splits) for split in SPLITS}
+    assert shares == pytest.approx({'train': 0.72, 'val': 0.18, 'test': 0.1}, abs=0.02)
+    assert SplitAssigner(seed=4).assign("image_00001") in ('train', 'val')
+    assert {SplitAssigner(train_val_percent=1, train_percent=1).assign(sample_id)
+            for sample_id in SAMPLE_IDS[:200]} == {'train'}
+
+
+def test_stratified_splits_balance_rare_classes():
+    assigner = SplitAssigner(train_val_percent=0.8, train_percent=0.75, seed=0, stratify=True)
+    rare = {split: 0 for split in SPLITS}
+    for ind, sample_id in enumerate(SAMPLE_IDS[:1000]):
+        # Class 1 is in every 25th sample only, always next to the common class 0
+        class_ids = [0, 1] if ind % 25 == 0 else [0]
+        split = assigner.assign(sample_id, class_ids)
+        if 1 in class_ids:
+            rare[split] += 1
+    assert rare == {'train': 24, 'val': 8, 'test': 8}
+
+    again = SplitAssigner(train_val_percent=0.8, train_percent=0.75, seed=0, stratify=True)
+    first = SplitAssigner(train_val_percent=0.8, train_percent=0.75, seed=0, stratify=True)
+    assert [again.assign(sample_id, [ind % 3]) for ind, sample_id in enumerate(SAMPLE_IDS[:300])] == \
+        [first.assign(sample_id, [ind % 3]) for ind, sample_id in enumerate(SAMPLE_IDS[:300])]
+
+
+def read_lists(image_sets_dir):
+    lists = {}
+    for name in sorted(os.listdir(image_sets_dir)):
+        with open(os.path.join(image_sets_dir, name), 'r') as fp:
+            lists[name] = fp.read().splitlines()
+    return lists
+
+
+def test_split_writer(tmp_path):
+    with SplitWriter(str(tmp_path), SplitAssigner(train_val_percent=1, train_percent=0.5)) as writer:
+        splits = [writer.add(sample_id) for sample_id in SAMPLE_IDS[:50]]
+    lists = read_lists(str(tmp_path))
+    # No test samples, so no test.txt
+    assert sorted(lists) == ["train.txt", "trainval.txt", "val.txt"]
+    assert lists["trainval.txt"] == SAMPLE_IDS[:50]
+    assert lists["train.txt"] == [sample_id for sample_id, split in zip(SAMPLE_IDS, splits) if split == 'train']
+    assert writer.counts == {split: splits.count(split) for split in SPLITS}
+
+
+@pytest.mark.parametrize('stratify', [False, True])
+def test_yolo2voc_writes_the_splits(tmp_path, stratify):
+    yolo_dir = tmp_path / "yolo"
+    yolo_dir.mkdir()
+    for ind in range(30):
+        Image.new('RGB', (32, 24)).save(str(yolo_dir / "image_{:02d}.jpg".format(ind)))
+        with open(str(yolo_dir / "image_{:02d}.txt".format(ind)), 'w') as fp:
+            fp.write("{} 0.5 0.5 0.5 0.5\n".format(1 if ind % 10 == 0 else 0))
+    class_mapping = {1: 'item', 2: 'person'}
+    converter = YOLO2VOC(str(yolo_dir), str(tmp_path / "voc"), class_mapping)
+    converter.convert(train_val_percent=0.8, train_percent=0.75, stage_mode='copy', workers=2, seed=1,
+                      stratify=stratify)
+    image_sets_dir = os.path.join(str(tmp_path / "voc"), "ImageSets", "Main")
+    converted = read_lists(image_sets_dir)
+    assert sorted(converted["trainval.txt"] + converted["test.txt"]) == ["image_{:02d}".format(ind)
+                                                                        for ind in range(30)]
+
+    # Rewriting the lists from the annotations gives the same assignment
+    counts = converter.split_train_val_test(0.8, 0.75, seed=1, stratify=stratify)
+    rewritten = read_lists(image_sets_dir)
+    assert {name: sorted(ids) for name, ids in rewritten.items()} == \
+        {name: sorted(ids) for name, ids in converted.items()}
+    assert sum(counts.values()) == 30
+    if stratify is True:
+        # The three 'person' samples follow the 60 / 20 / 20 targets as closely as three samples can
+        person = {"image_00", "image_10", "image_20"}
+        assert sorted(len(person & set(converted[name + ".txt"])) for name in SPLITS) == [0, 1, 2]
+        assert len(person & set(converted["train.txt"])) == 2
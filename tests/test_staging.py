@@ -0,0 +1,67 @@
+import os
+import shutil
+
+import pytest
+
+from common.staging import Stager, stage_file
+
+
+@pytest.fixture
+def src(tmp_path):
+    path = tmp_path / "src.jpg"
+    path.write_bytes(b"image")
+    return str(path)
+
+
+@pytest.mark.parametrize('mode', ['hardlink', 'symlink'])
+def test_copy_over_a_previous_link(tmp_path, src, mode):
+    dst = str(tmp_path / "dst.jpg")
+    stage_file(src, dst, mode=mode)
+    assert stage_file(src, dst, mode='copy') == 'copy'
+    assert os.path.islink(dst) is False
+    assert os.path.samefile(src, dst) is False
+    # Writing the copy must not change the source
+    with open(dst, 'wb') as fp:
+        fp.write(b"changed")
+    with open(src, 'rb') as fp:
+        assert fp.read() == b"image"
+
+
+def test_copy_onto_itself_raises(src):
+    with pytest.raises(shutil.SameFileError):
+        stage_file(src, src, mode='copy')
+
+
+def test_move_over_a_previous_hardlink(tmp_path, src):
+    dst = str(tmp_path / "dst.jpg")
+    stage_file(src, dst, mode='hardlink')
+    assert stage_file(src, dst, mode='move') == 'move'
+    assert os.path.exists(src) is False
+    with open(dst, 'rb') as fp:
+        assert fp.read() == b"image"
+
+
+def test_link_modes_are_idempotent(tmp_path, src):
+    dst = str(tmp_path / "dst.jpg")
+    for mode in ['hardlink', 'hardlink', 'symlink', 'symlink', 'copy', 'hardlink']:
+        stage_file(src, dst, mode=mode)
+        with open(dst, 'rb') as fp:
+            assert fp.read() == b"image"
+
+
+def test_unknown_mode(tmp_path, src):
+    with pytest.raises(ValueError):
+        stage_file(src, str(tmp_path / "dst.jpg"), mode='rsync')
+
+
+def test_stager_counts_and_errors(tmp_path, src):
+    with Stager(mode='copy', workers=2) as stager:
+        for ind in range(5):
+            stager.submit(src, str(tmp_path / "{}.jpg".format(ind)))
+    assert stager.counts == {'copy': 5}
+    assert stager.bytes_copied == 5 * len(b"image")
+
+    stager = Stager(mode='copy', workers=2)
+    stager.submit(str(tmp_path / "missing.jpg"), str(tmp_path / "out.jpg"))
+    with pytest.raises(FileNotFoundError):
+        stager.close()
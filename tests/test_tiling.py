@@ -0,0 +1,76 @@
+import os
+
+import numpy as np
+from PIL import Image
+
+from dataset.core import Dataset
+from dataset.tiling import tile_boxes, tile_dataset, tile_grid, tile_names, tile_starts
+
+
+def test_tile_starts_cover_the_axis():
+    assert tile_starts(100, 200, 50).tolist() == [0]
+    assert tile_starts(100, 50, 50).tolist() == [0, 50]
+    # The last tile is aligned to the far edge
+    assert tile_starts(110, 50, 50).tolist() == [0, 50, 60]
+    assert tile_starts(100, 50, 25).tolist() == [0, 25, 50]
+
+
+def test_tile_grid_rows_and_small_images():
+    tiles = tile_grid(100, 60, (50, 40), (50, 40))
+    assert tiles.tolist() == [[0, 0, 50, 40], [50, 0, 100, 40], [0, 20, 50, 60], [50, 20, 100, 60]]
+    assert tile_grid(30, 20, (50, 40), (50, 40)).tolist() == [[0, 0, 30, 20]]
+
+
+def test_tile_boxes_remaps_and_filters():
+    tiles = np.array([[0, 0, 50, 50], [50, 0, 100, 50]])
+    boxes = np.array([
+        [10, 10, 20, 20],  # inside the first tile
+        [40, 10, 70, 20],  # 1/3 in the first, 2/3 in the second tile
+        [45, 30, 55, 40],  # half in each
+        [80, 60, 90, 70],  # in no tile
+    ], dtype=np.float32)
+    tile_ind, box_ind, clipped = tile_boxes(boxes, tiles, min_visibility=0.5)
+    assert tile_ind.tolist() == [0, 0, 1, 1]
+    assert box_ind.tolist() == [0, 2, 1, 2]
+    assert clipped.dtype == np.float32
+    np.testing.assert_array_equal(clipped, [[10, 10, 20, 20], [45, 30, 50, 40], [0, 10, 20, 20], [0, 30, 5, 40]])
+
+    tile_ind, box_ind, _ = tile_boxes(boxes, tiles, min_visibility=0.0)
+    assert list(zip(tile_ind.tolist(), box_ind.tolist())) == [(0, 0), (0, 1), (0, 2), (1, 1), (1, 2)]
+    # Boxes touching a tile's edge only have no area inside it
+    tile_ind, _, _ = tile_boxes(np.array([[50, 0, 60, 10]]), tiles, min_visibility=0.0)
+    assert tile_ind.tolist() == [1]
+    assert len(tile_boxes(np.empty((0, 4)), tiles)[0]) == 0
+
+
+def test_tile_names_are_unique():
+    dataset = Dataset.from_paths(["/a/x.jpg", "/b/x.jpg", "/a/x.png", "/a/x_1.jpg", "/a/y.jpg"],
+                                 [(10, 10)] * 5, [], [], [], np.empty((0, 4)))
+    assert tile_names(dataset) == ["x", "x_1", "x_2", "x_1_3", "y"]
+
+
+def test_tile_dataset_keeps_tiles_of_same_named_images(tmp_path):
+    image_paths = []
+    for folder, color in (("a", (255, 0, 0)), ("b", (0, 0, 255))):
+        os.makedirs(str(tmp_path / folder))
+        image_path = str(tmp_path / folder / "shelf.png")
+        Image.new('RGB', (100, 50), color).save(image_path)
+        image_paths.append(image_path)
+    dataset = Dataset.from_paths(image_paths, [(100, 50)] * 2, ["item"], [0, 1, 1], [0, 0, 0],
+                                 [[10, 10, 30, 30], [60, 5, 90, 45], [40, 10, 60, 20]])
+
+    tile_dir = str(tmp_path / "tiles")
+    tiled = tile_dataset(dataset, tile_dir, (50, 50), workers=1)
+    assert sorted(os.listdir(tile_dir)) == ["shelf_0_0.png", "shelf_1_0_0.png", "shelf_1_50_0.png",
+                                            "shelf_50_0.png"]
+    assert len(tiled) == 4
+    assert tiled.image_names == ["shelf_0_0.png", "shelf_50_0.png", "shelf_1_0_0.png", "shelf_1_50_0.png"]
+    # Every tile shows its own source image
+    colors = [Image.open(tiled.image_path(ind)).getpixel((0, 0)) for ind in range(len(tiled))]
+    assert colors == [(255, 0, 0), (255, 0, 0), (0, 0, 255), (0, 0, 255)]
+    assert tiled.box_image.tolist() == [0, 2, 3, 3]
+    np.testing.assert_array_equal(tiled.boxes, [[10, 10, 30, 30], [40, 10, 50, 20], [10, 5, 40, 45],
+                                                [0, 10, 10, 20]])
+
+    dropped = tile_dataset(dataset, str(tmp_path / "dropped"), (50, 50), drop_empty=True, workers=2)
+    assert dropped.image_names == ["shelf_0_0.png", "shelf_1_0_0.png", "shelf_1_50_0.png"]
@@ -0,0 +1,81 @@
+import numpy as np
+from PIL import Image
+
+from dataset.core import Dataset
+from dataset.readers import read_voc, read_yolo
+from dataset.validate import box_issues, duplicate_boxes, image_issues, validate
+
+
+def make_dataset(boxes, box_image, box_class, image_sizes=((100, 80), (50, 50)), class_names=("item", "person")):
+    image_paths = ["/data/{}.jpg".format(ind) for ind in range(len(image_sizes))]
+    return Dataset.from_paths(image_paths, image_sizes, class_names, box_image, box_class, boxes)
+
+
+def test_duplicate_boxes_flags_later_copies_only():
+    boxes = [[1, 1, 10, 10], [1, 1, 10, 10], [1, 1, 10, 10], [1, 1, 10, 10], [1, 1, 10, 10], [-0.0, 1, 10, 10],
+             [0.0, 1, 10, 10]]
+    # same image and class, other class, other image, and -0.0 / 0.0 which are equal
+    dataset = make_dataset(boxes, [0, 0, 0, 0, 1, 1, 1], [0, 0, 0, 1, 0, 1, 1])
+    assert duplicate_boxes(dataset).tolist() == [False, True, True, False, False, False, True]
+
+
+def test_duplicate_boxes_without_repeats():
+    dataset = make_dataset([[1, 1, 10, 10], [1, 1, 10, 11]], [0, 0], [0, 0])
+    assert duplicate_boxes(dataset).tolist() == [False, False]
+    assert duplicate_boxes(make_dataset(np.empty((0, 4)), [], [])).tolist() == []
+
+
+def test_box_issues():
+    boxes = [[np.nan, 1, 10, 10], [5, 5, 5, 10], [5, 5, 5.5, 10], [-1, 0, 10, 10], [0, 0, 100, 80], [1, 1, 60, 10]]
+    dataset = make_dataset(boxes, [0, 0, 0, 0, 0, 1], [0, 0, 0, 0, 1, 1], image_sizes=((100, 80), (0, 0)))
+    issues = box_issues(dataset, class_names=["item"])
+    assert issues['non_finite'].tolist() == [True, False, False, False, False, False]
+    assert issues['degenerate'].tolist() == [False, True, False, False, False, False]
+    assert issues['too_small'].tolist() == [False, False, True, False, False, False]
+    # Boxes of images with an unknown size are never out of bounds
+    assert issues['out_of_bounds'].tolist() == [False, False, False, True, False, False]
+    assert issues['unknown_label'].tolist() == [False, False, False, False, True, True]
+
+    image = image_issues(dataset, check_files=False)
+    assert image['unknown_size'].tolist() == [False, True]
+    assert image['no_annotations'].tolist() == [False, False]
+
+
+def test_validate_reports_broken_voc_files(tmp_path):
+    annotations = tmp_path / "Annotations"
+    annotations.mkdir()
+    (tmp_path / "JPEGImages").mkdir()
+    (annotations / "no_size.xml").write_text(
+        "<annotation><filename>a.jpg</filename><object><name>item</name><bndbox><xmin>1</xmin><ymin>2</ymin>"
+        "<xmax>30</xmax><ymax>40</ymax></bndbox></object></annotation>")
+    (annotations / "bad_box.xml").write_text(
+        "<annotation><filename>b.jpg</filename><size><width>100</width><height>80</height></size>"
+        "<object><name>item</name><bndbox><xmin>1</xmin><ymin>2</ymin><xmax>30</xmax></bndbox></object>"
+        "<object><name>item</name><bndbox><xmin>1</xmin><ymin>x</ymin><xmax>30</xmax><ymax>40</ymax></bndbox>"
+        "</object></annotation>")
+    (annotations / "truncated.xml").write_text("<annotation><filename>c.jpg</filename><size>")
+    (annotations / "no_filename.xml").write_text(
+        "<annotation><size><width>100</width><height>80</height></size></annotation>")
+
+    errors = []
+    dataset = read_voc(str(tmp_path), errors=errors)
+    assert [path for path, _ in errors] == [str(annotations / "truncated.xml")]
+    assert dataset.image_names == ["b.jpg", "no_filename.jpg", "a.jpg"]
+
+    report = validate(dataset, check_files=False, annotation_errors=errors)
+    summary = report['summary']
+    assert summary['unreadable_annotation'] == 1
+    assert summary['non_finite'] == 2
+    assert summary['unknown_size'] == 1
+    assert summary['no_annotations'] == 1
+    assert report['image_issues']['unknown_size'] == [str(tmp_path / "JPEGImages" / "a.jpg")]
+
+
+def test_validate_yolo_without_clipping(tmp_path):
+    Image.new('RGB', (100, 50)).save(str(tmp_path / "a.jpg"))
+    (tmp_path / "a.txt").write_text("0 0.5 0.5 0.2 0.2\n0 0.95 0.5 0.2 0.2\n")
+    clipped = read_yolo(str(tmp_path))
+    assert validate(clipped, check_files=False)['summary']['out_of_bounds'] == 0
+    report = validate(read_yolo(str(tmp_path), clip=False), check_files=False)
+    assert report['summary']['out_of_bounds'] == 1
+    assert report['box_issues']['out_of_bounds'][0]['box'] == [85.0, 20.0, 105.0, 30.0]
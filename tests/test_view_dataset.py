@@ -0,0 +1,97 @@
+import json
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import view_dataset
+from view_dataset import ViewDataset
+
+
+def write_image(path, width=80, height=40):
+    Image.new('RGB', (width, height), (20, 40, 60)).save(str(path))
+    return str(path)
+
+
+def test_render_frame_scales_boxes_to_max_size(tmp_path):
+    image_path = write_image(tmp_path / "a.png")
+    viewer = ViewDataset()
+    labels = (["item"], np.array([0], dtype=np.int32), np.array([[10, 10, 30, 30]], dtype=np.float32))
+
+    full = viewer.render_frame({"image_path": image_path, "labels": labels}, show_name=False)
+    half = viewer.render_frame({"image_path": image_path, "labels": labels}, show_name=False, max_size=(40, 40))
+    assert full.shape == (40, 80, 3)
+    assert half.shape == (20, 40, 3)
+    # The box outline moves with the image
+    assert (full[10, 10] != (60, 40, 20)).any()
+    assert (half[5, 5] != (60, 40, 20)).any()
+    assert viewer.render_frame({"image_path": str(tmp_path / "missing.png"), "labels": labels}) is None
+
+    # [name, vertices] lists and label functions of the frame size give the same frame
+    vertices = [["item", [(10, 10), (30, 10), (30, 30), (10, 30)]]]
+    assert (viewer.render_frame({"image_path": image_path, "labels": vertices}) ==
+            viewer.render_frame({"image_path": image_path, "labels": lambda width, height: labels})).all()
+
+
+def test_view_data_steps_through_frames(tmp_path, monkeypatch):
+    data = [{"image_path": write_image(tmp_path / "{}.png".format(ind), width=40 + ind), "labels": []}
+            for ind in range(3)]
+    keys = iter("kkkjq")
+    shown = []
+    monkeypatch.setattr(view_dataset.cv2, 'imshow', lambda window_name, image: shown.append(image.shape[1]))
+    monkeypatch.setattr(view_dataset.cv2, 'waitKeyEx', lambda delay: ord(next(keys)))
+
+    viewer = ViewDataset()
+    viewer.view_data(data, prefetch=1)
+    assert shown == [40, 41, 42, 42, 41]
+    summary = viewer.stats.summary()
+    assert summary['counters']['frames_shown'] == 5
+    assert summary['counters']['frames_rendered'] == 3
+
+
+def test_lazy_frames():
+    loaded = []
+    frames = view_dataset.LazyFrames(3, lambda ind: loaded.append(ind) or ind * 10)
+    assert len(frames) == 3 and loaded == []
+    assert frames[2] == 20 and loaded == [2]
+    assert list(frames) == [0, 10, 20]
+    for ind in (-1, 3):
+        with pytest.raises(IndexError):
+            frames[ind]
+
+
+def test_load_yolo(tmp_path):
+    for name in ("b", "a", "c"):
+        write_image(tmp_path / (name + ".jpg"), width=100, height=50)
+    for name in ("a", "b", "orphan"):
+        (tmp_path / (name + ".txt")).write_text("2 0.5 0.5 0.2 0.4\n1 0.1 0.1 0.1 0.1\n")
+
+    frames = ViewDataset().load_yolo(str(tmp_path), class2id={'1': 'person', '2': 'item'})
+    assert len(frames) == 2
+    assert [frames[ind]["image_path"] for ind in range(2)] == [str(tmp_path / "a.jpg"), str(tmp_path / "b.jpg")]
+    # Labels are scaled with the size of the decoded frame
+    class_names, class_ids, boxes = frames[0]["labels"](200, 100)
+    assert class_names == ["person", "item"]
+    assert class_ids.tolist() == [1, 0]
+    assert boxes.tolist() == [[80, 30, 120, 70], [10, 5, 30, 15]]
+
+
+def test_load_coco_skips_crowd(tmp_path):
+    (tmp_path / "annotations").mkdir()
+    coco_json = {
+        'images': [{'id': 1, 'file_name': "a.jpg", 'width': 10, 'height': 10},
+                   {'id': 2, 'file_name': "b.jpg", 'width': 10, 'height': 10}],
+        'categories': [{'id': 1, 'name': "item"}],
+        'annotations': [{'id': 1, 'image_id': 2, 'category_id': 1, 'bbox': [1, 1, 2, 2], 'iscrowd': 0},
+                        {'id': 2, 'image_id': 2, 'category_id': 1, 'bbox': [0, 0, 9, 9], 'iscrowd': 1}]
+    }
+    with open(str(tmp_path / "annotations" / "instances_val.json"), 'w') as fp:
+        json.dump(coco_json, fp)
+
+    frames = ViewDataset().load_coco(str(tmp_path), "val")
+    assert len(frames) == 2
+    assert frames[1]["image_path"] == str(tmp_path / "images" / "val" / "b.jpg")
+    class_names, class_ids, boxes = frames[1]["labels"]
+    assert class_names == ["item"]
+    assert boxes.tolist() == [[1, 1, 3, 3]]
+    assert len(frames[0]["labels"][2]) == 0
@@ -0,0 +1,34 @@
+import json
+import os
+
+from voc2coco import VOC2COCO
+
+LABEL2ID = {'item': 1, 'person': 2}
+
+
+def convert(voc_dir, coco_dir, **kwargs):
+    converter = VOC2COCO(voc_dir, coco_dir, "train", LABEL2ID)
+    converter.create_coco_annotation(**kwargs)
+    path = os.path.join(coco_dir, "annotations", "instances_train.json")
+    with open(path, 'rb') as fp:
+        return fp.read()
+
+
+def test_parallel_parsing_matches_serial(tmp_path, voc_dir):
+    serial = convert(voc_dir, str(tmp_path / "serial"), workers=1)
+    parallel = convert(voc_dir, str(tmp_path / "parallel"), workers=3)
+    assert serial == parallel
+
+    coco_json = json.loads(serial)
+    # Ids follow the sorted xml files, whatever order the workers finish in
+    assert [(image['id'], image['file_name']) for image in coco_json['images']] == \
+        [(ind + 1, "sample_{}.jpg".format(ind)) for ind in range(7)]
+    assert [ann['id'] for ann in coco_json['annotations']] == list(range(1, 10))
+    assert [ann['image_id'] for ann in coco_json['annotations']] == [2, 3, 3, 4, 4, 4, 6, 7, 7]
+    first = coco_json['annotations'][0]
+    # sample_1's box is (2, 3, 21, 30); VOC corners are 1-based
+    assert first['bbox'] == [1.0, 2.0, 20.0, 28.0]
+    assert first['area'] == 20.0 * 28.0
+    assert first['category_id'] == LABEL2ID['item']
+    assert coco_json['categories'] == [{'supercategory': 'none', 'id': 1, 'name': 'item'},
+                                       {'supercategory': 'none', 'id': 2, 'name': 'person'}]
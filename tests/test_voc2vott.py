@@ -0,0 +1,54 @@
+import json
+import multiprocessing
+import os
+
+import pytest
+
+from voc2vott import Voc2Vott
+
+
+def export(voc_dir, vott_dir, workers):
+    os.makedirs(vott_dir)
+    with open(os.path.join(vott_dir, "project.vott"), 'w') as fp:
+        json.dump({"name": "project"}, fp)
+    return Voc2Vott(voc_dir, vott_dir).convert(workers=workers, quiet=True)
+
+
+def read_files(folder):
+    result = {}
+    for name in sorted(os.listdir(folder)):
+        with open(os.path.join(folder, name), 'rb') as fp:
+            result[name] = fp.read()
+    return result
+
+
+def test_parallel_export_matches_serial(tmp_path, voc_dir):
+    serial = str(tmp_path / "serial")
+    parallel = str(tmp_path / "parallel")
+    summary = export(voc_dir, serial, workers=1)
+    export(voc_dir, parallel, workers=3)
+    assert summary['counters']['files'] == 7
+    assert summary['counters']['boxes'] == 9
+    assert read_files(serial) == read_files(parallel)
+
+    with open(os.path.join(serial, "project.vott.json"), 'r') as fp:
+        project = json.load(fp)
+    assert len(project['assets']) == 7
+    assert sorted(name for name in os.listdir(serial) if name.endswith("-asset.json")) == \
+        sorted("{}-asset.json".format(asset_id) for asset_id in project['assets'])
+
+
+def test_export_is_idempotent(tmp_path, voc_dir):
+    vott_dir = str(tmp_path / "vott")
+    export(voc_dir, vott_dir, workers=1)
+    first = read_files(vott_dir)
+    Voc2Vott(voc_dir, vott_dir).convert(workers=1, quiet=True)
+    assert read_files(vott_dir) == first
+
+
+def test_worker_errors_propagate_and_the_pool_is_shut_down(tmp_path, voc_dir):
+    with open(os.path.join(voc_dir, "Annotations", "broken.xml"), 'w') as fp:
+        fp.write("<annotation><filename>")
+    with pytest.raises(SyntaxError):
+        export(voc_dir, str(tmp_path / "vott"), workers=2)
+    assert multiprocessing.active_children() == []
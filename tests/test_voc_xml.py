@@ -0,0 +1,106 @@
+import pickle
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pytest
+
+from common.voc_xml import PARSERS, VocRecord, format_voc, parse_voc, write_voc_xml
+
+BACKENDS = sorted(PARSERS)
+
+OBJECT = ("<object><name>{}</name><bndbox><xmin>1</xmin><ymin>2.5</ymin><xmax>30</xmax><ymax>40</ymax></bndbox>"
+          "</object>")
+
+CASES = {
+    'plain': (
+        "<annotation><filename>a.jpg</filename><size><width>100</width><height>80</height></size>" +
+        OBJECT.format("item") + OBJECT.format("person") + "</annotation>",
+        VocRecord("a.jpg", None, "100", "80", ["item", "person"], [("1", "2.5", "30", "40")] * 2)),
+    'header_after_objects': (
+        "<annotation>" + OBJECT.format("item") + "<filename>a.jpg</filename><path>/data/b.jpg</path>"
+        "<size><width>100</width><height>80</height></size></annotation>",
+        VocRecord("a.jpg", "/data/b.jpg", "100", "80", ["item"], [("1", "2.5", "30", "40")])),
+    'nested_header_tags': (
+        "<annotation><filename>a.jpg</filename><size><width>100</width><height>80</height></size>"
+        "<object><name>item</name><size><width>5</width><height>6</height></size><filename>x.jpg</filename>"
+        "<bndbox><xmin>1</xmin><ymin>2</ymin><xmax>3</xmax><ymax>4</ymax></bndbox></object></annotation>",
+        VocRecord("a.jpg", None, "100", "80", ["item"], [("1", "2", "3", "4")])),
+    'parts': (
+        "<annotation><filename>a.jpg</filename><size><width>100</width><height>80</height></size>"
+        "<object><name>person</name><bndbox><xmin>1</xmin><ymin>2</ymin><xmax>30</xmax><ymax>40</ymax></bndbox>"
+        "<part><name>hand</name><bndbox><xmin>5</xmin><ymin>6</ymin><xmax>7</xmax><ymax>8</ymax></bndbox></part>"
+        "</object></annotation>",
+        VocRecord("a.jpg", None, "100", "80", ["person"], [("1", "2", "30", "40")])),
+    'missing_coordinate_and_size': (
+        "<annotation><filename>a.jpg</filename>"
+        "<object><name>item</name><bndbox><xmin>1</xmin><ymin>2</ymin><xmax>3</xmax></bndbox></object>"
+        "<object><name>item</name></object></annotation>",
+        VocRecord("a.jpg", None, None, None, ["item", "item"], [("1", "2", "3", None), (None, None, None, None)])),
+    'no_objects': (
+        "<annotation><filename>a.jpg</filename><size><width>100</width><height>80</height></size></annotation>",
+        VocRecord("a.jpg", None, "100", "80", [], [])),
+}
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('case', sorted(CASES))
+def test_parse_voc(tmp_path, backend, case):
+    content, expected = CASES[case]
+    ann_path = tmp_path / "a.xml"
+    ann_path.write_text(content)
+    assert parse_voc(str(ann_path), backend=backend) == expected
+    assert parse_voc(content.encode('utf-8'), backend=backend) == expected
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_parse_errors_are_picklable_parse_errors(backend):
+    with pytest.raises(ET.ParseError) as info:
+        parse_voc(b"<annotation><filename>", backend=backend)
+    # Raised in process pool workers, so they have to survive the trip back
+    assert isinstance(pickle.loads(pickle.dumps(info.value)), ET.ParseError)
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        parse_voc(b"<annotation/>", backend='sax')
+
+
+def element_tree_voc(filename, folder, width, height, names, boxes):
+    """ The tree the original converters built and wrote with ElementTree.
+    """
+    root = ET.Element("annotations")
+    ET.SubElement(root, "filename").text = filename
+    ET.SubElement(root, "folder").text = folder
+    size = ET.SubElement(root, "size")
+    ET.SubElement(size, "width").text = str(width)
+    ET.SubElement(size, "height").text = str(height)
+    ET.SubElement(size, "depth").text = "3"
+    for name, (xmin, ymin, xmax, ymax) in zip(names, boxes):
+        obj = ET.SubElement(root, "object")
+        ET.SubElement(obj, "name").text = name
+        ET.SubElement(obj, "pose").text = "Unspecified"
+        ET.SubElement(obj, "truncated").text = str(0)
+        ET.SubElement(obj, "difficult").text = str(0)
+        bbox = ET.SubElement(obj, "bndbox")
+        ET.SubElement(bbox, "xmin").text = str(xmin)
+        ET.SubElement(bbox, "ymin").text = str(ymin)
+        ET.SubElement(bbox, "xmax").text = str(xmax)
+        ET.SubElement(bbox, "ymax").text = str(ymax)
+    return root
+
+
+def test_format_voc_matches_element_tree(tmp_path):
+    names = ["item", "a & <b>", "café"]
+    boxes = [[1.0, 2.5, 136.76, 40.0], [0.1, 0.2, 0.3, 1919.0], [5.55, 6.0, 7.25, 8.0]]
+    args = ("im\"g & 1.jpg", "train", 1920, 1080, names, boxes)
+    expected_path = str(tmp_path / "expected.xml")
+    ET.ElementTree(element_tree_voc(*args)).write(expected_path)
+    with open(expected_path, 'rb') as fp:
+        expected = fp.read()
+    assert format_voc(*args) == expected
+
+    # float64 rows print like floats
+    assert format_voc(*args[:5], np.array(boxes)) == expected
+    write_voc_xml(str(tmp_path / "written.xml"), *args)
+    with open(str(tmp_path / "written.xml"), 'rb') as fp:
+        assert fp.read() == expected
@@ -0,0 +1,78 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from dataset.readers import read_voc, read_vott
+from dataset.writers import write_coco
+from voc2vott import Voc2Vott
+from vott2voc import Vott2Coco, Vott2Voc
+
+LABEL2ID = {'item': 1, 'person': 2}
+
+
+@pytest.fixture
+def vott_dir(tmp_path, voc_dir):
+    vott_dir = str(tmp_path / "vott")
+    os.makedirs(vott_dir)
+    with open(os.path.join(vott_dir, "project.vott"), 'w') as fp:
+        json.dump({"name": "project"}, fp)
+    Voc2Vott(voc_dir, vott_dir).convert(workers=1, quiet=True)
+    return vott_dir
+
+
+def set_state(vott_dir, image_name, state):
+    for name in os.listdir(vott_dir):
+        if not name.endswith("-asset.json"):
+            continue
+        path = os.path.join(vott_dir, name)
+        with open(path, 'r') as fp:
+            asset_data = json.load(fp)
+        if asset_data['asset']['name'] == image_name:
+            asset_data['asset']['state'] = state
+            with open(path, 'w') as fp:
+                json.dump(asset_data, fp)
+
+
+def voc_contents(voc_dir):
+    dataset = read_voc(voc_dir, class_names=list(LABEL2ID))
+    order = np.argsort(dataset.image_names)
+    return [(dataset.image_names[ind], dataset.image_sizes[ind].tolist(),
+             dataset.box_class[dataset.offsets[ind]:dataset.offsets[ind + 1]].tolist(),
+             dataset.boxes[dataset.offsets[ind]:dataset.offsets[ind + 1]].tolist()) for ind in order.tolist()]
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_vott_back_to_voc(tmp_path, voc_dir, vott_dir, workers):
+    output_dir = str(tmp_path / "output")
+    assert Vott2Voc(vott_dir, output_dir).convert(workers=workers, stage_mode='copy', quiet=True) == 7
+    assert voc_contents(output_dir) == voc_contents(voc_dir)
+    assert sorted(os.listdir(os.path.join(output_dir, "JPEGImages"))) == \
+        sorted(os.listdir(os.path.join(voc_dir, "JPEGImages")))
+
+
+def test_unvisited_assets_are_skipped(tmp_path, vott_dir):
+    set_state(vott_dir, "sample_2.jpg", 0)
+    labeled = str(tmp_path / "labeled")
+    assert Vott2Voc(vott_dir, labeled).convert(workers=2, quiet=True) == 6
+    assert "sample_2.xml" not in os.listdir(os.path.join(labeled, "Annotations"))
+    assert not os.path.exists(os.path.join(labeled, "JPEGImages"))
+    assert Vott2Voc(vott_dir, str(tmp_path / "all"), states=None).convert(workers=2, quiet=True) == 7
+
+
+def test_vott_to_coco_matches_the_coco_writer(tmp_path, vott_dir):
+    coco_dir = str(tmp_path / "coco")
+    assert Vott2Coco(vott_dir, coco_dir, "train", LABEL2ID).convert(workers=3, quiet=True) == 7
+    expected_dir = str(tmp_path / "expected")
+    write_coco(read_vott(vott_dir, class_names=list(LABEL2ID), workers=1), expected_dir, "train", label2id=LABEL2ID)
+
+    path = os.path.join("annotations", "instances_train.json")
+    with open(os.path.join(coco_dir, path), 'rb') as fp, open(os.path.join(expected_dir, path), 'rb') as expected:
+        assert fp.read() == expected.read()
+
+
+def test_vott_to_coco_rejects_unknown_labels(tmp_path, vott_dir):
+    with pytest.raises(AssertionError):
+        Vott2Coco(vott_dir, str(tmp_path / "coco"), "train", {'item': 1}).convert(workers=1, quiet=True)
+    assert not os.path.exists(os.path.join(str(tmp_path / "coco"), "annotations", "instances_train.json"))
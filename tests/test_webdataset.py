@@ -0,0 +1,81 @@
+import json
+import os
+import tarfile
+
+from convert import write_args
+from dataset.core import Dataset
+from dataset.readers import read_voc
+from dataset.webdataset import INDEX_NAME, ShardIndex, iter_webdataset, sample_keys, shard_paths, write_webdataset
+
+
+def read_files(folder):
+    result = {}
+    for name in sorted(os.listdir(folder)):
+        with open(os.path.join(folder, name), 'rb') as fp:
+            result[name] = fp.read()
+    return result
+
+
+def test_sample_keys():
+    names = ["a.b.jpg", "a_b.png", "x y.jpg", "c.jpg", "c.png", "c_4.jpg"]
+    dataset = Dataset.from_paths(names, [(1, 1)] * len(names), [], [], [], [])
+    assert sample_keys(dataset) == ["a_b", "a_b_1", "x_y", "c", "c_4", "c_4_5"]
+
+
+def test_write_and_iterate(tmp_path, voc_dir):
+    dataset = read_voc(voc_dir)
+    output_dir = str(tmp_path / "shards")
+    index = write_webdataset(dataset, output_dir, samples_per_shard=3, workers=1)
+    assert [shard['name'] for shard in index['shards']] == ["shard-000000.tar", "shard-000001.tar",
+                                                            "shard-000002.tar"]
+    assert index['samples'] == 7 and index['classes'] == ["item", "person"]
+    assert shard_paths(output_dir) == [os.path.join(output_dir, shard['name']) for shard in index['shards']]
+
+    samples = list(iter_webdataset(output_dir))
+    assert [sample['__key__'] for sample in samples] == ["sample_{}".format(ind) for ind in range(7)]
+    for ind, sample in enumerate(samples):
+        with open(dataset.image_path(ind), 'rb') as fp:
+            assert sample['jpg'] == fp.read()
+        box_class, boxes = dataset.image_boxes(ind)
+        assert sample['json'] == {
+            'file_name': "sample_{}.jpg".format(ind),
+            'width': 64 + 8 * ind,
+            'height': 48,
+            'labels': [dataset.class_names[class_id] for class_id in box_class.tolist()],
+            'boxes': boxes.tolist()
+        }
+
+    raw = next(iter_webdataset([os.path.join(output_dir, "shard-000001.tar")], decode=False))
+    assert raw['__key__'] == "sample_3" and json.loads(raw['json'])['file_name'] == "sample_3.jpg"
+    # Plain tar files, readable by any tar reader
+    with tarfile.open(os.path.join(output_dir, "shard-000002.tar")) as tar:
+        assert tar.getnames() == ["sample_6.jpg", "sample_6.json"]
+
+
+def test_parallel_shards_match_serial(tmp_path, voc_dir):
+    dataset = read_voc(voc_dir)
+    write_webdataset(dataset, str(tmp_path / "serial"), samples_per_shard=2, workers=1)
+    write_webdataset(dataset, str(tmp_path / "parallel"), samples_per_shard=2, workers=3)
+    serial = read_files(str(tmp_path / "serial"))
+    assert len(serial) == 5
+    assert serial == read_files(str(tmp_path / "parallel"))
+
+
+def test_shard_index_reads_single_samples(tmp_path, voc_dir):
+    output_dir = str(tmp_path / "shards")
+    write_webdataset(read_voc(voc_dir), output_dir, samples_per_shard=4, workers=2)
+    shard_index = ShardIndex(output_dir)
+    assert len(shard_index) == 7
+    assert shard_index.class_names == ["item", "person"]
+    streamed = {sample['__key__']: sample for sample in iter_webdataset(output_dir)}
+    for key in reversed(shard_index.keys()):
+        assert shard_index.read(key) == streamed[key]
+    assert isinstance(shard_index.read("sample_5", decode=False)['json'], bytes)
+
+    # Without the index the shards are listed by name
+    os.remove(os.path.join(output_dir, INDEX_NAME))
+    assert [sample['__key__'] for sample in iter_webdataset(output_dir)] == list(streamed)
+
+
+def test_convert_passes_workers_to_the_writer():
+    assert write_args('webdataset', "out", "train", None, None, 3) == (("out",), {'workers': 3})
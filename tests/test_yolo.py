@@ -0,0 +1,73 @@
+import numpy as np
+
+from common.yolo import decode_yolo, load_yolo_labels, load_yolo_shard
+
+
+def reference_corners(line, width, height):
+    """ The corners the original YOLO2VOC.extract_from_yolo_file computed with float() and round().
+    """
+    _, center_x, center_y, bbox_width, bbox_height = line.split(None)[:5]
+    bbox_width = float(bbox_width) * width
+    bbox_height = float(bbox_height) * height
+    center_x = float(center_x) * width
+    center_y = float(center_y) * height
+    return [max(round(center_x - (bbox_width / 2), 2), 1.0),
+            max(round(center_y - (bbox_height / 2), 2), 1.0),
+            min(round(center_x + (bbox_width / 2), 2), width - 1.0),
+            min(round(center_y + (bbox_height / 2), 2), height - 1.0)]
+
+
+def test_load_yolo_labels(tmp_path):
+    label_path = tmp_path / "a.txt"
+    label_path.write_text("0 0.5 0.5 0.2 0.4 0.9\n\n1 0.25 0.75 0.1 0.1\n")
+    labels = load_yolo_labels(str(label_path))
+    assert labels.dtype == np.float64
+    np.testing.assert_array_equal(labels, [[0, 0.5, 0.5, 0.2, 0.4], [1, 0.25, 0.75, 0.1, 0.1]])
+
+    empty_path = tmp_path / "empty.txt"
+    empty_path.write_text("")
+    assert load_yolo_labels(str(empty_path)).shape == (0, 5)
+
+
+def test_load_yolo_shard_offsets(tmp_path):
+    contents = ["0 0.5 0.5 0.2 0.2\n1 0.5 0.5 0.2 0.2\n", "", "2 0.1 0.1 0.1 0.1\n"]
+    label_paths = []
+    for ind, content in enumerate(contents):
+        label_path = tmp_path / "{}.txt".format(ind)
+        label_path.write_text(content)
+        label_paths.append(str(label_path))
+    labels, offsets = load_yolo_shard(label_paths)
+    assert offsets.tolist() == [0, 2, 2, 3]
+    assert labels[:, 0].tolist() == [0, 1, 2]
+
+
+def test_decode_yolo_matches_float_arithmetic():
+    rng = np.random.default_rng(0)
+    for width, height in [(3840, 2160), (1920, 1080), (640, 480)]:
+        values = np.concatenate([rng.random((500, 2)), rng.random((500, 2)) * 0.3], axis=1)
+        lines = ["{} {:.6f} {:.6f} {:.6f} {:.6f}".format(ind % 3, *row) for ind, row in enumerate(values)]
+        labels = np.array([line.split() for line in lines], dtype=np.float64)
+        class_ids, boxes = decode_yolo(labels, width, height)
+        assert boxes.dtype == np.float64
+        assert class_ids.tolist() == [ind % 3 for ind in range(len(lines))]
+        expected = [reference_corners(line, width, height) for line in lines]
+        assert [[str(value) for value in box] for box in boxes] == \
+            [[str(value) for value in box] for box in expected]
+
+
+def test_decode_yolo_margin_and_clipping():
+    # A box sticking out on every side of a 100 x 50 image
+    labels = np.array([[0, 0.5, 0.5, 1.2, 1.2]])
+    _, boxes = decode_yolo(labels, 100, 50)
+    np.testing.assert_array_equal(boxes, [[1.0, 1.0, 99.0, 49.0]])
+    _, boxes = decode_yolo(labels, 100, 50, margin=0)
+    np.testing.assert_array_equal(boxes, [[0.0, 0.0, 100.0, 50.0]])
+    _, boxes = decode_yolo(labels, 100, 50, margin=None)
+    np.testing.assert_array_equal(boxes, [[-10.0, -5.0, 110.0, 55.0]])
+
+
+def test_decode_yolo_per_row_sizes_and_drop_invalid():
+    labels = np.array([[0, 0.5, 0.5, 0.5, 0.5], [1, 0.5, 0.5, 0.5, 0.5], [2, 1.5, 0.5, 0.2, 0.2]])
+    class_ids, boxes = decode_yolo(labels, np.array([100, 200, 100]), np.array([100, 40, 100]), drop_invalid=True)
+    assert class_ids.tolist() == [0, 1]
+    np.testing.assert_array_equal(boxes, [[25, 25, 75, 75], [50, 10, 150, 30]])
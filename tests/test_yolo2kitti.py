@@ -0,0 +1,95 @@
+import json
+import os
+
+import pytest
+from PIL import Image
+
+from yolo2kitti.yolo2kitti import PARAMS_FILE, YOLO2KITTI
+
+ID2NAME = {0: 'item', 1: 'person'}
+
+
+@pytest.fixture
+def yolo_dir(tmp_path):
+    root = tmp_path / "yolo"
+    (root / "sub").mkdir(parents=True)
+    for ind in range(5):
+        folder = root / "sub" if ind % 2 else root
+        Image.new('RGB', (100, 50), (ind * 40, 0, 0)).save(str(folder / "image_{}.jpg".format(ind)))
+        if ind == 4:
+            continue
+        with open(str(folder / "image_{}.txt".format(ind)), 'w') as fp:
+            fp.write("" if ind == 3 else "{} 0.5 0.5 0.2 0.4\n1 0.1 0.1 0.1 0.1\n".format(ind % 2))
+    return str(root)
+
+
+def read_outputs(kitti_dir):
+    outputs = {}
+    for name in sorted(os.listdir(os.path.join(kitti_dir, "label"))):
+        with open(os.path.join(kitti_dir, "label", name), 'r') as fp:
+            outputs[name] = fp.read()
+    return outputs
+
+
+def test_convert_and_resize(tmp_path, yolo_dir):
+    kitti_dir = str(tmp_path / "kitti")
+    results = YOLO2KITTI(yolo_dir, kitti_dir, ID2NAME, width=200, height=100).convert(workers=1)
+    assert results == {'converted': 3, 'empty': 1, 'no_label': 1}
+
+    labels = read_outputs(kitti_dir)
+    assert sorted(labels) == ['image_0.txt', 'image_1.txt', 'image_2.txt']
+    # Boxes are scaled to the output size and clipped to one pixel off the border
+    assert labels['image_1.txt'] == "person 0 0 0 80.0 30.0 120.0 70.0 0 0 0 0 0 0 0\n" \
+                                    "person 0 0 0 10.0 5.0 30.0 15.0 0 0 0 0 0 0 0"
+    assert labels['image_0.txt'].splitlines()[0] == "item 0 0 0 80.0 30.0 120.0 70.0 0 0 0 0 0 0 0"
+    with Image.open(os.path.join(kitti_dir, "image", "image_1.jpg")) as img:
+        assert img.size == (200, 100)
+    with open(os.path.join(kitti_dir, PARAMS_FILE), 'r') as fp:
+        assert json.load(fp)['width'] == 200
+
+
+def test_original_size_is_staged(tmp_path, yolo_dir):
+    kitti_dir = str(tmp_path / "kitti")
+    YOLO2KITTI(yolo_dir, kitti_dir, ID2NAME).convert(workers=1)
+    assert read_outputs(kitti_dir)['image_2.txt'].splitlines()[0] == "item 0 0 0 40.0 15.0 60.0 35.0 0 0 0 0 0 0 0"
+    with open(os.path.join(yolo_dir, "image_2.jpg"), 'rb') as src, \
+            open(os.path.join(kitti_dir, "image", "image_2.jpg"), 'rb') as dst:
+        assert src.read() == dst.read()
+
+
+def test_parallel_matches_serial(tmp_path, yolo_dir):
+    serial_dir, parallel_dir = str(tmp_path / "serial"), str(tmp_path / "parallel")
+    serial = YOLO2KITTI(yolo_dir, serial_dir, ID2NAME, width=64, height=32).convert(workers=1)
+    parallel = YOLO2KITTI(yolo_dir, parallel_dir, ID2NAME, width=64, height=32).convert(workers=3)
+    assert serial == parallel
+    assert read_outputs(serial_dir) == read_outputs(parallel_dir)
+
+
+def test_rerun_skips_unless_params_change(tmp_path, yolo_dir):
+    kitti_dir = str(tmp_path / "kitti")
+    YOLO2KITTI(yolo_dir, kitti_dir, ID2NAME, width=64, height=32).convert(workers=1)
+    results = YOLO2KITTI(yolo_dir, kitti_dir, ID2NAME, width=64, height=32).convert(workers=1)
+    assert results['skipped'] == 3
+
+    results = YOLO2KITTI(yolo_dir, kitti_dir, {0: 'box', 1: 'person'}, width=64, height=32).convert(workers=1)
+    assert results['converted'] == 3
+    assert read_outputs(kitti_dir)['image_0.txt'].startswith("box ")
+
+
+def test_outputs_of_emptied_labels_are_removed(tmp_path, yolo_dir):
+    kitti_dir = str(tmp_path / "kitti")
+    YOLO2KITTI(yolo_dir, kitti_dir, ID2NAME).convert(workers=1)
+    label_path = os.path.join(yolo_dir, "image_0.txt")
+    with open(label_path, 'w') as fp:
+        fp.write("")
+    os.utime(label_path, ns=(2 ** 62, 2 ** 62))
+
+    results = YOLO2KITTI(yolo_dir, kitti_dir, ID2NAME).convert(workers=1)
+    assert results == {'skipped': 2, 'empty': 2, 'no_label': 1}
+    assert 'image_0.txt' not in read_outputs(kitti_dir)
+    assert not os.path.exists(os.path.join(kitti_dir, "image", "image_0.jpg"))
+
+
+def test_width_without_height(tmp_path):
+    with pytest.raises(ValueError):
+        YOLO2KITTI(str(tmp_path / "yolo"), str(tmp_path / "kitti"), ID2NAME, width=10)
@@ -1,112 +1,167 @@
 import os
-from collections import defaultdict
-from pathlib import Path
+from collections.abc import Sequence
+from functools import partial
 
 import cv2
-from pycocotools.coco import COCO
+import numpy as np
 
-from visualize.draw_settings import CYAN
-from visualize.draw_utils import apply_polygon, apply_text_left
+from common.instrument import RunStats, setup_logging
+from common.yolo import decode_yolo, load_yolo_labels
+from dataset.readers import read_dataset
+from visualize.draw_settings import CYAN, GREEN
+from visualize.draw_utils import GlyphCache, apply_boxes, apply_labels
+from visualize.frame_cache import FramePrefetcher
+
+
+class LazyFrames(Sequence):
+    """ Sequence of viewer items that are only built when an index is accessed.
+    """
+
+    def __init__(self, size, loader):
+        self.size = size
+        self.loader = loader
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, ind):
+        if not 0 <= ind < self.size:
+            raise IndexError(ind)
+        return self.loader(ind)
 
 
 class ViewDataset:
 
-    def yolo(self, yolo_dir, ext='.jpg', class2id=None):
-        data = []
-        yolo_dir = Path(yolo_dir)
-        for label_txt in yolo_dir.glob("*.txt"):
-            image_base = str(label_txt.absolute())[:-4]
-            image_path = image_base + ext
-            if os.path.isfile(image_path) is True:
-                image = cv2.imread(image_path)
-                height, width = image.shape[:2]
+    def __init__(self):
+        self.glyph_cache = GlyphCache(font_scale=0.5)
+        self.stats = RunStats('view_dataset')
 
-                with open(str(label_txt.absolute()), 'r') as fp:
-                    labels = []
-                    for line in fp.readlines():
-                        class_id, center_x, center_y, bbox_width, bbox_height = line.split(None)[:5]
-                        class_name = class2id[class_id] if class2id else class_id
-                        bbox_width = float(bbox_width) * width
-                        bbox_height = float(bbox_height) * height
-                        center_x = float(center_x) * width
-                        center_y = float(center_y) * height
-                        xmin = max(int(center_x - (bbox_width / 2)), 1)
-                        ymin = max(int(center_y - (bbox_height / 2)), 1)
-                        xmax = min(int(center_x + (bbox_width / 2)), width - 1)
-                        ymax = min(int(center_y + (bbox_height / 2)), height - 1)
-                        vertices = [(xmin, ymin), (xmax, ymin), (xmax, ymax), (xmin, ymax)]
-                        labels.append([class_name, vertices])
-                    data.append({
-                        "image_path": image_path,
-                        "labels": labels
-                    })
-
-        self.view_data(data, window_name="YOLO")
+    def yolo(self, yolo_dir, ext='.jpg', class2id=None):
+        self.view_data(self.load_yolo(yolo_dir, ext=ext, class2id=class2id), window_name="YOLO")
+
+    def load_yolo(self, yolo_dir, ext='.jpg', class2id=None):
+        """ Index the label files with a matching image, in sorted order, with a single directory listing.
+
+        Labels are parsed when an item is accessed and scaled with the size of the decoded frame.
+        """
+        yolo_dir = os.path.abspath(os.path.expanduser(yolo_dir))
+        file_names = {entry.name for entry in os.scandir(yolo_dir) if entry.is_file()}
+        bases = sorted(name[:-4] for name in file_names if name.endswith('.txt') and name[:-4] + ext in file_names)
+
+        def load(ind):
+            base = os.path.join(yolo_dir, bases[ind])
+            return {
+                "image_path": base + ext,
+                "labels": partial(self.yolo_labels, base + '.txt', class2id)
+            }
+        return LazyFrames(len(bases), load)
+
+    @staticmethod
+    def yolo_labels(label_path, class2id, width, height):
+        class_ids, boxes = decode_yolo(load_yolo_labels(label_path), width, height, decimals=None)
+        unique_ids, class_ids = np.unique(class_ids, return_inverse=True)
+        class_names = [class2id[str(class_id)] if class2id else str(class_id) for class_id in unique_ids.tolist()]
+        return class_names, class_ids, boxes.astype(np.int32)
 
     def pascal_voc(self, voc_dir):
         pass
 
     def coco(self, coco_dir, coco_set_name):
-        coco_dir = os.path.expanduser(coco_dir)
-        _coco = COCO(os.path.join(coco_dir, 'annotations', 'instances_' + coco_set_name + '.json'))
-        image_ids = _coco.getImgIds()
-        annotations_ids = _coco.getAnnIds(imgIds=image_ids, iscrowd=False)
-        coco_annotations = _coco.loadAnns(annotations_ids)
-        class2id = {item["id"]: item["name"] for item in _coco.cats.values()}
-
-        image2label = defaultdict(lambda: [])
-        for ann in coco_annotations:
-            xmin, ymin, b_width, b_height = ann["bbox"]
-            xmax = xmin + b_width
-            ymax = ymin + b_height
-            vertices = [(xmin, ymin), (xmax, ymin), (xmax, ymax), (xmin, ymax)]
-            class_name = class2id[ann["category_id"]]
-            image2label[ann["image_id"]].append([class_name, vertices])
-        # for image_id, labels in image2label.items():
-        #     image_path =
-
-        images = _coco.loadImgs(image_ids)
-        data = []
-        for image in images:
-            image_id = image["id"]
-            image_path = os.path.join(coco_dir, "images", coco_set_name, image["file_name"])
-            data.append({
-                "image_path": image_path,
-                "labels": image2label[image_id]
-            })
-        self.view_data(data, window_name="COCO")
-
-    def view_data(self, data, window_name="Data", show_name=True):
-        ind = 0
-        while True:
-            image_info = data[ind]
-            image_path = image_info["image_path"]
-            image = cv2.imread(image_path)
+        self.view_data(self.load_coco(coco_dir, coco_set_name), window_name="COCO")
+
+    def load_coco(self, coco_dir, coco_set_name):
+        """ Lazy items over the (cached, memory-mapped) COCO set; labels are built per viewed image.
+        """
+        # Crowd regions are not drawn, as before
+        dataset = read_dataset('coco', coco_dir, coco_set_name, include_crowd=False)
+
+        def load(ind):
+            box_class, boxes = dataset.image_boxes(ind)
+            return {
+                "image_path": dataset.image_path(ind),
+                "labels": (dataset.class_names, box_class, boxes)
+            }
+        return LazyFrames(len(dataset), load)
+
+    def render_frame(self, image_info, show_name=True, max_size=None, alpha=None):
+        """ Decode an image and draw its labels, downscaling first so that it fits in max_size (width, height).
+
+        image_info["labels"] is a (class_names, class_ids, (N, 4) boxes) tuple, a list of [name, vertices],
+        or a function of the frame's (width, height) returning either.
+        """
+        with self.stats.stage('decode'):
+            image = cv2.imread(image_info["image_path"])
+        if image is None:
+            return None
+        with self.stats.stage('labels'):
             labels = image_info["labels"]
-            for name, vertices in labels:
-                image = apply_polygon(image, vertices)
-                if show_name is True:
-                    (x1, y1), _, (x2, y2), _ = vertices
-                    image = apply_text_left(
-                        image=image,
-                        bbox=(y1, x1, y2, x2),
-                        color=CYAN,
-                        text=name,
-                        font_scale=0.5
-                    )
-            cv2.imshow(window_name, image)
-
-            key = cv2.waitKeyEx(0)
-            key = key & 0xFF
-            if key == ord('q'):
-                break
-            elif key == ord('j'):
-                ind = max(0, ind - 1)
-            elif key == ord('k'):
-                ind = min(len(data), ind + 1)
+            if callable(labels):
+                labels = labels(image.shape[1], image.shape[0])
+            if isinstance(labels, tuple):
+                class_names, class_ids, boxes = labels
+            else:
+                class_names, class_ids, boxes = self.labels_to_arrays(labels)
+
+        with self.stats.stage('draw'):
+            scale = 1.0
+            if max_size is not None:
+                height, width = image.shape[:2]
+                scale = min(max_size[0] / width, max_size[1] / height, 1.0)
+                if scale < 1.0:
+                    image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+            boxes = np.asarray(boxes, dtype=np.float32) * scale
+            image = apply_boxes(image, boxes, colors=[GREEN], alpha=alpha)
+            if show_name is True:
+                image = apply_labels(image, boxes, class_ids, class_names, color=CYAN, glyph_cache=self.glyph_cache)
+        self.stats.count('frames_rendered')
+        self.stats.count('boxes_drawn', len(boxes))
+        return image
+
+    @staticmethod
+    def labels_to_arrays(labels):
+        """ [name, vertices] lists -> (class_names, class_ids, (N, 4) boxes).
+        """
+        class_names = sorted({name for name, _ in labels})
+        class_index = {name: ind for ind, name in enumerate(class_names)}
+        class_ids = np.array([class_index[name] for name, _ in labels], dtype=np.int32)
+        boxes = np.array([[x1, y1, x2, y2] for _, ((x1, y1), _, (x2, y2), _) in labels], dtype=np.float32)
+        return class_names, class_ids, boxes.reshape(-1, 4)
+
+    def view_data(self, data, window_name="Data", show_name=True, max_size=None, prefetch=4, cache_mb=512,
+                  alpha=None):
+        """ Step through data with j (previous), k (next) and q (quit).
+
+        The next / previous `prefetch` frames are rendered in the background and kept in an LRU
+        cache of at most cache_mb megabytes; max_size=(width, height) downscales frames before drawing.
+        """
+        def render(ind):
+            return self.render_frame(data[ind], show_name=show_name, max_size=max_size, alpha=alpha)
+
+        ind = 0
+        self.stats.restart()
+        with FramePrefetcher(render, len(data), radius=prefetch, max_bytes=cache_mb << 20) as prefetcher:
+            while True:
+                # Time the viewer waits for a frame that was not prefetched in time
+                with self.stats.stage('frame_wait'):
+                    image = prefetcher.get(ind)
+                self.stats.count('frames_shown')
+                if image is not None:
+                    cv2.imshow(window_name, image)
+
+                key = cv2.waitKeyEx(0)
+                key = key & 0xFF
+                if key == ord('q'):
+                    break
+                elif key == ord('j'):
+                    ind = max(0, ind - 1)
+                elif key == ord('k'):
+                    ind = min(len(data) - 1, ind + 1)
+        self.stats.finish()
 
 
 if __name__ == "__main__":
+    setup_logging()
     CLASS_MAPPING = {
         '1': 'person',
         '2': 'item'
@@ -0,0 +1,147 @@
+# Render labelled thumbnails of a dataset into grid contact sheets, without a display
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+from tqdm import tqdm
+
+from dataset.readers import READERS, read_dataset
+from dataset.validate import geometry_issues
+from visualize.draw_settings import CYAN, GREEN, RED
+from visualize.draw_utils import apply_polygon, apply_text_left
+
+
+def invalid_boxes(dataset):
+    """ (B,) bool mask of degenerate or out-of-bounds boxes.
+    """
+    issues = geometry_issues(dataset)
+    return issues['degenerate'] | issues['out_of_bounds']
+
+
+def select_images(dataset, classes=None, min_boxes=None, max_boxes=None, only_invalid=False):
+    """ Indices of the images that have any of classes, a box count in [min_boxes, max_boxes] and,
+    with only_invalid=True, at least one invalid box.
+    """
+    keep = np.ones(len(dataset), dtype=bool)
+    counts = np.diff(dataset.offsets)
+    if classes:
+        wanted = np.array([name in classes for name in dataset.class_names], dtype=bool)
+        has_class = np.bincount(dataset.box_image[wanted[dataset.box_class]], minlength=len(dataset)) > 0
+        keep &= has_class
+    if min_boxes is not None:
+        keep &= counts >= min_boxes
+    if max_boxes is not None:
+        keep &= counts <= max_boxes
+    if only_invalid is True:
+        keep &= np.bincount(dataset.box_image[invalid_boxes(dataset)], minlength=len(dataset)) > 0
+    return np.flatnonzero(keep)
+
+
+def render_thumbnail(image_path, names, boxes, invalid, tile_size, show_name=True):
+    """ Decode an image, fit it into tile_size (width, height) and draw its boxes; invalid boxes are red.
+    """
+    tile_width, tile_height = tile_size
+    tile = np.zeros((tile_height, tile_width, 3), dtype=np.uint8)
+    image = cv2.imread(image_path)
+    if image is None:
+        return apply_text_left(tile, (5, 20), RED, "missing: " + os.path.basename(image_path))
+
+    height, width = image.shape[:2]
+    scale = min(tile_width / width, tile_height / height)
+    image = cv2.resize(image, (max(1, int(width * scale)), max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+    for name, (x1, y1, x2, y2), bad in zip(names, (boxes * scale).tolist(), invalid.tolist()):
+        vertices = [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]
+        image = apply_polygon(image, vertices, color=RED if bad else GREEN, thickness=1)
+        if show_name is True:
+            image = apply_text_left(image=image, bbox=(y1, x1, y2, x2), color=CYAN, text=name, font_scale=0.3)
+    tile[:image.shape[0], :image.shape[1]] = image
+    return apply_text_left(tile, (2, tile_height - 4), (255, 255, 255), os.path.basename(image_path), font_scale=0.35)
+
+
+def render_sheet(items, sheet_path, columns, tile_size, show_name=True, jpeg_quality=90):
+    """ Render items (image_path, names, boxes, invalid) into a grid and write it to sheet_path.
+    """
+    tile_width, tile_height = tile_size
+    rows = (len(items) + columns - 1) // columns
+    sheet = np.zeros((rows * tile_height, columns * tile_width, 3), dtype=np.uint8)
+    for ind, (image_path, names, boxes, invalid) in enumerate(items):
+        row, column = divmod(ind, columns)
+        sheet[row * tile_height:(row + 1) * tile_height, column * tile_width:(column + 1) * tile_width] = \
+            render_thumbnail(image_path, names, boxes, invalid, tile_size, show_name=show_name)
+    cv2.imwrite(sheet_path, sheet, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+    return sheet_path
+
+
+def render_contact_sheets(dataset, output_dir, image_indices=None, columns=8, rows=6, tile_size=(256, 192),
+                          extension='.jpg', show_name=True, workers=None):
+    """ Render the selected images into contact sheets on a process pool.
+
+    Writes sheet_<n><extension> files and an index.json listing the images of every sheet.
+    Returns the list of sheet paths.
+    """
+    output_dir = os.path.expanduser(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    if image_indices is None:
+        image_indices = np.arange(len(dataset))
+    invalid = invalid_boxes(dataset)
+    per_sheet = columns * rows
+
+    jobs = []
+    index = {}
+    for sheet_ind, start in enumerate(range(0, len(image_indices), per_sheet)):
+        items = []
+        for image_ind in image_indices[start:start + per_sheet].tolist():
+            box_start, box_end = dataset.offsets[image_ind], dataset.offsets[image_ind + 1]
+            names = [dataset.class_names[class_id] for class_id in dataset.box_class[box_start:box_end].tolist()]
+            items.append((dataset.image_path(image_ind), names, np.array(dataset.boxes[box_start:box_end]),
+                          invalid[box_start:box_end]))
+        sheet_path = os.path.join(output_dir, "sheet_{:05d}{}".format(sheet_ind, extension))
+        index[os.path.basename(sheet_path)] = [item[0] for item in items]
+        jobs.append((items, sheet_path))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(render_sheet, items, sheet_path, columns, tile_size, show_name)
+                   for items, sheet_path in jobs]
+        sheet_paths = [future.result() for future in tqdm(futures)]
+
+    with open(os.path.join(output_dir, "index.json"), 'w') as fp:
+        json.dump(index, fp, indent=4)
+    return sheet_paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render contact sheets of a dataset for QA")
+    parser.add_argument("--format", type=str, choices=sorted(READERS))
+    parser.add_argument("--dataset_dir", type=str)
+    parser.add_argument("--set_name", type=str, default="train", help="COCO set name")
+    parser.add_argument("--output_dir", type=str)
+    parser.add_argument("--classes", type=str, default=None, help="Only images with any of these comma separated classes")
+    parser.add_argument("--min_boxes", type=int, default=None)
+    parser.add_argument("--max_boxes", type=int, default=None)
+    parser.add_argument("--only_invalid", action="store_true", help="Only images with degenerate / out-of-bounds boxes")
+    parser.add_argument("--columns", type=int, default=8)
+    parser.add_argument("--rows", type=int, default=6)
+    parser.add_argument("--tile_width", type=int, default=256)
+    parser.add_argument("--tile_height", type=int, default=192)
+    parser.add_argument("--extension", type=str, default=".jpg", choices=[".jpg", ".png"])
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.format == 'coco':
+        dataset = read_dataset('coco', args.dataset_dir, args.set_name)
+    else:
+        dataset = read_dataset(args.format, args.dataset_dir)
+    classes = args.classes.split(",") if args.classes else None
+    image_indices = select_images(dataset, classes=classes, min_boxes=args.min_boxes, max_boxes=args.max_boxes,
+                                  only_invalid=args.only_invalid)
+    print("Rendering {} of {} images".format(len(image_indices), len(dataset)))
+    render_contact_sheets(dataset, args.output_dir, image_indices, columns=args.columns, rows=args.rows,
+                          tile_size=(args.tile_width, args.tile_height), extension=args.extension,
+                          workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
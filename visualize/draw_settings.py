@@ -9,3 +9,6 @@ YELLOW = (0, 255, 255)
 MAGENTA = (255, 0, 255)
 ORANGE = (0, 128, 255)
 
+
+# Per-class colours used by the batch drawing functions, indexed by class id modulo its length
+CLASS_COLORS = [GREEN, BLUE, RED, PINK, ORANGE, YELLOW, MAGENTA, LAWN_GREEN, CYAN, WHITE]
@@ -3,7 +3,7 @@ from math import ceil
 import cv2
 import numpy as np
 
-from visualize.draw_settings import GREEN
+from visualize.draw_settings import CLASS_COLORS, GREEN
 
 
 def apply_box(image, bbox, color=GREEN, thickness=2, ratio=1):
@@ -22,6 +22,89 @@ def apply_polygon(image, pts_list, color=GREEN, thickness=2):
     return image
 
 
+def box_polygons(boxes):
+    """ (N, 4) x1, y1, x2, y2 boxes -> (N, 4, 2) int32 polygon vertices.
+    """
+    boxes = np.asarray(boxes).reshape(-1, 4).astype(np.int32)
+    x1, y1, x2, y2 = boxes.T
+    return np.stack([x1, y1, x2, y1, x2, y2, x1, y2], axis=1).reshape(-1, 4, 2)
+
+
+def apply_boxes(image, boxes, class_ids=None, colors=CLASS_COLORS, thickness=2, alpha=None):
+    """ Draw (N, 4) x1, y1, x2, y2 boxes with one cv2.polylines call per class colour.
+
+    colors is indexed by class id (modulo its length); with alpha the boxes are blended onto the image.
+    """
+    polygons = box_polygons(boxes)
+    if len(polygons) == 0:
+        return image
+    if class_ids is None:
+        class_ids = np.zeros(len(polygons), dtype=np.int32)
+    color_ids = np.asarray(class_ids) % len(colors)
+
+    target = image if alpha is None else image.copy()
+    for color_id in np.unique(color_ids):
+        cv2.polylines(target, polygons[color_ids == color_id], True, colors[color_id], thickness)
+    if alpha is not None:
+        cv2.addWeighted(target, alpha, image, 1 - alpha, 0, dst=image)
+    return image
+
+
+class GlyphCache:
+    """ Text rendered once and kept as the pixel offsets and coverage of its strokes, to be stamped anywhere.
+    """
+
+    def __init__(self, font_scale=0.5, thickness=1, font=cv2.FONT_HERSHEY_DUPLEX):
+        self.font_scale = font_scale
+        self.thickness = thickness
+        self.font = font
+        self._glyphs = {}
+
+    def get(self, text):
+        """ Returns (dy, dx, weight): int arrays of the text's pixels relative to its bottom-left (cv2.putText)
+        origin, and their float32 coverage in (0, 1] from cv2's anti-aliased strokes.
+        """
+        glyph = self._glyphs.get(text)
+        if glyph is None:
+            (width, height), baseline = cv2.getTextSize(text, self.font, self.font_scale, self.thickness)
+            # Strokes reach past the text box by about the thickness; descenders go down to the baseline
+            pad = 2 * self.thickness + 4
+            mask = np.zeros((height + baseline + 2 * pad, width + 2 * pad), dtype=np.uint8)
+            cv2.putText(mask, text, (pad, pad + height), self.font, self.font_scale, 255, self.thickness)
+            dy, dx = np.nonzero(mask)
+            glyph = (dy - pad - height, dx - pad, mask[dy, dx].astype(np.float32) / 255)
+            self._glyphs[text] = glyph
+        return glyph
+
+
+def apply_labels(image, boxes, class_ids, names, color=(255, 255, 0), glyph_cache=None):
+    """ Write names[class_id] at the left middle of every box, like apply_text_left.
+
+    Every class name is rendered once by the glyph cache and blended onto all of its boxes with one
+    fancy-indexed read and write per class. The result matches cv2.putText except where strokes of
+    one glyph overlap: putText blends those pixels twice, the cached coverage once, so they can
+    differ by a few intensity levels.
+    """
+    glyph_cache = glyph_cache or GlyphCache()
+    boxes = np.asarray(boxes).reshape(-1, 4).astype(np.int32)
+    class_ids = np.asarray(class_ids)
+    color = np.asarray(color, dtype=np.float32)
+    image_height, image_width = image.shape[:2]
+    origin_x = boxes[:, 0] + 5
+    origin_y = (boxes[:, 1] + boxes[:, 3]) // 2
+    for class_id in np.unique(class_ids):
+        selected = class_ids == class_id
+        dy, dx, weight = glyph_cache.get(names[class_id])
+        ys = (origin_y[selected][:, None] + dy[None, :]).ravel()
+        xs = (origin_x[selected][:, None] + dx[None, :]).ravel()
+        weights = np.broadcast_to(weight, (int(selected.sum()), len(weight))).ravel()
+        inside = (ys >= 0) & (ys < image_height) & (xs >= 0) & (xs < image_width)
+        ys, xs, weights = ys[inside], xs[inside], weights[inside][:, None]
+        pixels = image[ys, xs].astype(np.float32)
+        image[ys, xs] = np.round(pixels + (color - pixels) * weights).astype(image.dtype)
+    return image
+
+
 def apply_line(image, start_point, end_point, color, thickness=1, ratio=1):
     thickness *= ceil(ratio)
     cv2.line(image, start_point, end_point, color=color, thickness=thickness)
@@ -0,0 +1,92 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class FrameCache:
+    """ LRU cache of rendered frames bounded by their total size in bytes.
+    """
+
+    def __init__(self, max_bytes=512 << 20):
+        self.max_bytes = max_bytes
+        self.num_bytes = 0
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._frames
+
+    def get(self, key):
+        with self._lock:
+            frame = self._frames.get(key)
+            if frame is not None:
+                self._frames.move_to_end(key)
+            return frame
+
+    def put(self, key, frame):
+        with self._lock:
+            if key in self._frames:
+                self.num_bytes -= self._frames.pop(key).nbytes
+            self._frames[key] = frame
+            self.num_bytes += frame.nbytes
+            while self.num_bytes > self.max_bytes and len(self._frames) > 1:
+                _, evicted = self._frames.popitem(last=False)
+                self.num_bytes -= evicted.nbytes
+
+
+class FramePrefetcher:
+    """ Renders frames around the current index on background threads.
+
+    render(ind) must return the frame (a NumPy image) for index ind; frames are kept in a FrameCache.
+    """
+
+    def __init__(self, render, size, radius=4, workers=2, max_bytes=512 << 20):
+        self.render = render
+        self.size = size
+        self.radius = radius
+        self.cache = FrameCache(max_bytes=max_bytes)
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _render(self, ind):
+        try:
+            frame = self.render(ind)
+            if frame is not None:
+                self.cache.put(ind, frame)
+            return frame
+        finally:
+            with self._lock:
+                self._pending.pop(ind, None)
+
+    def _submit(self, ind):
+        with self._lock:
+            future = self._pending.get(ind)
+            if future is None and ind not in self.cache:
+                future = self._executor.submit(self._render, ind)
+                self._pending[ind] = future
+            return future
+
+    def get(self, ind):
+        """ Return the frame of ind (waiting for it if needed) and start prefetching its neighbours.
+        """
+        frame = self.cache.get(ind)
+        if frame is None:
+            future = self._submit(ind)
+            frame = future.result() if future is not None else self.cache.get(ind)
+        # next frames first, the user mostly steps forward
+        for offset in range(1, self.radius + 1):
+            for neighbour in (ind + offset, ind - offset):
+                if 0 <= neighbour < self.size:
+                    self._submit(neighbour)
+        return frame
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,10 +1,19 @@
-import json
+import hashlib
+import logging
 import os
-import shutil
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 from tqdm import tqdm
-import xml.etree.ElementTree as ET
+
+from common.coco_shards import shard_bounds, shard_id_stride, shard_path
+from common.coco_writer import CocoJsonWriter
+from common.instrument import RunStats, log_event, profiled, setup_logging
+from common.manifest import AnnotationManifest
+from common.staging import Stager
+from common.voc_xml import parse_voc
+
+logger = logging.getLogger(__name__)
 
 
 class VOC2COCO:
@@ -13,77 +22,197 @@ class VOC2COCO:
         self.coco_dir = os.path.expanduser(coco_dir)
         self.coco_set_name = coco_set_name
         self.label2id = label2id
+        self.stats = RunStats('voc2coco')
+
+    def convert(self, extension='.jpg', workers=1, indent=4, incremental=False, stage_mode=None, summary_path=None,
+                num_shards=1, shard_index=None):
+        """ Stage the images and write the COCO json, then log the run summary (and write it to summary_path).
+
+        See create_coco_annotation for num_shards / shard_index.
+        """
+        self.stats.restart()
+        with profiled():
+            self.prepare_images(no_copy=True, extension=extension, mode=stage_mode)
+            self.create_coco_annotation(workers=workers, indent=indent, incremental=incremental,
+                                        num_shards=num_shards, shard_index=shard_index)
+        return self.stats.finish(summary_path)
 
-    def convert(self, extension='.jpg'):
-        self.prepare_images(no_copy=True, extension=extension)
-        self.create_coco_annotation()
+    def prepare_images(self, no_copy=True, extension='.jpg', mode=None, workers=8):
+        """ Stage the VOC images into the COCO images folder.
 
-    def prepare_images(self, no_copy=True, extension='.jpg'):
+        mode is one of common.staging.STAGE_MODES; by default images are moved (no_copy=True) or copied.
+        """
+        if mode is None:
+            mode = 'move' if no_copy is True else 'copy'
         voc_image_dir = os.path.join(self.voc_dir, "JPEGImages")
         voc_image_dir = Path(voc_image_dir)
         coco_image_dir = os.path.join(self.coco_dir, "images", self.coco_set_name)
         if os.path.isdir(coco_image_dir) is False:
             os.makedirs(coco_image_dir, exist_ok=True)
-        for image in voc_image_dir.glob("*{}".format(extension)):
-            src_path = str(image.absolute())
-            dst_path = os.path.join(coco_image_dir, str(image.name))
-            if no_copy is True:
-                shutil.move(src_path, dst_path)
-            else:
-                shutil.copy(src_path, dst_path)
-        print("Done processing image files")
-
-    def create_coco_annotation(self):
-        coco_ann_json = {
-            "images": [],
-            "type": "instances",
-            "annotations": [],
-            "categories": []
-        }
+        with self.stats.stage('stage_images'), Stager(mode=mode, workers=workers) as stager:
+            for image in voc_image_dir.glob("*{}".format(extension)):
+                stager.submit(str(image.absolute()), os.path.join(coco_image_dir, str(image.name)))
+        self.stats.count('images_staged', sum(stager.counts.values()))
+        self.stats.count('bytes_copied', stager.bytes_copied)
+        log_event(logger, "Done processing image files", **stager.counts)
+
+    def create_coco_annotation(self, workers=1, indent=4, incremental=False, num_shards=1, shard_index=None):
+        """ Write annotations/instances_<set>.json, or num_shards shard files instead.
+
+        The sorted xml files are cut into num_shards contiguous shards, written to
+        instances_<set>-<index>-of-<num_shards>.json. Image ids are the same as in the unsharded file and
+        annotation ids of shard k start at k * shard_id_stride(num_shards) + 1, so shards written by separate
+        processes or machines (one shard_index each) never clash and all ids stay below 2**31; a shard with more
+        annotations than that stride raises ValueError. merge_coco.py joins them back into one file.
+        With shard_index=None every shard is written here.
+        """
         voc_ann_dir = os.path.join(self.voc_dir, "Annotations")
         voc_ann_dir = Path(voc_ann_dir)
-        ann_paths = [str(ann.absolute()) for ann in voc_ann_dir.glob("*.xml")]
-
-        bnd_id = 1  # START_BOUNDING_BOX_ID
-        image_id = 0
-        print('Start converting !')
-        for ann_path in tqdm(ann_paths):
-            image_id += 1
-            # Read annotation xml
-            ann_tree = ET.parse(ann_path)
-            ann_root = ann_tree.getroot()
-            image_info = self.get_image_info(ann_root)
-            image_info.update({"id": image_id})
-            coco_ann_json["images"].append(image_info)
-
-            for obj in ann_root.findall('object'):
-                ann = self.get_coco_annotation_from_obj(obj=obj)
-                ann.update({'image_id': image_id, 'id': bnd_id})
-                coco_ann_json['annotations'].append(ann)
-                bnd_id = bnd_id + 1
-
-        for label, label_id in self.label2id.items():
-            category_info = {'supercategory': 'none', 'id': label_id, 'name': label}
-            coco_ann_json['categories'].append(category_info)
-
-        coco_ann_dir = os.path.join(self.coco_dir, "annotations")
-        if os.path.isdir(coco_ann_dir) is False:
-            os.makedirs(coco_ann_dir, exist_ok=True)
-        coco_ann_path = os.path.join(coco_ann_dir, "instances_" + self.coco_set_name + '.json')
-
-        with open(coco_ann_path, 'w') as fp:
-            json.dump(coco_ann_json, fp, indent=4)
-
-    def get_image_info(self, annotation_root):
-        path = annotation_root.findtext('path')
-        if path is None:
-            filename = annotation_root.findtext('filename')
+        # Sorted so that image / annotation ids do not depend on the parse order
+        with self.stats.stage('glob'):
+            ann_paths = sorted(str(ann.absolute()) for ann in voc_ann_dir.glob("*.xml"))
+
+        categories = self.categories()
+        coco_ann_path = os.path.join(self.coco_dir, "annotations", "instances_" + self.coco_set_name + '.json')
+
+        log_event(logger, "Start converting", files=len(ann_paths))
+        if incremental is True:
+            if num_shards > 1:
+                raise ValueError("incremental conversion does not support shards")
+            self.create_coco_annotation_incremental(ann_paths, coco_ann_path, categories, workers, indent)
+            return
+
+        if num_shards <= 1:
+            self.write_coco_shard(ann_paths, 0, coco_ann_path, categories, workers=workers, indent=indent)
+            return
+        shard_indices = range(num_shards) if shard_index is None else [shard_index]
+        stride = shard_id_stride(num_shards)
+        for index in shard_indices:
+            start, stop = shard_bounds(len(ann_paths), num_shards, index)
+            self.write_coco_shard(ann_paths[start:stop], start, shard_path(coco_ann_path, index, num_shards),
+                                  categories, first_ann_id=index * stride + 1, last_ann_id=(index + 1) * stride,
+                                  workers=workers, indent=indent)
+
+    def categories(self):
+        return [{'supercategory': 'none', 'id': label_id, 'name': label} for label, label_id in self.label2id.items()]
+
+    def write_coco_shard(self, ann_paths, first_index, coco_ann_path, categories, first_ann_id=1, last_ann_id=None,
+                         workers=1, indent=4):
+        """ Parse ann_paths and write their COCO json; the image ids start after first_index.
+        """
+        parsed = tqdm(self.parse_annotations(ann_paths, workers=workers), total=len(ann_paths))
+        self.write_coco_records(self.stats.timed('parse', parsed), coco_ann_path, categories, first_index=first_index,
+                                first_ann_id=first_ann_id, last_ann_id=last_ann_id, indent=indent)
+
+    def write_coco_records(self, parsed, coco_ann_path, categories, first_index=0, first_ann_id=1, last_ann_id=None,
+                           indent=4):
+        """ Assign ids to the (image_info, annotations) items of parsed and stream them into coco_ann_path.
+
+        Raises ValueError (and writes nothing) when an annotation id would pass last_ann_id.
+        Returns the number of images and annotations written.
+        """
+        bnd_id = first_ann_id  # START_BOUNDING_BOX_ID
+        image_id = first_index
+        with CocoJsonWriter(coco_ann_path, categories, indent=indent) as writer:
+            for image_info, anns in parsed:
+                with self.stats.stage('serialise'):
+                    image_id += 1
+                    image_info.update({"id": image_id})
+                    writer.add_image(image_info)
+
+                    if last_ann_id is not None and bnd_id + len(anns) - 1 > last_ann_id:
+                        raise ValueError("{} has more annotations than its {} ids below 2**31".format(
+                            coco_ann_path, last_ann_id - first_ann_id + 1))
+                    for ann in anns:
+                        ann.update({'image_id': image_id, 'id': bnd_id})
+                        writer.add_annotation(ann)
+                        bnd_id = bnd_id + 1
+            with self.stats.stage('serialise'):
+                writer.close()
+        self.stats.count('files', image_id - first_index)
+        self.stats.count('boxes', bnd_id - first_ann_id)
+        return image_id - first_index, bnd_id - first_ann_id
+
+    def create_coco_annotation_incremental(self, ann_paths, coco_ann_path, categories, workers=1, indent=4):
+        """ Re-parse only the xml files that changed since the last run.
+
+        Parsed records and their ids are kept in a manifest next to the COCO json, so unchanged
+        files keep their image / annotation ids and removed files' ids are never handed out again.
+        """
+        manifest_path = coco_ann_path[:-len('.json')] + '.manifest.json'
+        voc_ann_dir = os.path.join(os.path.abspath(self.voc_dir), "Annotations")
+        manifest = AnnotationManifest.load(manifest_path, voc_ann_dir, params={'label2id': self.label2id})
+        manifest.prune(ann_paths)
+
+        with self.stats.stage('fingerprint'):
+            stale_paths = [ann_path for ann_path in ann_paths if manifest.is_fresh(ann_path) is False]
+        log_event(logger, "Annotation files changed", changed=len(stale_paths), files=len(ann_paths))
+        parsed = self.parse_annotations(stale_paths, workers=workers, fingerprint=True)
+        parsed = self.stats.timed('parse', tqdm(parsed, total=len(stale_paths)))
+        for ann_path, (fingerprint, image_info, anns) in zip(stale_paths, parsed):
+            manifest.update(ann_path, fingerprint, image_info, anns)
+
+        num_boxes = 0
+        with self.stats.stage('serialise'), CocoJsonWriter(coco_ann_path, categories, indent=indent) as writer:
+            for ann_path in ann_paths:
+                entry = manifest.get(ann_path)
+                image_id = entry['image_id']
+                writer.add_image(dict(entry['image'], id=image_id))
+                for ann, bnd_id in zip(entry['annotations'], entry['ann_ids']):
+                    writer.add_annotation(dict(ann, image_id=image_id, id=bnd_id))
+                num_boxes += len(entry['annotations'])
+        with self.stats.stage('manifest'):
+            manifest.save()
+        self.stats.count('files', len(ann_paths))
+        self.stats.count('files_parsed', len(stale_paths))
+        self.stats.count('boxes', num_boxes)
+
+    def parse_annotations(self, ann_paths, workers=1, fingerprint=False):
+        """ Yield (image_info, annotations) for every xml in ann_paths, in the order given.
+
+        With workers > 1 the xml files are parsed on a process pool; ids are left for the caller
+        to assign so that the result is identical to a serial run. With fingerprint=True every
+        item is prefixed with the file's mtime / size / sha1.
+        """
+        parse = self.fingerprint_annotation if fingerprint is True else self.parse_annotation
+        if workers is None or workers <= 1:
+            for ann_path in ann_paths:
+                yield parse(ann_path)
+            return
+
+        chunk_size = max(1, min(256, len(ann_paths) // (workers * 4)))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            yield from executor.map(parse, ann_paths, chunksize=chunk_size)
+
+    def parse_annotation(self, ann_path):
+        # Read annotation xml
+        return self.parse_annotation_record(parse_voc(ann_path))
+
+    def parse_annotation_record(self, record):
+        image_info = self.get_image_info(record)
+        anns = [self.get_coco_annotation_from_obj(label, bndbox) for label, bndbox in zip(record.names, record.boxes)]
+        return image_info, anns
+
+    def fingerprint_annotation(self, ann_path):
+        stat = os.stat(ann_path)
+        with open(ann_path, 'rb') as fp:
+            content = fp.read()
+        fingerprint = {
+            'mtime_ns': stat.st_mtime_ns,
+            'size': len(content),
+            'sha1': hashlib.sha1(content).hexdigest()
+        }
+        image_info, anns = self.parse_annotation_record(parse_voc(content))
+        return fingerprint, image_info, anns
+
+    def get_image_info(self, record):
+        if record.path is None:
+            filename = record.filename
         else:
-            filename = os.path.basename(path)
+            filename = os.path.basename(record.path)
 
-        size = annotation_root.find('size')
-        width = int(size.findtext('width'))
-        height = int(size.findtext('height'))
+        width = int(record.width)
+        height = int(record.height)
 
         image_info = {
             'file_name': filename,
@@ -92,15 +221,13 @@ class VOC2COCO:
         }
         return image_info
 
-    def get_coco_annotation_from_obj(self, obj):
-        label = obj.findtext('name')
+    def get_coco_annotation_from_obj(self, label, bndbox):
         assert label in self.label2id, f"Error: {label} is not in label2id !"
         category_id = self.label2id[label]
-        bndbox = obj.find('bndbox')
-        xmin = max(float(bndbox.findtext('xmin')) - 1.0, 1.0)
-        ymin = max(float(bndbox.findtext('ymin')) - 1.0, 1.0)
-        xmax = float(bndbox.findtext('xmax'))
-        ymax = float(bndbox.findtext('ymax'))
+        xmin = max(float(bndbox[0]) - 1.0, 1.0)
+        ymin = max(float(bndbox[1]) - 1.0, 1.0)
+        xmax = float(bndbox[2])
+        ymax = float(bndbox[3])
         assert xmax > xmin and ymax > ymin, f"Box size error !: (xmin, ymin, xmax, ymax): {xmin, ymin, xmax, ymax}"
         o_width = xmax - xmin
         o_height = ymax - ymin
@@ -116,6 +243,7 @@ class VOC2COCO:
 
 
 if __name__ == '__main__':
+    setup_logging()
     # train set
     VOC_DIR = "~/Documents/datasets/item/pascal_voc/train"
     COCO_DIR = "~/Documents/datasets/item/coco"
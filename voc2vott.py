@@ -1,16 +1,29 @@
 import os
 import argparse
-import xml.etree.ElementTree as ET
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
-from uuid import uuid1
 import json
 
+from tqdm import tqdm
+
+from common.instrument import RunStats, profiled, setup_logging
+from common.voc_xml import parse_voc
+from dataset.writers import vott_asset_id, vott_region_id
+
 COLORS = [
     "#808000", "#800000", "#FFFF00", "#FF0000",
     "#8F0080", "#8F0000", "#8FFF00", "#8F0000",
     "#8F0F80", "#8F0F00", "#8FFFF0", "#8F0F00",
 ]
 
+logger = logging.getLogger(__name__)
+
+
+def json_separators(indent):
+    return (',', ':') if indent is None else None
+
 
 class Voc2Vott:
     TAGS_LIST = ["person", "item"]
@@ -18,19 +31,34 @@ class Voc2Vott:
     def __init__(self, voc_dir, vott_dir):
         self.voc_dir = os.path.expanduser(voc_dir)
         self.vott_dir = os.path.expanduser(vott_dir)
-
-    def convert(self):
+        self.stats = RunStats('voc2vott')
+
+    def convert(self, workers=1, indent=4, quiet=False, summary_path=None):
+        """ Export every VOC annotation as a VoTT asset file and write the <project>.vott.json.
+
+        Asset and region ids are derived from the image path, so re-exports are idempotent and
+        diffable. With workers > 1 the xml files are parsed and the asset files written on a process
+        pool; indent=None writes compact JSON and quiet=True hides the progress bar. The run summary
+        is logged and written to summary_path if given.
+        """
+        self.stats.restart()
+        with profiled():
+            if self.export(workers=workers, indent=indent, quiet=quiet) is False:
+                return False
+        return self.stats.finish(summary_path)
+
+    def export(self, workers=1, indent=4, quiet=False):
+        stats = self.stats
         # analyze .vott
         vott_dir = Path(self.vott_dir)
         _tmp_vott = list(vott_dir.glob("*.vott"))
         if len(_tmp_vott) != 1:
-            print("Error, please specify a correct destination directory")
+            logger.error("Error, please specify a correct destination directory")
             return False
         dst_vott = str(_tmp_vott[0].absolute())
 
         with open(dst_vott) as fp:
             vott_data = json.load(fp)
-            vott_assets = {}
             vott_data['tags'] = [{
                 "name": tag,
                 "color": COLORS[ind % len(COLORS)]
@@ -39,38 +67,58 @@ class Voc2Vott:
         # convert xml files
         voc_dir = Path(self.voc_dir)
         ann_dir = voc_dir.joinpath('Annotations')
-        for ind, ann in enumerate(ann_dir.glob("*.xml")):
-            ann_path = str(ann.absolute())
-            asset_data = self.read_data_from_xml(ann_path)
-            asset_id = asset_data['asset']['id']
-            if ind == 0:
-                vott_data['lastVisitedAssetId'] = asset_id
-            vott_assets[asset_id] = asset_data['asset']
-            tmp_name = "{}-asset.json".format(asset_id)
-            tmp_path = str(vott_dir.joinpath(tmp_name))
-            print(tmp_path)
-            with open(tmp_path, 'w') as tfp:
-                json.dump(asset_data, tfp, indent=4, sort_keys=True)
+        with stats.stage('glob'):
+            ann_paths = sorted(str(ann.absolute()) for ann in ann_dir.glob("*.xml"))
+        export = partial(self.export_asset, indent=indent)
+        if workers is None or workers <= 1:
+            vott_assets = self.collect_assets(map(export, ann_paths), vott_data, len(ann_paths), quiet=quiet)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                exported = executor.map(export, ann_paths, chunksize=max(1, min(256, len(ann_paths) // (workers * 4))))
+                vott_assets = self.collect_assets(exported, vott_data, len(ann_paths), quiet=quiet)
 
         vott_data['assets'] = vott_assets
-        with open(dst_vott + '.json', "w") as ofp:
-            json.dump(vott_data, ofp, indent=4, sort_keys=True)
+        with stats.stage('write_project'), open(dst_vott + '.json', "w") as ofp:
+            json.dump(vott_data, ofp, indent=indent, sort_keys=True, separators=json_separators(indent))
+
+    def collect_assets(self, exported, vott_data, total, quiet=False):
+        """ Gather the (asset entry, number of regions) items of exported into the project's assets dict.
+        """
+        stats = self.stats
+        vott_assets = {}
+        # Parsing the xml and writing the asset file happen together in the workers
+        exported = stats.timed('export', tqdm(exported, total=total, disable=quiet))
+        for ind, (asset, num_regions) in enumerate(exported):
+            if ind == 0:
+                vott_data['lastVisitedAssetId'] = asset['id']
+            vott_assets[asset['id']] = asset
+            stats.count('files')
+            stats.count('boxes', num_regions)
+        return vott_assets
+
+    def export_asset(self, ann_path, indent=4):
+        """ Write the <id>-asset.json of one annotation file and return (asset entry, number of regions).
+        """
+        asset_data = self.read_data_from_xml(ann_path)
+        asset_id = asset_data['asset']['id']
+        tmp_path = os.path.join(self.vott_dir, "{}-asset.json".format(asset_id))
+        with open(tmp_path, 'w') as tfp:
+            json.dump(asset_data, tfp, indent=indent, sort_keys=True, separators=json_separators(indent))
+        return asset_data['asset'], len(asset_data['regions'])
 
     def read_data_from_xml(self, ann_path):
         image_dir = Path(ann_path).parent.parent.joinpath("JPEGImages")
-        tree = ET.parse(ann_path)
-        annotation_root = tree.getroot()
+        record = parse_voc(ann_path)
 
-        path = annotation_root.findtext('path')
+        path = record.path
         if path is None:
-            name = annotation_root.findtext('filename')
+            name = record.filename
             path = os.path.join(image_dir, name)
         else:
             name = os.path.basename(path)
 
-        size = annotation_root.find("size")
-        width = int(size.findtext('width'))
-        height = int(size.findtext('height'))
+        width = int(record.width)
+        height = int(record.height)
         ext = name.split('.')[-1]
 
         results = {
@@ -81,7 +129,7 @@ class Voc2Vott:
                     "width": width,
                     "height": height
                 },
-                "id": str(uuid1()).replace("-", ""),
+                "id": vott_asset_id("file:" + path),
                 "format": ext,
                 "state": 2,
                 "type": 1
@@ -90,18 +138,17 @@ class Voc2Vott:
             "version": "2.1.0"
         }
 
-        for obj in annotation_root.findall('object'):
-            obj_bnd_box = obj.find('bndbox')
-            print(obj_bnd_box.findtext('xmin'))
-            xmin = float(obj_bnd_box.findtext('xmin'))
-            ymin = int(float(obj_bnd_box.findtext('ymin')))
-            xmax = int(float(obj_bnd_box.findtext('xmax')))
-            ymax = int(float(obj_bnd_box.findtext('ymax')))
+        asset_id = results['asset']['id']
+        for region_ind, (label, bndbox) in enumerate(zip(record.names, record.boxes)):
+            xmin = float(bndbox[0])
+            ymin = int(float(bndbox[1]))
+            xmax = int(float(bndbox[2]))
+            ymax = int(float(bndbox[3]))
 
             temp_region = {
-                'id': str(uuid1()).replace("-", ""),
+                'id': vott_region_id(asset_id, region_ind),
                 'type': "RECTANGLE",
-                'tags': [str(obj.find('name').text)],
+                'tags': [str(label)],
                 "boundingBox": {
                     "height": ymax - ymin,
                     "width": xmax - xmin,
@@ -136,13 +183,20 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--voc_dir", type=str)
     parser.add_argument("--vott_dir", type=str)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--compact", action="store_true", help="Write JSON without indentation")
+    parser.add_argument("--quiet", action="store_true", help="Hide the progress bar")
+    parser.add_argument("--summary", type=str, default=None, help="Write the run summary JSON here")
+    parser.add_argument("--log_json", action="store_true", help="Log JSON lines instead of text")
     args = parser.parse_args()
+    setup_logging(json_lines=args.log_json)
 
     voc2vott = Voc2Vott(
         voc_dir=args.voc_dir,  # "~/Documents/datasets/item/pascal_voc/test/",
         vott_dir=args.vott_dir  # "~/Documents/test/annotations"
     )
-    voc2vott.convert()
+    voc2vott.convert(workers=args.workers, indent=None if args.compact else 4, quiet=args.quiet,
+                     summary_path=args.summary)
 
 
 if __name__ == "__main__":
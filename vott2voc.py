@@ -0,0 +1,119 @@
+import os
+import argparse
+
+from tqdm import tqdm
+
+from common.coco_writer import CocoJsonWriter
+from common.staging import Stager
+from common.voc_xml import write_voc_xml
+from dataset.readers import VOTT_LABELED_STATES, iter_vott_assets
+from dataset.writers import coco_annotations
+
+
+class Vott2Voc:
+    """ Convert the <id>-asset.json files of a VoTT project back into a VOC dataset.
+
+    Only assets that were visited or tagged are converted. Asset files are read on a thread pool
+    and every asset is written as soon as it is parsed.
+    """
+
+    def __init__(self, vott_dir, voc_dir, states=VOTT_LABELED_STATES):
+        self.vott_dir = os.path.expanduser(vott_dir)
+        self.voc_dir = os.path.expanduser(voc_dir)
+        self.states = states
+
+    def convert(self, workers=8, stage_mode=None, quiet=False):
+        """ Write Annotations/<name>.xml for every asset, staging the images into JPEGImages with stage_mode.
+        """
+        voc_ann_dir = os.path.join(self.voc_dir, "Annotations")
+        voc_image_dir = os.path.join(self.voc_dir, "JPEGImages")
+        os.makedirs(voc_ann_dir, exist_ok=True)
+        if stage_mode is not None:
+            os.makedirs(voc_image_dir, exist_ok=True)
+
+        count = 0
+        with Stager(mode=stage_mode or 'copy', workers=workers) as stager:
+            assets = iter_vott_assets(self.vott_dir, workers=workers, states=self.states)
+            for image_path, width, height, names, boxes in tqdm(assets, disable=quiet):
+                image_file = os.path.basename(image_path)
+                write_voc_xml(os.path.join(voc_ann_dir, os.path.splitext(image_file)[0] + '.xml'),
+                              image_file, "JPEGImages", width, height, names, boxes)
+                if stage_mode is not None:
+                    stager.submit(image_path, os.path.join(voc_image_dir, image_file))
+                count += 1
+        return count
+
+
+class Vott2Coco:
+    """ Convert the <id>-asset.json files of a VoTT project back into a COCO annotation file.
+
+    Only assets that were visited or tagged are converted; images and boxes are streamed into a
+    CocoJsonWriter, so the project is never held in memory.
+    """
+
+    def __init__(self, vott_dir, coco_dir, coco_set_name, label2id, states=VOTT_LABELED_STATES):
+        self.vott_dir = os.path.expanduser(vott_dir)
+        self.coco_dir = os.path.expanduser(coco_dir)
+        self.coco_set_name = coco_set_name
+        self.label2id = label2id
+        self.states = states
+
+    def convert(self, workers=8, indent=4, stage_mode=None, quiet=False):
+        """ Write annotations/instances_<set>.json, staging the images into images/<set> with stage_mode.
+        """
+        categories = [{'supercategory': 'none', 'id': label_id, 'name': label}
+                      for label, label_id in self.label2id.items()]
+        coco_ann_path = os.path.join(self.coco_dir, "annotations", "instances_" + self.coco_set_name + '.json')
+        coco_image_dir = os.path.join(self.coco_dir, "images", self.coco_set_name)
+        if stage_mode is not None:
+            os.makedirs(coco_image_dir, exist_ok=True)
+
+        bnd_id = 1
+        image_id = 0
+        with Stager(mode=stage_mode or 'copy', workers=workers) as stager, \
+                CocoJsonWriter(coco_ann_path, categories, indent=indent) as writer:
+            assets = iter_vott_assets(self.vott_dir, workers=workers, states=self.states)
+            for image_path, width, height, names, boxes in tqdm(assets, disable=quiet):
+                image_id += 1
+                image_file = os.path.basename(image_path)
+                writer.add_image({'file_name': image_file, 'height': height, 'width': width, 'id': image_id})
+
+                for label in names:
+                    assert label in self.label2id, f"Error: {label} is not in label2id !"
+                for ann in coco_annotations([self.label2id[label] for label in names], boxes):
+                    ann.update({'image_id': image_id, 'id': bnd_id})
+                    writer.add_annotation(ann)
+                    bnd_id += 1
+                if stage_mode is not None:
+                    stager.submit(image_path, os.path.join(coco_image_dir, image_file))
+        return image_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a VoTT project's asset files back to VOC or COCO")
+    parser.add_argument("--vott_dir", type=str)
+    parser.add_argument("--format", type=str, default="voc", choices=["voc", "coco"])
+    parser.add_argument("--output_dir", type=str)
+    parser.add_argument("--coco_set", type=str, default="train")
+    parser.add_argument("--classes", type=str, default="person,item",
+                        help="Comma separated class names, COCO category ids start at 1")
+    parser.add_argument("--stage_mode", type=str, default=None,
+                        help="How to stage images: copy, move, hardlink, reflink or symlink (default: labels only)")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--all_assets", action="store_true", help="Also convert assets that were never visited")
+    parser.add_argument("--quiet", action="store_true", help="Hide the progress bar")
+    args = parser.parse_args()
+
+    states = None if args.all_assets else VOTT_LABELED_STATES
+    if args.format == "voc":
+        converter = Vott2Voc(args.vott_dir, args.output_dir, states=states)
+        count = converter.convert(workers=args.workers, stage_mode=args.stage_mode, quiet=args.quiet)
+    else:
+        label2id = {label: ind + 1 for ind, label in enumerate(args.classes.split(","))}
+        converter = Vott2Coco(args.vott_dir, args.output_dir, args.coco_set, label2id, states=states)
+        count = converter.convert(workers=args.workers, stage_mode=args.stage_mode, quiet=args.quiet)
+    print("Converted {} assets".format(count))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+# Script to convert yolo annotations to kitti format
+import argparse
+import json
+import logging
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import cv2
+from tqdm import tqdm
+
+from common.image_size import get_image_size
+from common.instrument import log_event, setup_logging
+from common.staging import stage_file
+from common.yolo import decode_yolo, load_yolo_labels
+
+logger = logging.getLogger(__name__)
+
+# Conversion parameters of the last complete run, kept next to the outputs
+PARAMS_FILE = ".yolo2kitti.json"
+
+
+class YOLO2KITTI:
+    def __init__(self, yolo_dir, kitti_dir, id2name, width=None, height=None, jpeg_quality=95, stage_mode='copy'):
+        """ Convert a YOLO dataset to the KITTI layout used by TAO (image/ and label/ folders).
+
+        Args
+            yolo_dir: Folder searched recursively for images with a YOLO .txt next to them.
+            kitti_dir: Destination folder.
+            id2name: Mapping of YOLO class id (int) -> KITTI type name.
+            width, height: Resize images (and scale labels) to this resolution; keep the original size when None.
+            jpeg_quality: JPEG quality used when re-encoding resized images.
+            stage_mode: How images are staged when they are not resized, see common.staging.
+        """
+        self.yolo_dir = os.path.expanduser(yolo_dir)
+        kitti_dir = os.path.expanduser(kitti_dir)
+
+        kitti_images_dir = os.path.join(kitti_dir, "image")
+        if os.path.isdir(kitti_images_dir) is False:
+            os.makedirs(kitti_images_dir, exist_ok=True)
+        self.kitti_images_dir = kitti_images_dir
+
+        kitti_labels_dir = os.path.join(kitti_dir, "label")
+        if os.path.isdir(kitti_labels_dir) is False:
+            os.makedirs(kitti_labels_dir, exist_ok=True)
+        self.kitti_labels_dir = kitti_labels_dir
+
+        if (width is None) != (height is None):
+            raise ValueError("width and height must be given together")
+        self.id2name = id2name
+        self.width = width
+        self.height = height
+        self.jpeg_quality = jpeg_quality
+        self.stage_mode = stage_mode
+        self.force = False
+
+    def convert(self, extension='.jpg', workers=None):
+        """ Convert every image under yolo_dir and return a Counter of per-image results.
+
+        Images whose outputs are newer than their sources are skipped, so an interrupted run can
+        simply be started again. The parameters of the last complete run (class map, size, JPEG
+        quality, stage mode) are stored in kitti_dir/.yolo2kitti.json; when they differ every image
+        is converted again. Image sizes are probed here, in the parent process, not in the workers.
+        """
+        image_paths = sorted(str(image.absolute()) for image in Path(self.yolo_dir).rglob("*" + extension))
+        workers = workers or os.cpu_count()
+        self.force = self.load_params() != self.params()
+        if self.force is True:
+            # Removed first so that an interrupted run is forced again as well
+            self.remove_params()
+        if self.width is None:
+            image_sizes = [self.probe_size(image_path) for image_path in image_paths]
+        else:
+            image_sizes = [(self.width, self.height)] * len(image_paths)
+
+        results = Counter()
+        if workers <= 1:
+            for image_path, image_size in tqdm(zip(image_paths, image_sizes), total=len(image_paths)):
+                results[self.convert_sample(image_path, image_size)] += 1
+        else:
+            chunk_size = max(1, min(64, len(image_paths) // (workers * 4)))
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                converted = executor.map(self.convert_sample, image_paths, image_sizes, chunksize=chunk_size)
+                for result in tqdm(converted, total=len(image_paths)):
+                    results[result] += 1
+        self.save_params()
+        log_event(logger, "Done", **results)
+        return results
+
+    @staticmethod
+    def probe_size(image_path):
+        try:
+            return get_image_size(image_path)
+        except OSError:
+            return None
+
+    def params(self):
+        return {
+            'id2name': {str(class_id): name for class_id, name in self.id2name.items()},
+            'width': self.width,
+            'height': self.height,
+            'jpeg_quality': self.jpeg_quality,
+            'stage_mode': self.stage_mode
+        }
+
+    def params_path(self):
+        return os.path.join(os.path.dirname(self.kitti_images_dir), PARAMS_FILE)
+
+    def load_params(self):
+        try:
+            with open(self.params_path(), 'r') as fp:
+                return json.load(fp)
+        except (OSError, ValueError):
+            return None
+
+    def save_params(self):
+        with open(self.params_path(), 'w') as fp:
+            json.dump(self.params(), fp, indent=4)
+
+    def remove_params(self):
+        if os.path.isfile(self.params_path()):
+            os.remove(self.params_path())
+
+    def convert_sample(self, image_path, image_size):
+        """ Convert one image and its label file; image_size is its (width, height) in the output, None when
+        the image could not be probed.
+
+        Returns 'converted', 'skipped', 'no_label', 'empty' or 'unreadable'.
+        """
+        label_path = os.path.splitext(image_path)[0] + '.txt'
+        if os.path.isfile(label_path) is False:
+            return 'no_label'
+
+        image_file = os.path.basename(image_path)
+        dst_image_path = os.path.join(self.kitti_images_dir, image_file)
+        dst_label_path = os.path.join(self.kitti_labels_dir, os.path.splitext(image_file)[0] + '.txt')
+        if self.force is False and self.is_up_to_date([image_path, label_path], [dst_image_path, dst_label_path]):
+            return 'skipped'
+
+        if image_size is None:
+            logger.warning("Cannot read image %s", image_path)
+            self.remove_outputs(dst_image_path, dst_label_path)
+            return 'unreadable'
+        width, height = image_size
+        kitti_labels = self.extract_from_yolo_file(label_path, width, height)
+        if not kitti_labels:
+            # Outputs of an earlier run must not outlive a label file that became empty
+            self.remove_outputs(dst_image_path, dst_label_path)
+            return 'empty'
+
+        # The label is written last: it marks the sample as complete for the up-to-date check
+        if self.write_image(image_path, dst_image_path) is False:
+            logger.warning("Cannot read image %s", image_path)
+            self.remove_outputs(dst_image_path, dst_label_path)
+            return 'unreadable'
+        tmp_label_path = dst_label_path + '.tmp'
+        with open(tmp_label_path, 'w') as fp:
+            fp.write("\n".join(kitti_labels))
+        os.replace(tmp_label_path, dst_label_path)
+        return 'converted'
+
+    @staticmethod
+    def remove_outputs(*paths):
+        for path in paths:
+            if os.path.isfile(path):
+                os.remove(path)
+
+    def extract_from_yolo_file(self, yolo_file, width, height):
+        class_ids, boxes = decode_yolo(load_yolo_labels(yolo_file), width, height, drop_invalid=True)
+        return [
+            "{} 0 0 0 {} 0 0 0 0 0 0 0".format(self.id2name[class_id], " ".join(map(str, box)))
+            for class_id, box in zip(class_ids.tolist(), boxes)
+        ]
+
+    def write_image(self, image_path, dst_image_path):
+        """ Stage or resize the image to dst_image_path; returns False when it cannot be decoded.
+        """
+        if self.width is None:
+            stage_file(image_path, dst_image_path, mode=self.stage_mode)
+            return True
+
+        frame = cv2.imread(image_path)
+        if frame is None:
+            return False
+        resized = cv2.resize(frame, (self.width, self.height))
+        ext = os.path.splitext(dst_image_path)[1]
+        ok, encoded = cv2.imencode(ext, resized, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if ok is False:
+            raise IOError("Failed to encode {}".format(image_path))
+        tmp_image_path = dst_image_path + '.tmp'
+        with open(tmp_image_path, 'wb') as fp:
+            fp.write(encoded.tobytes())
+        os.replace(tmp_image_path, dst_image_path)
+        return True
+
+    @staticmethod
+    def is_up_to_date(src_paths, dst_paths):
+        try:
+            src_mtime = max(os.stat(path).st_mtime_ns for path in src_paths)
+            dst_mtime = min(os.stat(path).st_mtime_ns for path in dst_paths)
+        except FileNotFoundError:
+            return False
+        return dst_mtime >= src_mtime
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--yolo_dir", type=str)
+    parser.add_argument("--kitti_dir", type=str)
+    parser.add_argument("--classes", type=str, default="item",
+                        help="Comma separated class names, in YOLO class id order")
+    parser.add_argument("--width", type=int, default=None)
+    parser.add_argument("--height", type=int, default=None)
+    parser.add_argument("--jpeg_quality", type=int, default=95)
+    parser.add_argument("--extension", type=str, default=".jpg")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    setup_logging()
+    id2name = dict(enumerate(args.classes.split(",")))
+    yolo2kitti = YOLO2KITTI(
+        yolo_dir=args.yolo_dir,  # "~/Documents/datasets/tao-experiments/items/3_itemdetect_data_split/train"
+        kitti_dir=args.kitti_dir,  # "~/PycharmProjects/TAO_Toolkit/CV/data/item_detection/training"
+        id2name=id2name,
+        width=args.width,  # 960
+        height=args.height,  # 544
+        jpeg_quality=args.jpeg_quality
+    )
+    yolo2kitti.convert(extension=args.extension, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,16 @@
 # Script to convert yolo annotations to voc format
+import logging
 import os
-import random
-import shutil
-import xml.etree.cElementTree as ET
 from pathlib import Path
 
-from PIL import Image
+from common.image_size import get_image_size
+from common.instrument import RunStats, log_event, profiled, setup_logging
+from common.split import SplitAssigner, SplitWriter
+from common.staging import Stager, stage_file
+from common.voc_xml import parse_voc, write_voc_xml
+from common.yolo import decode_yolo, load_yolo_labels
+
+logger = logging.getLogger(__name__)
 
 
 class YOLO2VOC:
@@ -32,42 +37,57 @@ class YOLO2VOC:
 
         self.dataset_name = yolo_dir.split(os.sep)[-1]
         self.class_mapping = class_mapping
+        self.stats = RunStats('yolo2voc')
+
+    def convert(self, extension='.jpg', train_val_percent=1, train_percent=0.8, stage_mode='copy', workers=8,
+                summary_path=None, seed=0, stratify=False):
+        """ Convert every label file, then log the run summary (and write it to summary_path).
 
-    def convert(self, extension='.jpg', train_val_percent=1, train_percent=0.8):
+        Every sample is assigned to train / val / test while it is converted (see common.split); with
+        stratify=True the label files are converted in sorted order and the splits are class balanced.
+        """
         yolo_dir = Path(self.yolo_dir)
-        for yolo in yolo_dir.glob("*.txt"):
-            yolo_file = str(yolo.absolute())
-            print("Processing {}".format(yolo_file))
-            prefix = yolo_file[:-4]
-            image_path = prefix + extension
-            voc_labels = self.extract_from_yolo_file(yolo_file, image_path)
-            self.create_voc_dataset(voc_labels, image_path)
-
-        # split train, validate, test dataset
-        self.split_train_val_test(train_val_percent=train_val_percent, train_percent=train_percent)
-
-    def extract_from_yolo_file(self, yolo_file, image_path):
-        img = Image.open(image_path)
-        width, height = img.size
-        with open(yolo_file, 'r') as fp:
-            voc_labels = []
-            for line in fp.readlines():
-                class_id, center_x, center_y, bbox_width, bbox_height = line.split(None)[:5]
-                class_name = self.class_mapping[int(class_id)+1]
-                bbox_width = float(bbox_width) * width
-                bbox_height = float(bbox_height) * height
-                center_x = float(center_x) * width
-                center_y = float(center_y) * height
-                xmin = max(round(center_x - (bbox_width / 2), 2), 1.0)
-                ymin = max(round(center_y - (bbox_height / 2), 2), 1.0)
-                xmax = min(round(center_x + (bbox_width / 2), 2), width - 1.0)
-                ymax = min(round(center_y + (bbox_height / 2), 2), height - 1.0)
-                voc_labels.append([class_name, xmin, ymin, xmax, ymax])
-            return voc_labels
-
-    def create_voc_dataset(self, voc_labels, image_path):
-        img = Image.open(image_path)
-        width, height = img.size
+        stats = self.stats
+        stats.restart()
+        assigner = SplitAssigner(train_val_percent, train_percent, seed=seed, stratify=stratify)
+        yolo_files = yolo_dir.glob("*.txt")
+        if stratify is True:
+            yolo_files = sorted(yolo_files)
+        with profiled():
+            with Stager(mode=stage_mode, workers=workers) as stager, \
+                    SplitWriter(self.voc_imagesets_main_dir, assigner) as splits:
+                for yolo in stats.timed('glob', yolo_files):
+                    yolo_file = str(yolo.absolute())
+                    logger.debug("Processing %s", yolo_file)
+                    prefix = yolo_file[:-4]
+                    image_path = prefix + extension
+                    with stats.stage('probe'):
+                        image_size = get_image_size(image_path)
+                    with stats.stage('parse'):
+                        voc_labels = self.extract_from_yolo_file(yolo_file, image_path, image_size=image_size)
+                    with stats.stage('write'):
+                        self.create_voc_dataset(voc_labels, image_path, stager=stager, image_size=image_size)
+                    # split train, validate, test dataset
+                    with stats.stage('split'):
+                        splits.add(os.path.basename(prefix), voc_labels[0].tolist())
+                    stats.count('files')
+                    stats.count('boxes', len(voc_labels[0]))
+                # Waiting for the last queued copies
+                with stats.stage('stage_images'):
+                    stager.close()
+            stats.count('images_staged', sum(stager.counts.values()))
+            stats.count('bytes_copied', stager.bytes_copied)
+        log_event(logger, "Split samples", **splits.counts)
+        return stats.finish(summary_path)
+
+    def extract_from_yolo_file(self, yolo_file, image_path, image_size=None):
+        """ Returns (class_ids, boxes): YOLO class ids as an int32 array and (N, 4) float64 VOC corners.
+        """
+        width, height = image_size or get_image_size(image_path)
+        return decode_yolo(load_yolo_labels(yolo_file), width, height)
+
+    def create_voc_dataset(self, voc_labels, image_path, stager=None, image_size=None):
+        width, height = image_size or get_image_size(image_path)
 
         image_file = image_path.split(os.sep)[-1]
         new_image_path = os.path.join(self.voc_images_dir, image_file)
@@ -76,70 +96,35 @@ class YOLO2VOC:
         voc_ann_xml = os.path.join(self.voc_ann_dir, image_id + '.xml')
 
         # 1. Construct JPEGImages folder
-        shutil.copy(image_path, new_image_path)
+        if stager is None:
+            stage_file(image_path, new_image_path, mode='copy')
+        else:
+            stager.submit(image_path, new_image_path)
 
         # 2. Construct Annotations folder
-        root = ET.Element("annotations")
-        ET.SubElement(root, "filename").text = image_file
-        ET.SubElement(root, "folder").text = self.dataset_name
-        size = ET.SubElement(root, "size")
-        ET.SubElement(size, "width").text = str(width)
-        ET.SubElement(size, "height").text = str(height)
-        ET.SubElement(size, "depth").text = "3"
-
-        for name, xmin, ymin, xmax, ymax in voc_labels:
-            obj = ET.SubElement(root, "object")
-            ET.SubElement(obj, "name").text = name
-            ET.SubElement(obj, "pose").text = "Unspecified"
-            ET.SubElement(obj, "truncated").text = str(0)
-            ET.SubElement(obj, "difficult").text = str(0)
-            bbox = ET.SubElement(obj, "bndbox")
-            ET.SubElement(bbox, "xmin").text = str(xmin)
-            ET.SubElement(bbox, "ymin").text = str(ymin)
-            ET.SubElement(bbox, "xmax").text = str(xmax)
-            ET.SubElement(bbox, "ymax").text = str(ymax)
-
-        tree = ET.ElementTree(root)
-        tree.write(voc_ann_xml)
-
-    def split_train_val_test(self, train_val_percent, train_percent):
+        class_ids, boxes = voc_labels
+        write_voc_xml(voc_ann_xml, image_file, self.dataset_name, width, height,
+                      [self.class_mapping[class_id + 1] for class_id in class_ids.tolist()], boxes)
+
+    def split_train_val_test(self, train_val_percent, train_percent, seed=0, stratify=False):
+        """ (Re)write the ImageSets/Main lists for the annotations already in the VOC folder.
+
+        Uses the same assignment as convert(), so the result matches a conversion with the same settings.
+        """
         voc_ann_dir = Path(self.voc_ann_dir)
-        total_samples = {voc_ann_xml.name[:-4] for voc_ann_xml in voc_ann_dir.glob("*.xml")}
-        total_num = len(total_samples)
-        train_val_num = int(total_num * train_val_percent)
-        train_num = int(train_val_num * train_percent)
-
-        train_val_samples = set(random.sample(total_samples, train_val_num))
-        test_samples = total_samples.difference(train_val_samples)
-        train_samples = set(random.sample(train_val_samples, train_num))
-        val_samples = set(train_val_samples).difference(train_samples)
-
-        if len(train_val_samples) > 0:
-            train_val_path = os.path.join(self.voc_imagesets_main_dir, "trainval.txt")
-            with open(train_val_path, 'w') as fp:
-                for _sample in train_val_samples:
-                    fp.write(_sample + '\n')
-
-        if len(train_samples) > 0:
-            train_path = os.path.join(self.voc_imagesets_main_dir, "train.txt")
-            with open(train_path, 'w') as fp:
-                for _sample in train_samples:
-                    fp.write(_sample + '\n')
-
-        if len(val_samples) > 0:
-            val_path = os.path.join(self.voc_imagesets_main_dir, "val.txt")
-            with open(val_path, 'w') as fp:
-                for _sample in val_samples:
-                    fp.write(_sample + '\n')
-
-        if len(test_samples) > 0:
-            test_path = os.path.join(self.voc_imagesets_main_dir, "test.txt")
-            with open(test_path, 'w') as fp:
-                for _sample in test_samples:
-                    fp.write(_sample + '\n')
+        class_ids = {name: class_id - 1 for class_id, name in self.class_mapping.items()}
+        assigner = SplitAssigner(train_val_percent, train_percent, seed=seed, stratify=stratify)
+        with SplitWriter(self.voc_imagesets_main_dir, assigner) as splits:
+            for voc_ann_xml in sorted(voc_ann_dir.glob("*.xml")):
+                labels = []
+                if stratify is True:
+                    labels = [class_ids.get(name, -1) for name in parse_voc(str(voc_ann_xml)).names]
+                splits.add(voc_ann_xml.name[:-4], labels)
+        return splits.counts
 
 
 def main():
+    setup_logging()
     # train set
     YOLO_DIR = "/home/yytang/Documents/datasets/Real_Store_ItemDetection_Data/train"
     VOC_DIR = "~/Documents/datasets/item/pascal_voc/train"
@@ -156,7 +141,7 @@ def main():
 
     yolo2voc = YOLO2VOC(YOLO_DIR, VOC_DIR, CLASS_MAPPING)
     yolo2voc.convert()
-    print("Done")
+    log_event(logger, "Done")
 
 
 if __name__ == "__main__":